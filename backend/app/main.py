@@ -1,15 +1,16 @@
 import os
+import asyncio
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response
 from dotenv import load_dotenv
 from loguru import logger
 from contextlib import asynccontextmanager
 import pathlib
 
 # Import routers
-from app.routers import analysis, reports
+from app.routers import analysis, reports, admin
 
 # Load environment variables
 load_dotenv()
@@ -20,15 +21,67 @@ async def lifespan(app: FastAPI):
     # Startup: Load ML models, establish connections
     logger.info("Starting TruthLens API")
     
+    # Tracing exports from a background thread, so it is set up per worker
+    from app.utils.tracing import init_tracing, shutdown_tracing
+    init_tracing()
+    
     # Initialize NLP models - this will be handled by our model service
     from app.utils.model_service import initialize_models
     initialize_models()
     
+    # Start the executor that runs blocking model inference off the event loop
+    from app.utils.inference_executor import init_executor, shutdown_executor
+    init_executor()
+    
+    # Connect to the database (and create its tables) before taking requests
+    from fastapi.concurrency import run_in_threadpool
+    from app.utils.db_service import init_db, close_db
+    await run_in_threadpool(init_db)
+    
+    # Keep the in-process cache consistent with entries other workers rewrite
+    from app.utils.redis_client import get_redis
+    from app.utils.analysis_cache import listen_for_invalidations
+    from app.utils.similarity_index import sync_index
+    invalidation_listener = None
+    index_sync = None
+    if get_redis():
+        invalidation_listener = asyncio.create_task(listen_for_invalidations(get_redis()))
+        # Load the persisted near-duplicate index and pick up other workers' additions
+        index_sync = asyncio.create_task(sync_index(get_redis()))
+    
+    # Process background jobs in this worker too. The default of 2 suits a
+    # deployment without job workers (e.g. render.yaml); deployments that run
+    # worker.py (docker-compose.yml, Procfile) set JOB_API_CONCURRENCY=0 so
+    # the API only consumes its in-memory fallback queue
+    from app.utils.job_queue import run_consumers
+    stop_jobs = asyncio.Event()
+    job_consumers = asyncio.create_task(run_consumers(
+        int(os.getenv("JOB_API_CONCURRENCY", "2")), os.getenv("REDIS_URL"), stop_jobs
+    ))
+    
     yield
     
     # Shutdown: Clean up resources
     logger.info("Shutting down TruthLens API")
+    if invalidation_listener:
+        invalidation_listener.cancel()
+    if index_sync:
+        index_sync.cancel()
+    stop_jobs.set()
+    try:
+        await asyncio.wait_for(job_consumers, timeout=float(os.getenv("JOB_SHUTDOWN_GRACE", "10")))
+    except asyncio.TimeoutError:
+        logger.warning("Background jobs still running at shutdown")
+    shutdown_executor()
+    close_db()
+    from app.utils.extraction import shutdown_extraction
+    shutdown_extraction()
+    from app.utils.http_client import close_session
+    await close_session()
     # Redis client is now managed in the redis_client module
+    from app.utils.redis_client import close_redis
+    await close_redis()
+    shutdown_tracing()
     
 # Create the FastAPI app
 app = FastAPI(
@@ -47,9 +100,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route for /metrics
+from app.utils.metrics import MetricsMiddleware
+app.add_middleware(MetricsMiddleware)
+
+# Request spans when TRACING_ENABLED is set; a pass-through otherwise
+from app.utils.tracing import TracingMiddleware
+app.add_middleware(TracingMiddleware)
+
+# Profile a share of analyze requests (PROFILE_SAMPLE_RATE, off by default)
+from app.utils.profiling import ProfilingMiddleware
+app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(analysis.router, prefix="/api", tags=["analysis"])
 app.include_router(reports.router, prefix="/api", tags=["reports"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"], include_in_schema=False)
 
 # Create the static directory if it doesn't exist
 static_dir = pathlib.Path(__file__).parent / "static"
@@ -78,18 +144,57 @@ async def root(request: Request):
 @app.get("/health")
 async def health_check():
     from app.utils.redis_client import redis_client
+    from app.utils.memory import get_memory_usage
     
     status = {
         "api": True,
         "models": True,
-        "redis": bool(redis_client),
+        "redis": bool(redis_client) and redis_client.available,
     }
     
     return {
         "status": "healthy" if all(status.values()) else "degraded",
-        "services": status
+        "services": status,
+        "memory": get_memory_usage()
     }
 
+# In-process counters and histograms for this worker
+@app.get("/stats")
+async def get_stats():
+    from app.utils import stats
+    from app.utils.inference_executor import get_executor
+    from app.utils.batching import _batchers
+    from app.utils.analysis_cache import cache_stats
+    from app.utils.singleflight import singleflight_stats
+    from app.utils.job_queue import queue_stats
+    from app.utils.lookup_cache import lookup_stats
+    from app.utils.similarity_index import index_stats
+    from app.utils.embedding_store import store_stats
+    from app.utils.db_service import db_stats
+    from app.utils.redis_client import get_redis
+    
+    return {
+        "inference": get_executor().stats(),
+        "cache": cache_stats(),
+        "singleflight": singleflight_stats(),
+        "jobs": await queue_stats(get_redis()),
+        "lookups": lookup_stats(),
+        "similarityIndex": index_stats(),
+        "embeddingStore": store_stats(),
+        "db": db_stats(),
+        "batchers": {name: batcher.stats() for name, batcher in _batchers.items()},
+        "metrics": stats.snapshot()
+    }
+
+# Prometheus metrics, aggregated across gunicorn workers
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    from app.utils.metrics import render_metrics
+    from app.utils.redis_client import get_redis
+    
+    body, content_type = await render_metrics(get_redis())
+    return Response(content=body, media_type=content_type)
+
 # Specific health check endpoint for Render
 @app.get("/healthz")
 async def render_health_check():
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class SourceReference(BaseModel):
     url: str
@@ -19,4 +19,7 @@ class AnalysisResult(BaseModel):
     biasTags: List[str]
     sources: List[SourceReference]
     trustLevel: str  # 'high', 'medium', 'low'
-    explanation: Optional[str] = None 
\ No newline at end of file
+    explanation: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None  # Per-stage latency in milliseconds
+    partial: bool = False  # True when a stage timed out or failed
+    degradedStages: List[str] = []
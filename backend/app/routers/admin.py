@@ -0,0 +1,81 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from typing import Optional
+import os
+import secrets
+from app.utils import profiling
+from loguru import logger
+
+# Profiling endpoints for a running worker. They are only served when
+# ADMIN_TOKEN is set, and every call must send it in the X-Admin-Token header.
+# Each call is handled by whichever worker receives it; responses include
+# its pid.
+
+router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Compare bytes: compare_digest rejects str with non-ASCII characters
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.post("/profile/cpu", dependencies=[Depends(require_admin)])
+async def profile_cpu(
+    seconds: float = Query(10, gt=0, le=profiling.PROFILE_MAX_SECONDS),
+    format: str = Query(profiling.PROFILE_FORMAT, pattern="^(collapsed|speedscope)$"),
+    include_idle: bool = False
+):
+    """
+    Sample this worker's threads for `seconds` and write a CPU profile.
+    """
+    try:
+        return await profiling.capture_cpu_profile(seconds, format, include_idle)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    List the profiles written by this host, newest first.
+    """
+    return {"profiles": profiling.list_profiles()}
+
+@router.get("/profiles/{name}", dependencies=[Depends(require_admin)])
+async def download_profile(name: str):
+    """
+    Download a profile or memory snapshot file.
+    """
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=os.path.basename(path))
+
+@router.post("/profile/memory/start", dependencies=[Depends(require_admin)])
+async def start_memory_profile(frames: int = Query(profiling.PROFILE_TRACEMALLOC_FRAMES, ge=1, le=100)):
+    """
+    Start tracing allocations in this worker (tracemalloc).
+    """
+    logger.info("Memory tracing requested through the admin API")
+    return await run_in_threadpool(profiling.start_memory_tracing, frames)
+
+@router.get("/profile/memory", dependencies=[Depends(require_admin)])
+async def memory_profile(
+    top: int = Query(20, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    compare: bool = True,
+    dump: bool = False
+):
+    """
+    Top allocation sites in this worker, by size or by growth since tracing started.
+    """
+    return await run_in_threadpool(profiling.memory_snapshot, top, group_by, compare, dump)
+
+@router.post("/profile/memory/stop", dependencies=[Depends(require_admin)])
+async def stop_memory_profile():
+    """
+    Stop tracing allocations and free the tracing overhead.
+    """
+    return await run_in_threadpool(profiling.stop_memory_tracing)
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import os
 import time
+import asyncio
 from app.utils.redis_client import get_redis
-from app.utils.model_service import get_credibility_score, get_sentiment, extract_bias_tags
-from app.utils.fact_check import cross_verify_sources
+from app.utils.inference_executor import InferenceQueueFull
+from app.utils.analysis_pipeline import run_analysis, run_analysis_batch, StageCallback
+from app.utils.batching import BATCH_MAX_SIZE
+from app.utils.fact_check import cross_verify_sources, index_trusted_article
+from app.utils.similarity_index import SIMILARITY_MAX_CHARS
+from app.utils import analysis_cache
+from app.utils.singleflight import coalesce
+from app.utils import job_queue
+from app.utils import db_service
+from app.utils import tracing
 from app.models.article import ArticleData, AnalysisResult, SourceReference
 from loguru import logger
 import json
@@ -12,15 +24,28 @@ import uuid
 
 router = APIRouter()
 
+# Limits for POST /analyze/batch
+BATCH_ENDPOINT_MAX_ITEMS = int(os.getenv("BATCH_ENDPOINT_MAX_ITEMS", "1000"))
+BATCH_ENDPOINT_CONCURRENCY = int(os.getenv("BATCH_ENDPOINT_CONCURRENCY", "2"))
+
+# How long POST /analyze/stream waits for the verify_sources job, and how
+# often it checks the cache for its outcome
+STREAM_SOURCES_TIMEOUT = float(os.getenv("STREAM_SOURCES_TIMEOUT", "10"))
+STREAM_SOURCES_POLL_MS = int(os.getenv("STREAM_SOURCES_POLL_MS", "100"))
+
 class AnalysisRequest(BaseModel):
     title: str
     content: str
     url: str
+    publishedAt: Optional[int] = None  # Unix timestamp, used to tune cache lifetime
+
+class BatchAnalysisRequest(BaseModel):
+    articles: List[AnalysisRequest]
+    stream: bool = False  # Stream results as NDJSON as each one finishes
 
 @router.post("/analyze")
 async def analyze_article(
     article: AnalysisRequest,
-    background_tasks: BackgroundTasks,
     redis_client = Depends(get_redis)
 ):
     """
@@ -29,65 +54,365 @@ async def analyze_article(
     start_time = time.time()
     logger.info(f"Analyzing article: {article.url}")
     
-    # Check Redis cache first if available
-    if redis_client:
-        cached_result = redis_client.get(f"article:{article.url}")
-        if cached_result:
-            logger.info(f"Cache hit for {article.url}")
-            return json.loads(cached_result)
+    # Check Redis cache first if available. Results are keyed by content, so
+    # URL variants and syndicated copies of the same article share one entry
+    digest = analysis_cache.content_hash(article.title, article.content)
+    cached = await analysis_cache.get_by_content(redis_client, article.url, digest)
+    if cached:
+        logger.info(f"Cache hit for {article.url}")
+        # Stale-while-revalidate: answer now, let a job worker refresh it
+        if analysis_cache.is_stale(cached):
+            await _enqueue_refresh(article, digest, redis_client)
+        return cached["result"]
     
     try:
-        # 1. Get credibility score using transformer model
-        credibility_score = get_credibility_score(article.title, article.content)
-        
-        # 2. Determine trust level based on credibility score
-        trust_level = "high" if credibility_score >= 0.7 else "medium" if credibility_score >= 0.4 else "low"
-        
-        # 3. Get sentiment analysis
-        sentiment = get_sentiment(article.content)
-        
-        # 4. Extract bias tags
-        bias_tags = extract_bias_tags(article.content)
-        
-        # 5. Cross-verify with other sources (run in background to not delay response)
-        # For MVP, we'll return empty sources and update the cache later
-        sources: List[SourceReference] = []
-        
-        # Add background task to fetch sources
-        background_tasks.add_task(
-            update_with_sources, 
-            article.url, 
-            article.title, 
-            credibility_score, 
-            sentiment, 
-            bias_tags, 
-            trust_level, 
-            redis_client
+        # Concurrent requests for the same article share one analysis
+        result = await coalesce(
+            f"analysis:{digest}",
+            lambda: _analyze_uncached(article, digest, redis_client),
+            redis_client=redis_client,
+            lookup=lambda: analysis_cache.peek(redis_client, article.url, digest)
         )
         
-        result = {
-            "credibilityScore": float(credibility_score),
-            "sentiment": sentiment,
-            "biasTags": bias_tags,
-            "sources": sources,
-            "trustLevel": trust_level
-        }
-        
-        # Cache the result (without sources initially)
-        if redis_client:
-            redis_client.setex(
-                f"article:{article.url}", 
-                3600,  # Cache for 1 hour
-                json.dumps(result)
-            )
-        
         logger.info(f"Analysis completed in {time.time() - start_time:.2f}s")
         return result
         
+    except InferenceQueueFull as e:
+        logger.warning(f"Rejecting analysis for {article.url}: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis service is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error(f"Error analyzing article: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@router.post("/analyze/stream")
+async def analyze_article_stream(
+    article: AnalysisRequest,
+    request: Request,
+    redis_client = Depends(get_redis)
+):
+    """
+    Analyze an article and stream each result as soon as it is ready.
+    
+    Emits `credibility`, `sentiment` and `bias` as each analyzer finishes,
+    then `analysis` with the complete result, `sources` once the
+    cross-verification job is done, and finally `done`. Responds with
+    Server-Sent Events, or with NDJSON when the client accepts
+    application/x-ndjson.
+    """
+    logger.info(f"Streaming analysis of article: {article.url}")
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    
+    def encode(event: str, data: Any) -> str:
+        if ndjson:
+            return json.dumps({"event": event, "data": data}) + "\n"
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    async def events():
+        async for event, data in _analysis_events(article, redis_client):
+            yield encode(event, data)
+    
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _analysis_events(
+    article: AnalysisRequest,
+    redis_client
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Yield (event, data) pairs for a streaming analysis."""
+    start_time = time.time()
+    digest = analysis_cache.content_hash(article.title, article.content)
+    cached = await analysis_cache.get_by_content(redis_client, article.url, digest)
+    if cached:
+        logger.info(f"Cache hit for {article.url}")
+        if analysis_cache.is_stale(cached):
+            await _enqueue_refresh(article, digest, redis_client)
+        yield "analysis", cached["result"]
+        yield "sources", cached["result"].get("sources", [])
+        yield "done", {"cached": True}
+        return
+    
+    stage_events: asyncio.Queue = asyncio.Queue()
+    
+    def on_stage(stage: str, value: Any, elapsed_ms: float, error: Optional[str]):
+        field = {"credibility": "credibilityScore", "sentiment": "sentiment", "bias": "biasTags"}[stage]
+        stage_events.put_nowait((stage, {field: value, "ms": round(elapsed_ms, 1), "degraded": bool(error)}))
+    
+    analysis = asyncio.create_task(coalesce(
+        f"analysis:{digest}",
+        lambda: _analyze_uncached(article, digest, redis_client, on_stage=on_stage),
+        redis_client=redis_client,
+        lookup=lambda: analysis_cache.peek(redis_client, article.url, digest)
+    ))
+    
+    try:
+        # Forward stage results until the analysis completes. A request that
+        # joined another one's analysis only receives the final result.
+        while not analysis.done() or not stage_events.empty():
+            next_event = asyncio.create_task(stage_events.get())
+            await asyncio.wait({analysis, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event.done():
+                yield next_event.result()
+            else:
+                next_event.cancel()
+        result = analysis.result()
+    except InferenceQueueFull as e:
+        logger.warning(f"Rejecting analysis for {article.url}: {str(e)}")
+        yield "error", {"status": 503, "detail": "Analysis service is busy, please retry shortly"}
+        return
+    except Exception as e:
+        logger.error(f"Error analyzing article: {str(e)}")
+        yield "error", {"status": 500, "detail": f"Analysis failed: {str(e)}"}
+        return
+    finally:
+        # The client went away mid-stream: stop waiting on the analysis
+        if not analysis.done():
+            analysis.cancel()
+    
+    yield "analysis", result
+    logger.info(f"Analysis completed in {time.time() - start_time:.2f}s")
+    
+    # Partial results are not cached and get no sources, as in POST /analyze.
+    # Otherwise the analysis queued a verify_sources job (whether this
+    # request or one it joined ran it); wait for its outcome rather than
+    # verifying again here, so a client that disconnects now still gets its
+    # sources cached and concurrent requests verify only once
+    sources = result.get("sources") or []
+    pending = False
+    if not sources and not result.get("partial"):
+        sources = await _wait_for_sources(redis_client, digest)
+        pending = sources is None
+    yield "sources", sources or []
+    yield "done", {"cached": False, "sourcesPending": pending}
+
+async def _wait_for_sources(redis_client, digest: str) -> Optional[List[Dict[str, Any]]]:
+    """Poll the cache for the verified sources; None if they did not arrive in time"""
+    deadline = time.monotonic() + STREAM_SOURCES_TIMEOUT
+    while True:
+        sources = await analysis_cache.verified_sources(redis_client, digest)
+        if sources is not None or time.monotonic() >= deadline:
+            return sources
+        await asyncio.sleep(STREAM_SOURCES_POLL_MS / 1000)
+
+@router.post("/analyze/batch")
+async def analyze_batch(
+    batch: BatchAnalysisRequest,
+    redis_client = Depends(get_redis)
+):
+    """
+    Analyze many articles in one request, e.g. to pre-warm the cache from feeds.
+    
+    Cached articles are answered from the cache; the rest are deduplicated by
+    content and analyzed in batched forward passes. Each item in the result
+    has a status of "cached", "analyzed" or "error".
+    """
+    if len(batch.articles) > BATCH_ENDPOINT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many articles: {len(batch.articles)} (max {BATCH_ENDPOINT_MAX_ITEMS})"
+        )
+    
+    logger.info(f"Batch analysis of {len(batch.articles)} articles")
+    items = _analyze_batch_items(batch.articles, redis_client)
+    
+    if batch.stream:
+        async def ndjson():
+            statuses = []
+            async for item in items:
+                statuses.append(item["status"])
+                yield json.dumps(item) + "\n"
+            yield json.dumps({"summary": _batch_summary(statuses)}) + "\n"
+        
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(batch.articles)
+    async for item in items:
+        results[item["index"]] = item
+    return {
+        "results": results,
+        "summary": _batch_summary([item["status"] for item in results])
+    }
+
+def _batch_summary(statuses: List[str]) -> Dict[str, int]:
+    return {
+        "total": len(statuses),
+        "cached": statuses.count("cached"),
+        "analyzed": statuses.count("analyzed"),
+        "errors": statuses.count("error")
+    }
+
+async def _analyze_batch_items(
+    articles: List[AnalysisRequest],
+    redis_client
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield one result item per article, in completion order."""
+    digests = [analysis_cache.content_hash(a.title, a.content) for a in articles]
+    cached = await analysis_cache.get_many(redis_client, digests)
+    
+    # Articles with the same content are analyzed once
+    pending: Dict[str, List[int]] = {}
+    for index, (article, digest) in enumerate(zip(articles, digests)):
+        if digest in cached:
+            if analysis_cache.is_stale(cached[digest]):
+                await _enqueue_refresh(article, digest, redis_client)
+            yield {"index": index, "url": article.url, "status": "cached", "result": cached[digest]["result"]}
+        else:
+            pending.setdefault(digest, []).append(index)
+    
+    unique = list(pending)
+    chunks = [unique[i:i + BATCH_MAX_SIZE] for i in range(0, len(unique), BATCH_MAX_SIZE)]
+    semaphore = asyncio.Semaphore(BATCH_ENDPOINT_CONCURRENCY)
+    
+    async def process(chunk: List[str]):
+        first = [articles[pending[digest][0]] for digest in chunk]
+        async with semaphore:
+            try:
+                results = await run_analysis_batch([(a.title, a.content) for a in first])
+            except Exception as e:
+                return chunk, None, e
+        
+        for digest, article, result in zip(chunk, first, results):
+            result["sources"] = []
+            await analysis_cache.store(redis_client, article.url, digest, result, published_at=article.publishedAt)
+            await _enqueue_sources(article, digest, result, redis_client)
+        return chunk, results, None
+    
+    tasks = [asyncio.create_task(process(chunk)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            chunk, results, error = await next_done
+            if error is not None:
+                logger.error(f"Batch chunk of {len(chunk)} failed: {str(error)}")
+                message = "Analysis service is busy" if isinstance(error, InferenceQueueFull) else str(error)
+            for position, digest in enumerate(chunk):
+                for index in pending[digest]:
+                    if error is not None:
+                        yield {"index": index, "url": articles[index].url, "status": "error", "error": message}
+                    else:
+                        yield {"index": index, "url": articles[index].url, "status": "analyzed", "result": results[position]}
+    finally:
+        # The client went away mid-stream: stop analyzing
+        for task in tasks:
+            task.cancel()
+
+async def _analyze_uncached(
+    article: AnalysisRequest,
+    digest: str,
+    redis_client,
+    on_stage: Optional[StageCallback] = None
+):
+    """Run the models for an article that is not cached and cache the result."""
+    # 1-4. Run credibility, sentiment and bias analysis concurrently.
+    # Model calls block, so they run on the inference executor, not the event loop
+    analysis = await run_analysis(article.title, article.content, on_stage=on_stage)
+    credibility_score = analysis["credibilityScore"]
+    sentiment = analysis["sentiment"]
+    bias_tags = analysis["biasTags"]
+    trust_level = analysis["trustLevel"]
+    
+    # 5. Cross-verify with other sources (queued as a job to not delay response)
+    # For MVP, we'll return empty sources and update the cache later
+    sources: List[SourceReference] = []
+    
+    result = {
+        "credibilityScore": float(credibility_score),
+        "sentiment": sentiment,
+        "biasTags": bias_tags,
+        "sources": sources,
+        "trustLevel": trust_level,
+        "timings": analysis["timings"],
+        "partial": analysis["partial"],
+        "degradedStages": analysis["degradedStages"]
+    }
+    
+    # Partial results are returned but never cached, so the next request retries
+    if analysis["partial"]:
+        logger.warning(f"Partial analysis for {article.url}: {analysis['degradedStages']} degraded")
+        return result
+    
+    # Cache the result (without sources initially)
+    await analysis_cache.store(redis_client, article.url, digest, result, published_at=article.publishedAt)
+    
+    # Queue a job to fetch sources
+    await _enqueue_sources(article, digest, result, redis_client)
+    return result
+
+async def _enqueue_sources(article: AnalysisRequest, digest: str, result: dict, redis_client):
+    await job_queue.enqueue(
+        "verify_sources",
+        {
+            "url": article.url,
+            "title": article.title,
+            "credibility_score": result["credibilityScore"],
+            "sentiment": result["sentiment"],
+            "bias_tags": result["biasTags"],
+            "trust_level": result["trustLevel"],
+            "digest": digest,
+            "published_at": article.publishedAt,
+            "content": article.content[:SIMILARITY_MAX_CHARS]
+        },
+        key=f"sources:{digest}",
+        redis_client=redis_client
+    )
+
+async def _enqueue_refresh(article: AnalysisRequest, digest: str, redis_client):
+    # The job key keeps concurrent stale hits from queueing the same refresh
+    await job_queue.enqueue(
+        "refresh_analysis",
+        {"article": article.model_dump(), "digest": digest},
+        key=f"refresh:{digest}",
+        redis_client=redis_client
+    )
+
+@job_queue.handler("refresh_analysis")
+async def refresh_analysis(payload: dict):
+    """
+    Job that refreshes a stale cache entry.
+
+    Entries are keyed by a hash of the content, so the model scores for it
+    cannot have changed; only the sources are looked up again. The article
+    is re-analyzed only if its entry has expired since the job was queued.
+    """
+    article = AnalysisRequest(**payload["article"])
+    digest = payload["digest"]
+    redis_client = get_redis()
+    cached = await analysis_cache.peek(redis_client, article.url, digest)
+    if cached is None:
+        await coalesce(f"analysis:{digest}", lambda: _analyze_uncached(article, digest, redis_client))
+        logger.info(f"Re-analyzed expired analysis for {article.url}")
+        return
+
+    sources = await update_with_sources(
+        url=article.url,
+        title=article.title,
+        credibility_score=cached["credibilityScore"],
+        sentiment=cached["sentiment"],
+        bias_tags=cached["biasTags"],
+        trust_level=cached["trustLevel"],
+        redis_client=redis_client,
+        digest=digest,
+        published_at=article.publishedAt,
+        content=article.content[:SIMILARITY_MAX_CHARS]
+    )
+    if sources is None:
+        # Raise so the job is retried with backoff
+        raise RuntimeError(f"Refreshing sources failed for {article.url}")
+    logger.info(f"Refreshed sources of stale analysis for {article.url}")
+
+@job_queue.handler("verify_sources")
+async def verify_sources(payload: dict):
+    """Job that cross-verifies an article and adds the sources to its cached result."""
+    if await update_with_sources(redis_client=get_redis(), **payload) is None:
+        # Raise so the job is retried with backoff
+        raise RuntimeError(f"Cross-verification failed for {payload['url']}")
+
+@tracing.traced("update_with_sources")
 async def update_with_sources(
     url: str, 
     title: str, 
@@ -95,34 +420,41 @@ async def update_with_sources(
     sentiment: str, 
     bias_tags: List[str], 
     trust_level: str, 
-    redis_client
+    redis_client,
+    digest: str,
+    published_at: Optional[int] = None,
+    content: Optional[str] = None
 ):
-    """Background task to fetch sources and update the cached result."""
+    """Fetch sources and update the cached result. Returns None on failure."""
     try:
         # Fetch verified sources
-        sources = await cross_verify_sources(url, title)
+        sources = await cross_verify_sources(url, title, content)
         
         # Update the result with sources
         result = {
             "credibilityScore": float(credibility_score),
             "sentiment": sentiment,
             "biasTags": bias_tags,
-            "sources": sources,
+            "sources": [source.model_dump() for source in sources],
             "trustLevel": trust_level
         }
         
         # Update cache if available
-        if redis_client:
-            redis_client.setex(
-                f"article:{url}", 
-                3600,  # Cache for 1 hour
-                json.dumps(result)
-            )
+        await analysis_cache.store(
+            redis_client, url, digest, result, published_at=published_at, invalidate=True,
+            sources_verified=True
+        )
             
         logger.info(f"Updated {url} with {len(sources)} sources")
         
+        # Later articles on the same story can be matched against this one
+        if content:
+            await index_trusted_article(digest, url, title, content, redis_client)
+        return result["sources"]
+        
     except Exception as e:
         logger.error(f"Error updating sources for {url}: {str(e)}")
+        return None
 
 @router.get("/analyze/{url:path}")
 async def get_analysis(url: str, redis_client = Depends(get_redis)):
@@ -132,11 +464,11 @@ async def get_analysis(url: str, redis_client = Depends(get_redis)):
     if not redis_client:
         raise HTTPException(status_code=501, detail="Caching not available")
     
-    cached_result = redis_client.get(f"article:{url}")
+    cached_result = await analysis_cache.get_by_url(redis_client, url)
     if not cached_result:
         raise HTTPException(status_code=404, detail="Analysis not found for this URL")
     
-    return json.loads(cached_result)
+    return cached_result
 
 @router.post("/save_verification")
 async def save_verification(
@@ -145,7 +477,7 @@ async def save_verification(
     redis_client = Depends(get_redis)
 ):
     """
-    Save article verification to database instead of blockchain.
+    Save article verification to the database instead of the blockchain.
     """
     logger.info(f"Saving verification for article: {verification.get('url')}")
     
@@ -163,24 +495,23 @@ async def save_verification(
             "trustLevel": verification.get("trustLevel")
         }
         
-        # Store in Redis (or you could use a database in production)
+        await run_in_threadpool(db_service.save_verification, verification_data)
+        
+        # Cache in Redis for quick lookups by ID and URL
         if redis_client:
-            # Store by ID
-            redis_client.set(
+            # Store by ID and index by URL in a single round trip
+            pipe = redis_client.pipeline()
+            pipe.set(
                 f"verification:{verification_id}", 
                 json.dumps(verification_data),
                 ex=2592000  # Cache for 30 days
             )
-            
-            # Also index by URL
-            redis_client.set(
+            pipe.set(
                 f"verification:url:{verification_data['url']}", 
                 json.dumps(verification_data),
                 ex=2592000  # Cache for 30 days
             )
-        else:
-            logger.warning("Redis not available, logging verification only")
-            logger.info(f"Verification data: {verification_data}")
+            await pipe.execute()
         
         return verification_data
     
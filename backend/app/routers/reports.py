@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import time
+import json
 from app.utils.redis_client import get_redis
 from app.utils.db_service import save_report, get_reports_by_url, get_report_stats
 from loguru import logger
@@ -31,13 +33,14 @@ async def submit_report(report: UserReport, redis_client = Depends(get_redis)):
             report_data["timestamp"] = int(time.time())
         
         # Save to database service
-        saved_report = save_report(report_data)
+        saved_report = await run_in_threadpool(save_report, report_data)
         
-        # Also cache in Redis if available
+        # Also cache in Redis if available (push and expiry in one round trip)
         if redis_client:
-            redis_client.lpush(f"reports:{report.articleUrl}", 
-                             saved_report)
-            redis_client.expire(f"reports:{report.articleUrl}", 7776000)  # 90 days
+            pipe = redis_client.pipeline()
+            pipe.lpush(f"reports:{report.articleUrl}", json.dumps(saved_report))
+            pipe.expire(f"reports:{report.articleUrl}", 7776000)  # 90 days
+            await pipe.execute()
         
         return {"success": True, "message": "Report submitted successfully"}
     
@@ -45,6 +48,22 @@ async def submit_report(report: UserReport, redis_client = Depends(get_redis)):
         logger.error(f"Error submitting report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to submit report: {str(e)}")
 
+# Registered before /reports/{article_url:path}, which would otherwise match it
+@router.get("/reports/stats")
+async def get_report_statistics(top: int = Query(10, ge=1, le=100)):
+    """
+    Get report statistics (admin endpoint): totals per reason and the most
+    reported URLs, all-time and for the last hour and day.
+    """
+    try:
+        # Get stats from database service
+        stats = await run_in_threadpool(get_report_stats, top)
+        return stats
+    
+    except Exception as e:
+        logger.error(f"Error retrieving report stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve report stats: {str(e)}")
+
 @router.get("/reports/{article_url:path}")
 async def get_reports_for_article(article_url: str, redis_client = Depends(get_redis)):
     """
@@ -52,32 +71,18 @@ async def get_reports_for_article(article_url: str, redis_client = Depends(get_r
     """
     try:
         # Get reports from database service
-        reports = get_reports_by_url(article_url)
+        reports = await run_in_threadpool(get_reports_by_url, article_url)
         
         if not reports and redis_client:
             # Try to get from Redis cache if not in DB
             report_key = f"reports:{article_url}"
-            report_list = redis_client.lrange(report_key, 0, -1)
+            report_list = await redis_client.lrange(report_key, 0, -1)
             
             if report_list:
-                reports = [report_list for report in report_list]
+                reports = [json.loads(report) for report in report_list]
         
         return {"reports": reports or []}
     
     except Exception as e:
         logger.error(f"Error retrieving reports: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve reports: {str(e)}")
-
-@router.get("/reports/stats")
-async def get_report_statistics():
-    """
-    Get report statistics (admin endpoint).
-    """
-    try:
-        # Get stats from database service
-        stats = get_report_stats()
-        return stats
-    
-    except Exception as e:
-        logger.error(f"Error retrieving report stats: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve report stats: {str(e)}") 
\ No newline at end of file
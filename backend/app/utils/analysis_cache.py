@@ -0,0 +1,524 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import math
+import uuid
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from loguru import logger
+
+from app.utils import stats, tracing
+
+# Content-addressed cache for analysis results.
+# Results are stored under a hash of the normalized title and content, so
+# the same article reached through tracking links, AMP pages or syndicated
+# URLs reuses one inference result, and an article whose content changed
+# gets a fresh analysis. A second key maps each canonical URL to the hash of
+# the content last seen there, for lookups that only have a URL.
+#
+#   article:content:{hash}   -> analysis result JSON
+#   article:url:{canonical}  -> content hash
+#
+# Each worker also keeps a small in-process LRU/TTL cache in front of Redis,
+# so the hottest articles are served without a network hop, and recently
+# seen results keep being served while Redis is unavailable. When an entry is
+# rewritten (e.g. once sources are added) the writer publishes its hash on
+# INVALIDATION_CHANNEL and every other worker drops its local copy.
+#
+# Entries have a soft and a hard expiry (stale-while-revalidate). Past the
+# soft TTL an entry is still served, but the caller should refresh it in the
+# background; past the hard TTL Redis drops it. Both TTLs adapt to the
+# article: old articles rarely change and popular ones are expensive to miss,
+# so they live longer, while breaking news is refreshed sooner.
+
+CACHE_SOFT_TTL = int(os.getenv("CACHE_SOFT_TTL", os.getenv("ANALYSIS_CACHE_TTL", "3600")))
+CACHE_HARD_TTL = int(os.getenv("CACHE_HARD_TTL", "86400"))
+CACHE_MAX_TTL = int(os.getenv("CACHE_MAX_TTL", "604800"))
+CACHE_POPULARITY_WINDOW = 86400
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "1024"))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "60"))
+INVALIDATION_CHANNEL = "truthlens:cache:invalidate"
+
+# Identifies this process as the sender of invalidation messages. PIDs are
+# not unique across containers (every container's worker can be PID 7), and
+# with gunicorn's preload the module is imported before fork, so each forked
+# child draws its own id.
+_instance_id = uuid.uuid4().hex
+
+def _new_instance_id():
+    global _instance_id
+    _instance_id = uuid.uuid4().hex
+
+os.register_at_fork(after_in_child=_new_instance_id)
+
+# Query parameters that only track the visitor and never change the article
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid",
+    "ocid", "cmpid", "ref", "ref_src", "ref_url", "smid", "_ga", "amp",
+    "outputtype", "s_cid",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Shared by the in-process caches (analysis results, provider lookups) and
+# the Redis tier. For analysis lookups, a Redis-tier miss means Redis was
+# asked after the local tier missed and did not have the result either.
+cache_hits = stats.counter("cache_hits", "Lookups served, by cache and tier", labelnames=("cache", "tier"))
+cache_misses = stats.counter("cache_misses", "Lookups not found, by cache and tier", labelnames=("cache", "tier"))
+cache_stale_hits = stats.counter(
+    "cache_stale_hits", "Expired in-process entries served while Redis was unavailable", labelnames=("cache",)
+)
+cache_evictions = stats.counter("cache_evictions", "Entries evicted from an in-process cache by size", labelnames=("cache",))
+cache_invalidations = stats.counter(
+    "cache_invalidations", "In-process entries dropped by invalidation", labelnames=("cache",)
+)
+cache_dedupes = stats.counter(
+    "analysis_cache_dedupes", "Cache hits for a URL that had not been seen with this content"
+)
+
+redis_hits = cache_hits.labels(cache="analysis", tier="redis")
+redis_misses = cache_misses.labels(cache="analysis", tier="redis")
+
+class LocalCache:
+    """
+    Size-bounded LRU cache with a per-entry TTL.
+
+    Expired entries are kept until they are evicted so that `get_stale` can
+    still return them when the shared cache cannot be reached.
+    """
+
+    def __init__(self, max_size: int = LOCAL_CACHE_SIZE, ttl: float = LOCAL_CACHE_TTL, name: str = "analysis"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = cache_hits.labels(cache=name, tier="local")
+        self.misses = cache_misses.labels(cache=name, tier="local")
+        self.stale_hits = cache_stale_hits.labels(cache=name)
+        self.evictions = cache_evictions.labels(cache=name)
+        self.invalidations = cache_invalidations.labels(cache=name)
+
+    def get(self, key: str, record: bool = True) -> Optional[Any]:
+        """Return a fresh entry; `record` counts the lookup in the hit rate"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if record:
+                self.misses.inc()
+            return None
+        self._entries.move_to_end(key)
+        if record:
+            self.hits.inc()
+        return entry[1]
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.stale_hits.inc()
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions.inc()
+
+    def delete(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations.inc()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+local_cache = LocalCache()
+
+stale_served = stats.counter("analysis_cache_stale_served", "Stale results served while revalidating")
+lookup_time = stats.histogram(
+    "cache_lookup_ms", "Time to look up an analysis by content (both tiers)", (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+)
+
+# Lookups per content hash not yet added to the shared popularity counter
+_pending_hits: Dict[str, int] = {}
+_MAX_PENDING_HITS = 10000
+
+def adaptive_ttl(hits: int, published_at: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Return (soft, hard) TTLs in seconds for an article.
+
+    Scales the configured TTLs up with request frequency (hits in the last
+    day) and article age, and down for articles published in the last few
+    hours, which are still likely to be edited.
+    """
+    factor = 1.0 + min(math.log2(1 + hits / 10), 3.0)
+    if published_at:
+        age_hours = (time.time() - published_at) / 3600
+        if age_hours < 6:
+            factor *= 0.5
+        elif age_hours > 24 * 7:
+            factor *= 4
+        elif age_hours > 48:
+            factor *= 2
+
+    soft = int(min(max(CACHE_SOFT_TTL * factor, 60), CACHE_MAX_TTL))
+    hard = int(min(max(CACHE_HARD_TTL * factor, soft), CACHE_MAX_TTL))
+    return soft, max(hard, soft)
+
+def is_stale(entry: Dict[str, Any]) -> bool:
+    """True when a cache entry is past its soft TTL"""
+    return time.time() - entry.get("storedAt", 0) > entry.get("softTtl", CACHE_SOFT_TTL)
+
+def _unwrap(raw: str) -> Dict[str, Any]:
+    data = json.loads(raw)
+    if "result" in data and "storedAt" in data:
+        return data
+    # Entries written before soft/hard expiry existed hold the bare result
+    return {"result": data, "storedAt": 0, "softTtl": CACHE_SOFT_TTL, "hardTtl": CACHE_HARD_TTL}
+
+def _remaining_ttl(entry: Dict[str, Any]) -> int:
+    """Seconds until Redis drops the entry, for keys that should expire with it"""
+    hard_ttl = entry.get("hardTtl", CACHE_HARD_TTL)
+    if not entry.get("storedAt"):
+        # Written before entries recorded when they were stored
+        return hard_ttl
+    return max(1, math.ceil(entry["storedAt"] + hard_ttl - time.time()))
+
+def _count_hit(digest: str):
+    if len(_pending_hits) >= _MAX_PENDING_HITS:
+        _pending_hits.clear()
+    _pending_hits[digest] = _pending_hits.get(digest, 0) + 1
+
+async def _popularity(redis_client, digest: str) -> int:
+    """Add this worker's pending lookups to the shared counter and return the total"""
+    pending = _pending_hits.pop(digest, 0)
+    if not redis_client:
+        _pending_hits[digest] = pending
+        return pending
+
+    pipe = redis_client.pipeline()
+    pipe.incrby(f"article:hits:{digest}", pending)
+    pipe.expire(f"article:hits:{digest}", CACHE_POPULARITY_WINDOW)
+    values = await pipe.execute()
+    return int(values[0]) if values else pending
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a URL to a canonical form.
+
+    Lowercases the scheme and host, drops "www.", "m." and "amp." prefixes,
+    default ports, fragments, tracking parameters and AMP path variants,
+    unwraps Google AMP cache URLs and sorts the remaining query parameters.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+    scheme = (parts.scheme or "https").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+
+    # https://example-com.cdn.ampproject.org/c/s/example.com/story -> example.com/story
+    if host.endswith(".cdn.ampproject.org"):
+        segments = [s for s in path.split("/") if s]
+        while segments and segments[0] in ("c", "v", "s", "i", "wp"):
+            segments.pop(0)
+        if segments:
+            host, port = segments[0].lower(), None
+            path = "/" + "/".join(segments[1:])
+
+    for prefix in ("www.", "m.", "amp."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+
+    # /story/amp, /story/amp/ and /story.amp.html variants. An "amp" segment
+    # elsewhere in the path is part of the article's address
+    path = re.sub(r"/amp/?$", "/", path)
+    path = re.sub(r"\.amp(\.html?)$", r"\1", path)
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+
+    # A non-default port can serve a different site
+    if port is not None and port != {"http": 80, "https": 443}.get(scheme):
+        host = f"{host}:{port}"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+def content_hash(title: str, content: str) -> str:
+    """Fast hash of the normalized title and content"""
+    normalized = unicodedata.normalize("NFKC", f"{title}\n{content}").lower()
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+def _content_key(digest: str) -> str:
+    return f"article:content:{digest}"
+
+def _url_key(url: str) -> str:
+    return f"article:url:{canonicalize_url(url)}"
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+async def get_by_content(redis_client, url: str, digest: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up an entry by content hash and remember that `url` serves it.
+
+    Returns the cache entry ({"result", "storedAt", "softTtl", "hardTtl"});
+    check it with is_stale() to decide whether to revalidate.
+    """
+    start = time.perf_counter()
+    with tracing.span("cache.lookup", **{"cache.digest": digest}) as current:
+        try:
+            entry = await _lookup_content(redis_client, url, digest)
+            current.set_attribute("cache.hit", entry is not None)
+            return entry
+        finally:
+            lookup_time.observe((time.perf_counter() - start) * 1000)
+
+async def _lookup_content(redis_client, url: str, digest: str) -> Optional[Dict[str, Any]]:
+    content_key, url_key = _content_key(digest), _url_key(url)
+    _count_hit(digest)
+
+    entry = local_cache.get(content_key)
+    known_digest = local_cache.get(url_key, record=False)
+    if entry is not None and known_digest == digest:
+        if is_stale(entry):
+            stale_served.inc()
+        return entry
+
+    # Whether known_digest is authoritative: this worker's LRU only knows the
+    # URLs it has seen itself, so without Redis asking it is not a new URL
+    url_checked = redis_client is None
+    if redis_client and redis_client.available:
+        if entry is None:
+            # Entry and URL mapping in one round trip
+            values = await redis_client.mget(content_key, url_key)
+            if values:
+                cached, known_digest = values
+                known_digest = _decode(known_digest)
+                url_checked = True
+                if cached:
+                    redis_hits.inc()
+                    entry = _unwrap(cached)
+                    local_cache.set(content_key, entry)
+                else:
+                    redis_misses.inc()
+        else:
+            known_digest = await redis_client.get(url_key)
+            if known_digest is not None or redis_client.available:
+                known_digest = _decode(known_digest)
+                url_checked = True
+    elif entry is None:
+        # Redis is unavailable: fall back to whatever this worker still has
+        entry = local_cache.get_stale(content_key)
+
+    if entry is None:
+        return None
+
+    if url_checked and known_digest != digest:
+        # Same content reached through a new URL: reuse the existing result
+        cache_dedupes.inc()
+        if redis_client:
+            await redis_client.setex(url_key, _remaining_ttl(entry), digest)
+        logger.info(f"Reusing cached analysis {digest} for {canonicalize_url(url)}")
+    local_cache.set(url_key, digest)
+
+    if is_stale(entry):
+        stale_served.inc()
+    return entry
+
+@tracing.traced("cache.lookup_many")
+async def get_many(redis_client, digests: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up many content hashes at once: local cache first, then a single
+    MGET for the rest. Returns the entries found, keyed by hash.
+    """
+    found: Dict[str, Dict[str, Any]] = {}
+    remaining = []
+    for digest in dict.fromkeys(digests):
+        _count_hit(digest)
+        entry = local_cache.get(_content_key(digest))
+        if entry is not None:
+            found[digest] = entry
+        else:
+            remaining.append(digest)
+
+    if remaining and redis_client and redis_client.available:
+        values = await redis_client.mget(*[_content_key(d) for d in remaining]) or []
+        for digest, cached in zip(remaining, values):
+            if cached:
+                redis_hits.inc()
+                found[digest] = _unwrap(cached)
+                local_cache.set(_content_key(digest), found[digest])
+
+    redis_misses.inc(len(set(remaining) - set(found)))
+    return found
+
+async def peek(redis_client, url: str, digest: str) -> Optional[Dict[str, Any]]:
+    """
+    Return a cached result without counting the lookup in the cache stats.
+
+    Used when polling for a result that another worker is computing.
+    """
+    content_key = _content_key(digest)
+    entry = local_cache.get(content_key, record=False)
+    if entry is None and redis_client:
+        cached = await redis_client.get(content_key)
+        if not cached:
+            return None
+        entry = _unwrap(cached)
+        local_cache.set(content_key, entry)
+        await redis_client.setex(_url_key(url), _remaining_ttl(entry), digest)
+    if entry is None:
+        return None
+    local_cache.set(_url_key(url), digest)
+    return entry["result"]
+
+async def verified_sources(redis_client, digest: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    The sources of a cached result once they have been cross-verified, or
+    None while verification is pending. Used when polling for the outcome of
+    a verify_sources job, which may run in another worker.
+    """
+    content_key = _content_key(digest)
+    entry = local_cache.get(content_key, record=False)
+    if (entry is None or not entry.get("sourcesVerified")) and redis_client:
+        cached = await redis_client.get(content_key)
+        entry = _unwrap(cached) if cached else None
+    if entry is None or not entry.get("sourcesVerified"):
+        return None
+    return entry["result"].get("sources") or []
+
+async def get_by_url(redis_client, url: str) -> Optional[Dict[str, Any]]:
+    """Look up the result for the content last seen at `url`"""
+    url_key = _url_key(url)
+
+    digest = local_cache.get(url_key, record=False)
+    if digest is not None:
+        entry = local_cache.get(_content_key(digest))
+        if entry is not None:
+            return entry["result"]
+
+    if not redis_client or not redis_client.available:
+        digest = digest or local_cache.get_stale(url_key)
+        entry = local_cache.get_stale(_content_key(digest)) if digest else None
+        return entry["result"] if entry else None
+
+    digest = _decode(await redis_client.get(url_key))
+    if not digest:
+        return None
+
+    cached = await redis_client.get(_content_key(digest))
+    if not cached:
+        return None
+
+    entry = _unwrap(cached)
+    local_cache.set(url_key, digest)
+    local_cache.set(_content_key(digest), entry)
+    return entry["result"]
+
+async def store(
+    redis_client,
+    url: str,
+    digest: str,
+    result: Dict[str, Any],
+    published_at: Optional[int] = None,
+    invalidate: bool = False,
+    sources_verified: bool = False
+):
+    """
+    Cache a result under its content hash and map the URL to it.
+
+    TTLs come from adaptive_ttl(). Set `invalidate` when rewriting an
+    existing entry so that other workers drop their local copy, and
+    `sources_verified` once the result's sources have been cross-verified.
+    """
+    content_key, url_key = _content_key(digest), _url_key(url)
+    soft_ttl, hard_ttl = adaptive_ttl(await _popularity(redis_client, digest), published_at)
+    entry = {
+        "result": result, "storedAt": time.time(), "softTtl": soft_ttl, "hardTtl": hard_ttl,
+        "sourcesVerified": sources_verified,
+    }
+
+    local_ttl = min(LOCAL_CACHE_TTL, soft_ttl)
+    local_cache.set(content_key, entry, ttl=local_ttl)
+    local_cache.set(url_key, digest, ttl=local_ttl)
+
+    if not redis_client:
+        return
+
+    pipe = redis_client.pipeline()
+    pipe.setex(content_key, hard_ttl, json.dumps(entry))
+    pipe.setex(url_key, hard_ttl, digest)
+    if invalidate:
+        pipe.publish(INVALIDATION_CHANNEL, f"{_instance_id}:{digest}")
+    await pipe.execute()
+
+async def listen_for_invalidations(redis_client):
+    """
+    Drop local entries that another worker rewrote.
+
+    Runs for the lifetime of the worker and resubscribes after errors.
+    """
+    delay = 1.0
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            delay = 1.0
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                sender, _, digest = _decode(message["data"]).partition(":")
+                # The publishing worker already holds the new value
+                if sender != _instance_id:
+                    local_cache.delete(_content_key(digest))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener error, retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
+
+def _hit_rate(hits: float, misses: float) -> Optional[float]:
+    lookups = hits + misses
+    return round(hits / lookups, 3) if lookups else None
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "local": {
+            "size": len(local_cache),
+            "maxSize": local_cache.max_size,
+            "hits": local_cache.hits.value,
+            "misses": local_cache.misses.value,
+            "staleHits": local_cache.stale_hits.value,
+            "evictions": local_cache.evictions.value,
+            "invalidations": local_cache.invalidations.value,
+            "hitRate": _hit_rate(local_cache.hits.value, local_cache.misses.value),
+        },
+        "redis": {
+            "hits": redis_hits.value,
+            "hitRate": _hit_rate(redis_hits.value, redis_misses.value),
+        },
+        "misses": redis_misses.value,
+        "dedupes": cache_dedupes.value,
+        "staleServed": stale_served.value,
+    }
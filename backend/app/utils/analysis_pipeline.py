@@ -0,0 +1,178 @@
+import os
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from app.utils.model_service import (
+    get_credibility_score, get_sentiment, extract_bias_tags,
+    get_credibility_scores, get_sentiments, extract_bias_tags_batch
+)
+from app.utils.inference_executor import run_inference, InferenceQueueFull
+from app.utils.batching import batching_enabled, get_batcher
+from app.utils import stats, tracing
+
+# Analysis pipeline: the credibility, sentiment and bias analyzers are
+# independent, so they are fanned out together and joined. Request latency is
+# then the slowest stage instead of the sum of all three. Each stage has its
+# own timeout; a stage that fails or times out is replaced by a neutral
+# fallback and reported in `degradedStages` instead of failing the request.
+# With BATCHING_ENABLED each stage goes through its model's micro-batcher so
+# concurrent requests share forward passes.
+
+DEFAULT_STAGE_TIMEOUT = float(os.getenv("ANALYSIS_STAGE_TIMEOUT", "2.0"))
+
+# Values used when a stage does not finish in time
+STAGE_FALLBACKS: Dict[str, Any] = {
+    "credibility": 0.5,
+    "sentiment": "neutral",
+    "bias": [],
+}
+
+STAGE_BUCKETS = (5, 10, 25, 50, 100, 150, 250, 500, 1000, 2000, 5000)
+stage_time = stats.histogram("analysis_stage_ms", "Time for each analyzer", STAGE_BUCKETS, labelnames=("stage",))
+stage_degraded = stats.counter(
+    "analysis_stage_degraded", "Analyzer results replaced by the fallback", labelnames=("stage",)
+)
+analysis_time = stats.histogram("analysis_ms", "Time for a full analysis (slowest stage)", STAGE_BUCKETS)
+
+def _stage_timeout(stage: str) -> float:
+    """Per-stage timeout in seconds, e.g. SENTIMENT_STAGE_TIMEOUT=0.5"""
+    value = os.getenv(f"{stage.upper()}_STAGE_TIMEOUT")
+    return float(value) if value else DEFAULT_STAGE_TIMEOUT
+
+def get_trust_level(credibility_score: float) -> str:
+    """Map a credibility score to a trust level"""
+    return "high" if credibility_score >= 0.7 else "medium" if credibility_score >= 0.4 else "low"
+
+async def _run_stage(
+    stage: str,
+    call: Callable[[], Awaitable[Any]],
+    timeout: float
+) -> Tuple[Any, float, Optional[str]]:
+    """Run one analyzer and return (value, elapsed_ms, error)."""
+    start = time.perf_counter()
+    with tracing.span(f"analysis.{stage}") as current:
+        try:
+            value = await asyncio.wait_for(call(), timeout=timeout)
+            return value, (time.perf_counter() - start) * 1000, None
+        except InferenceQueueFull:
+            # Overload is not a per-stage problem; let the caller refuse the request
+            raise
+        except asyncio.TimeoutError:
+            # A call that already started keeps its worker until it finishes and
+            # keeps counting against the executor's bound; one still queued is dropped
+            logger.warning(f"Analysis stage '{stage}' timed out after {timeout:.2f}s")
+            current.set_attribute("analysis.degraded", "timeout")
+            return STAGE_FALLBACKS[stage], (time.perf_counter() - start) * 1000, "timeout"
+        except Exception as e:
+            logger.error(f"Analysis stage '{stage}' failed: {str(e)}")
+            current.set_attribute("analysis.degraded", "error")
+            return STAGE_FALLBACKS[stage], (time.perf_counter() - start) * 1000, "error"
+
+# Called as on_stage(stage, value, elapsed_ms, error) as each stage finishes
+StageCallback = Callable[[str, Any, float, Optional[str]], None]
+
+@tracing.traced("analysis.run")
+async def run_analysis(
+    title: str,
+    content: str,
+    on_stage: Optional[StageCallback] = None
+) -> Dict[str, Any]:
+    """
+    Run all analyzers for an article concurrently.
+
+    Returns the analysis fields plus `timings` (milliseconds per stage and in
+    total), `partial` and `degradedStages`. `on_stage` is notified as soon as
+    each stage finishes, for callers that stream progressive results.
+    """
+    start = time.perf_counter()
+    if batching_enabled():
+        stages = {
+            "credibility": lambda: get_batcher("credibility").submit((title, content)),
+            "sentiment": lambda: get_batcher("sentiment").submit(content),
+            "bias": lambda: get_batcher("bias").submit(content),
+        }
+    else:
+        stages = {
+            "credibility": lambda: run_inference(get_credibility_score, title, content),
+            "sentiment": lambda: run_inference(get_sentiment, content),
+            "bias": lambda: run_inference(extract_bias_tags, content),
+        }
+
+    async def run_and_report(stage: str, call: Callable[[], Awaitable[Any]]):
+        outcome = await _run_stage(stage, call, _stage_timeout(stage))
+        stage_time.labels(stage=stage).observe(outcome[1])
+        if outcome[2]:
+            stage_degraded.labels(stage=stage).inc()
+        if on_stage:
+            on_stage(stage, *outcome)
+        return outcome
+
+    tasks = {
+        stage: asyncio.create_task(run_and_report(stage, call))
+        for stage, call in stages.items()
+    }
+    try:
+        await asyncio.gather(*tasks.values())
+    except InferenceQueueFull:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    results = {stage: task.result() for stage, task in tasks.items()}
+    timings = {stage: round(elapsed, 1) for stage, (_, elapsed, _) in results.items()}
+    timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+    analysis_time.observe(timings["total"])
+    degraded: List[str] = [stage for stage, (_, _, error) in results.items() if error]
+
+    credibility_score = float(results["credibility"][0])
+    return {
+        "credibilityScore": credibility_score,
+        "sentiment": results["sentiment"][0],
+        "biasTags": results["bias"][0],
+        "trustLevel": get_trust_level(credibility_score),
+        "timings": timings,
+        "partial": bool(degraded),
+        "degradedStages": degraded,
+    }
+
+async def _timed(call: Awaitable[Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    value = await call
+    return value, round((time.perf_counter() - start) * 1000, 1)
+
+@tracing.traced("analysis.run_batch")
+async def run_analysis_batch(articles: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Analyze a list of (title, content) pairs with one forward pass per model.
+
+    The three models run concurrently on the batch. Unlike run_analysis there
+    are no per-stage fallbacks: if a model fails, the whole batch raises.
+    """
+    contents = [content for _, content in articles]
+    (scores, credibility_ms), (sentiments, sentiment_ms), (bias_tags, bias_ms) = await asyncio.gather(
+        _timed(run_inference(get_credibility_scores, articles)),
+        _timed(run_inference(get_sentiments, contents)),
+        _timed(run_inference(extract_bias_tags_batch, contents)),
+    )
+
+    timings = {
+        "credibility": credibility_ms,
+        "sentiment": sentiment_ms,
+        "bias": bias_ms,
+        "total": max(credibility_ms, sentiment_ms, bias_ms),
+        "batchSize": len(articles),
+    }
+    return [
+        {
+            "credibilityScore": float(score),
+            "sentiment": sentiment,
+            "biasTags": tags,
+            "trustLevel": get_trust_level(float(score)),
+            "timings": timings,
+            "partial": False,
+            "degradedStages": [],
+        }
+        for score, sentiment, tags in zip(scores, sentiments, bias_tags)
+    ]
@@ -0,0 +1,135 @@
+import os
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from loguru import logger
+
+from app.utils import stats, tracing
+from app.utils.inference_executor import run_inference, InferenceQueueFull
+from app.utils.model_service import get_credibility_scores, get_sentiments, extract_bias_tags_batch
+
+# Dynamic micro-batching for model inference.
+# Concurrent analyze requests are collected for up to BATCH_MAX_WAIT_MS or
+# BATCH_MAX_SIZE items, whichever comes first, and then run through the model
+# as one padded batch on the inference executor. Each waiting request gets its
+# own slice of the batch result back through a future.
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "256"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500)
+
+def batching_enabled() -> bool:
+    return os.getenv("BATCHING_ENABLED", "true").lower() == "true"
+
+class MicroBatcher:
+    """
+    Collects single items and runs them through `batch_func` in batches.
+
+    `batch_func` takes a list of items and returns a list of results in the
+    same order. It is blocking and runs on the inference executor.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_func: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        max_queue: int = BATCH_MAX_QUEUE
+    ):
+        self.name = name
+        self.batch_func = batch_func
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue = max_queue
+        self._queue: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batch_sizes = stats.histogram(
+            "batch_size", "Items per model batch", BATCH_SIZE_BUCKETS, labelnames=("model",)
+        ).labels(model=name)
+        self.queue_wait = stats.histogram(
+            "batch_queue_wait_ms", "Time items wait for a model batch", QUEUE_WAIT_BUCKETS, labelnames=("model",)
+        ).labels(model=name)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        if len(self._queue) >= self.max_queue:
+            raise InferenceQueueFull(f"{self.name} batch queue is full ({len(self._queue)} items)")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((item, future, time.perf_counter()))
+
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            batch = self._queue[:self.max_batch_size]
+            self._queue = self._queue[self.max_batch_size:]
+            task = asyncio.ensure_future(self._run_batch(batch))
+            # Keep a reference so the running batch is not garbage collected
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        now = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            self.queue_wait.observe((now - enqueued_at) * 1000)
+
+        # Callers that timed out no longer need a result
+        live = [(item, future) for item, future, _ in batch if not future.done()]
+        if not live:
+            return
+
+        try:
+            # The span belongs to the trace of the request that opened the batch
+            with tracing.span(f"batch.{self.name}", **{"batch.size": len(live)}):
+                results = await run_inference(self.batch_func, [item for item, _ in live])
+        except Exception as e:
+            if not isinstance(e, InferenceQueueFull):
+                logger.error(f"{self.name} batch of {len(live)} failed: {str(e)}")
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(live, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "maxBatchSize": self.max_batch_size,
+            "maxWaitMs": self.max_wait * 1000,
+            "queued": len(self._queue),
+            "running": len(self._tasks),
+        }
+
+_batchers: Dict[str, MicroBatcher] = {}
+
+_BATCH_FUNCS: Dict[str, Callable[[List[Any]], List[Any]]] = {
+    "credibility": get_credibility_scores,
+    "sentiment": get_sentiments,
+    "bias": extract_bias_tags_batch,
+}
+
+def get_batcher(name: str) -> MicroBatcher:
+    """Return the batcher for a model, creating it on first use"""
+    if name not in _batchers:
+        _batchers[name] = MicroBatcher(name, _BATCH_FUNCS[name])
+    return _batchers[name]
@@ -0,0 +1,678 @@
+import os
+import re
+import json
+import time
+import uuid
+import zlib
+import fcntl
+import hashlib
+import pathlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from loguru import logger
+
+from app.utils import stats
+from app.utils.model_service import MODEL_DIR, MODEL_QUANTIZED
+
+# Semantic index of trusted-outlet articles (sentence embeddings).
+# The MinHash index (app/utils/similarity_index.py) finds copies and light
+# rewrites of an article; this one finds coverage of the same story written
+# in different words. Each article is embedded once, by the ONNX sentence
+# encoder in MODEL_DIR/embedding when one has been exported
+# (scripts/export_onnx.py --models embedding) or by a feature-hashing
+# fallback otherwise, and appended to a matrix on disk that every process
+# memory-maps, so the OS page cache holds a single copy:
+#
+#   {EMBEDDING_DIR}/meta.json    dimensions, storage type and embedder name
+#   {EMBEDDING_DIR}/vectors.bin  unit vectors, row-major int8 (or float16)
+#   {EMBEDDING_DIR}/scales.bin   float32 scale per row (int8 only)
+#   {EMBEDDING_DIR}/rows.bin     id hash and docs.jsonl offset per row
+#   {EMBEDDING_DIR}/docs.jsonl   one {"id", "meta"} line per row
+#   {EMBEDDING_DIR}/ivf.json     the current IVF index (ivf-*.npy files)
+#
+# A row exists once its docs.jsonl line is written, so readers never see a
+# half-written vector; writers in different processes take an flock. Ids and
+# metadata are read from docs.jsonl only for the rows a query returns. Below
+# EMBEDDING_IVF_THRESHOLD rows a query scans the whole matrix in chunks
+# (cosine similarity is a dot product of unit vectors). Above it an
+# inverted-file index (k-means centroids, about sqrt(rows) lists) is built
+# in the background by whichever process gets .ivf.lock first and saved
+# next to the vectors, where the other processes memory-map it; a query
+# only scores the rows of the EMBEDDING_IVF_NPROBE closest lists, plus rows
+# added since the last build. Past EMBEDDING_MAX_ROWS the writer compacts
+# the store to its newest rows and the others remap.
+# int8 rows with a per-row scale are the default: half the size of float16,
+# and NumPy converts them to float32 for the dot products about three times
+# faster, which is what a scan spends most of its time on.
+
+# auto uses the ONNX encoder when it has been exported; off disables the store
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "auto").lower()
+EMBEDDING_DIR = os.getenv("EMBEDDING_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "data", "embeddings"))
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "int8").lower()
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+EMBEDDING_MAX_CHARS = int(os.getenv("EMBEDDING_MAX_CHARS", "2000"))
+# Cosine similarity for a match; defaults to 0.6 for the ONNX encoder and
+# 0.35 for feature hashing, whose scores run lower for paraphrases
+EMBEDDING_MIN_SCORE = os.getenv("EMBEDDING_MIN_SCORE")
+EMBEDDING_SCAN_CHUNK = int(os.getenv("EMBEDDING_SCAN_CHUNK", "65536"))
+EMBEDDING_IVF_THRESHOLD = int(os.getenv("EMBEDDING_IVF_THRESHOLD", "50000"))
+EMBEDDING_IVF_NPROBE = int(os.getenv("EMBEDDING_IVF_NPROBE", "16"))
+# Rebuild the IVF index once this fraction of rows has been added since
+EMBEDDING_IVF_REBUILD = float(os.getenv("EMBEDDING_IVF_REBUILD", "0.2"))
+# Seconds before retrying a build that failed or that another process holds
+EMBEDDING_IVF_RETRY = float(os.getenv("EMBEDDING_IVF_RETRY", "30"))
+# Past this many rows the oldest are dropped (the newest 90% are kept)
+EMBEDDING_MAX_ROWS = int(os.getenv("EMBEDDING_MAX_ROWS", "1000000"))
+
+# Per row: hash of the document id (for de-duplication) and where its
+# docs.jsonl line is, so no process keeps the ids or metadata in memory
+ROW_DTYPE = np.dtype([("hash", "<u8"), ("offset", "<u8"), ("length", "<u4")])
+
+embedding_time = stats.histogram("embedding_ms", "Time to embed a batch of articles")
+embedding_query_time = stats.histogram(
+    "embedding_query_ms", "Time to search the embedding store",
+    buckets=(0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500)
+)
+
+class HashingEmbedder:
+    """Signed feature hashing of words and word pairs; needs no model files"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        self.min_score = 0.35
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text[:EMBEDDING_MAX_CHARS].lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            # crc32 is stable across processes (unlike hash()); the low bit
+            # picks the sign so colliding features tend to cancel out
+            hashes = np.fromiter(
+                (zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features)
+            )
+            np.add.at(vectors[row], (hashes >> 1) % self.dim, np.where(hashes & 1, 1.0, -1.0))
+        # Sublinear term frequency, then unit length
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+def _id_hash(doc_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+class IVFIndex:
+    """Inverted lists over k-means centroids of the first `rows` rows"""
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, rows: int):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.rows = rows
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row numbers in the `nprobe` lists closest to `query`, in disk order"""
+        scores = self.centroids @ query
+        if nprobe < self.nlist:
+            nearest = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        else:
+            nearest = np.arange(self.nlist)
+        rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in nearest])
+        return np.sort(rows)
+
+class EmbeddingStore:
+    """Append-only matrix of unit vectors on disk, memory-mapped for search"""
+
+    def __init__(self, path: str, dim: int, dtype: str = "int8", embedder: str = "", max_rows: int = EMBEDDING_MAX_ROWS):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported embedding dtype '{dtype}' (use float16 or int8)")
+        self.path = pathlib.Path(path)
+        self.dim = dim
+        self.dtype = dtype
+        self.embedder = embedder
+        self.max_rows = max_rows
+        self._itemsize = np.dtype(dtype).itemsize
+        self._lock = threading.RLock()
+        self._ivf_building = False
+        self._ivf_retry_at = 0.0
+        self._reset_memory()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._file_lock():
+            self._check_meta()
+            self._index_docs()
+        self.refresh()
+
+    def _reset_memory(self):
+        self._count = 0
+        self._docs_offset = 0
+        self._docs_inode: Optional[int] = None
+        self._docs = None
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._table: Optional[np.memmap] = None
+        self._ivf: Optional[IVFIndex] = None
+        self._ivf_mtime = 0
+
+    @property
+    def _vectors_path(self) -> pathlib.Path:
+        return self.path / "vectors.bin"
+
+    @property
+    def _scales_path(self) -> pathlib.Path:
+        return self.path / "scales.bin"
+
+    @property
+    def _table_path(self) -> pathlib.Path:
+        return self.path / "rows.bin"
+
+    @property
+    def _docs_path(self) -> pathlib.Path:
+        return self.path / "docs.jsonl"
+
+    @property
+    def _ivf_path(self) -> pathlib.Path:
+        return self.path / "ivf.json"
+
+    def _ivf_files(self, tag: str) -> Dict[str, pathlib.Path]:
+        return {part: self.path / f"ivf-{tag}.{part}.npy" for part in ("centroids", "order", "offsets")}
+
+    @contextmanager
+    def _file_lock(self, name: str = ".lock", blocking: bool = True):
+        """flock shared with the other processes; yields False if `blocking` is off and it is taken"""
+        with open(self.path / name, "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _check_meta(self):
+        """Start a new store if the existing one was built with other settings"""
+        meta = {"dim": self.dim, "dtype": self.dtype, "embedder": self.embedder}
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            with open(meta_path) as f:
+                existing = json.load(f)
+            if existing == meta:
+                return
+            logger.warning(f"Embedding store {self.path} was built with {existing}, now {meta}; starting over")
+        self._drop_ivf()
+        for path in (self._vectors_path, self._scales_path, self._table_path, self._docs_path):
+            path.unlink(missing_ok=True)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+
+    def _index_docs(self):
+        """Write rows.bin for a store created before it existed"""
+        if self._table_path.exists() or not self._docs_path.exists():
+            return
+        table = []
+        with open(self._docs_path, "rb") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                table.append((_id_hash(json.loads(line)["id"]), offset, len(line)))
+                offset += len(line)
+        rows = np.zeros(self._capacity(), dtype=ROW_DTYPE)
+        rows[:len(table)] = np.array(table, dtype=ROW_DTYPE)
+        rows.tofile(self._table_path)
+        logger.info(f"Indexed {len(table)} rows of embedding store {self.path}")
+
+    def _capacity(self) -> int:
+        try:
+            return self._vectors_path.stat().st_size // (self.dim * self._itemsize)
+        except FileNotFoundError:
+            return 0
+
+    def _map(self, rows: int):
+        """Map the vector files if they no longer cover `rows` rows"""
+        if self._vectors is not None and len(self._vectors) >= rows:
+            return
+        capacity = self._capacity()
+        if capacity == 0:
+            return
+        # Searches holding the previous maps keep them alive until they finish
+        self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        if self.dtype == "int8":
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r+", shape=(capacity,))
+        self._table = np.memmap(self._table_path, dtype=ROW_DTYPE, mode="r+", shape=(capacity,))
+
+    def _reserve(self, rows: int):
+        """Grow the vector files to hold at least `rows` rows, doubling each time"""
+        capacity = self._capacity()
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 1024)
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * self._itemsize)
+        if self.dtype == "int8":
+            with open(self._scales_path, "ab") as f:
+                f.truncate(capacity * 4)
+        with open(self._table_path, "ab") as f:
+            f.truncate(capacity * ROW_DTYPE.itemsize)
+        self._vectors = None
+        self._map(rows)
+
+    def refresh(self) -> int:
+        """Pick up rows appended by other processes; returns the number of rows"""
+        try:
+            stat = self._docs_path.stat()
+            size, inode = stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            size, inode = 0, None
+        if size != self._docs_offset or inode != self._docs_inode:
+            with self._lock:
+                if inode != self._docs_inode or size < self._docs_offset:
+                    # Another process compacted the store or started it over
+                    self._reset_memory()
+                    try:
+                        self._docs = open(self._docs_path, "rb")
+                        stat = os.fstat(self._docs.fileno())
+                        size, self._docs_inode = stat.st_size, stat.st_ino
+                    except FileNotFoundError:
+                        size = 0
+                if size > self._docs_offset:
+                    data = os.pread(self._docs.fileno(), size - self._docs_offset, self._docs_offset)
+                    # A line still being written is picked up next time
+                    end = data.rfind(b"\n") + 1
+                    self._count += data.count(b"\n", 0, end)
+                    self._docs_offset += end
+                self._map(self._count)
+        self._load_ivf()
+        return self._count
+
+    def _entry(self, docs, table: np.ndarray, row: int) -> Dict[str, Any]:
+        record = table[row]
+        return json.loads(os.pread(docs.fileno(), int(record["length"]), int(record["offset"])))
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, metas: Sequence[Dict[str, Any]]) -> int:
+        """Append unit vectors under `ids`, skipping ids already stored. Returns rows added."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        with self._lock, self._file_lock():
+            self.refresh()
+            hashes = np.array([_id_hash(doc_id) for doc_id in ids], dtype=np.uint64)
+            stored = set()
+            if self._count:
+                present = np.isin(hashes, self._table["hash"][:self._count])
+                stored = set(hashes[present].tolist())
+            new, seen = [], set()
+            for i, value in enumerate(hashes.tolist()):
+                if value not in stored and value not in seen:
+                    new.append(i)
+                    seen.add(value)
+            if not new:
+                return 0
+            if self._count + len(new) > self.max_rows:
+                self._compact(max(0, min(self.max_rows - self.max_rows // 10, self.max_rows - len(new))))
+
+            start = self._count
+            end = start + len(new)
+            self._reserve(end)
+            rows = vectors[new]
+            if self.dtype == "int8":
+                scales = np.abs(rows).max(axis=1) / 127
+                scales[scales == 0] = 1
+                self._vectors[start:end] = np.round(rows / scales[:, None]).astype(np.int8)
+                self._scales[start:end] = scales
+                self._scales.flush()
+            else:
+                self._vectors[start:end] = rows.astype(np.float16)
+            self._vectors.flush()
+
+            lines = [(json.dumps({"id": ids[i], "meta": metas[i]}) + "\n").encode("utf-8") for i in new]
+            with open(self._docs_path, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                lengths = np.array([len(line) for line in lines], dtype=np.uint64)
+                self._table[start:end] = np.array(
+                    list(zip(hashes[new].tolist(), (offset + np.cumsum(lengths) - lengths).tolist(), lengths.tolist())),
+                    dtype=ROW_DTYPE,
+                )
+                self._table.flush()
+                # Publishing the rows: readers only look as far as docs.jsonl goes
+                f.write(b"".join(lines))
+            self.refresh()
+            return len(new)
+
+    def _compact(self, keep: int):
+        """
+        Keep only the newest `keep` rows. The trimmed files replace the old
+        ones; other processes see docs.jsonl change and remap. Called with
+        the file lock held.
+        """
+        first = self._count - keep
+        base = int(self._table[first]["offset"]) if keep else self._docs_offset
+        replacements = [(self._vectors_path, np.asarray(self._vectors[first:self._count]))]
+        if self.dtype == "int8":
+            replacements.append((self._scales_path, np.asarray(self._scales[first:self._count])))
+        table = np.array(self._table[first:self._count])
+        table["offset"] -= base
+        replacements.append((self._table_path, table))
+        for path, data in replacements:
+            data.tofile(f"{path}.compact")
+        with open(f"{self._docs_path}.compact", "wb") as f:
+            f.write(os.pread(self._docs.fileno(), self._docs_offset - base, base))
+
+        # docs.jsonl goes last: until it is replaced, readers keep their old maps
+        for path, _ in replacements:
+            os.replace(f"{path}.compact", path)
+        os.replace(f"{self._docs_path}.compact", self._docs_path)
+        self._drop_ivf()
+        logger.info(f"Compacted embedding store {self.path} from {self._count} to {keep} rows")
+        self._reset_memory()
+        self.refresh()
+
+    def _scores(self, vectors: np.ndarray, scales: Optional[np.ndarray], rows, query: np.ndarray) -> np.ndarray:
+        scores = vectors[rows].astype(np.float32) @ query
+        if scales is not None:
+            scores *= scales[rows]
+        return scores
+
+    def _top_k(self, vectors, scales, query: np.ndarray, k: int, rows: Optional[np.ndarray], end: int):
+        """Best `k` (scores, row numbers) among `rows`, or among all of the first `end` rows"""
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        total = end if rows is None else len(rows)
+        for start in range(0, total, EMBEDDING_SCAN_CHUNK):
+            stop = min(total, start + EMBEDDING_SCAN_CHUNK)
+            chunk = np.arange(start, stop) if rows is None else rows[start:stop]
+            selector = slice(start, stop) if rows is None else chunk
+            scores = self._scores(vectors, scales, selector, query)
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+                scores, chunk = scores[keep], chunk[keep]
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, chunk])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+        order = np.argsort(-best_scores)
+        return best_scores[order], best_rows[order]
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        min_score: float = 0.0,
+        exclude: Optional[Set[str]] = None,
+        nprobe: int = EMBEDDING_IVF_NPROBE,
+        exact: bool = False
+    ) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Return up to `k` (cosine similarity, id, metadata), best first"""
+        self.refresh()
+        with self._lock:
+            count, vectors, scales, ivf = self._count, self._vectors, self._scales, self._ivf
+            table, docs = self._table, self._docs
+        if not count or vectors is None:
+            return []
+
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        fetch = k + len(exclude or ())
+        if exact or ivf is None:
+            scores, rows = self._top_k(vectors, scales, query, fetch, None, count)
+        else:
+            # Rows added since the index was built are scanned as well
+            rows = np.concatenate([ivf.probe(query, nprobe), np.arange(ivf.rows, count)])
+            scores, rows = self._top_k(vectors, scales, query, fetch, rows, count)
+        if not exact and count >= EMBEDDING_IVF_THRESHOLD:
+            self._maybe_rebuild(count)
+
+        results = []
+        for score, row in zip(scores, rows):
+            if score < min_score or len(results) == k:
+                break
+            entry = self._entry(docs, table, row)
+            if exclude and entry["id"] in exclude:
+                continue
+            results.append((float(score), entry["id"], entry["meta"]))
+        return results
+
+    def _load_ivf(self):
+        """Map the IVF index another process (or this one) saved, if it is newer"""
+        try:
+            mtime = self._ivf_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._ivf_mtime:
+            return
+        try:
+            with open(self._ivf_path) as f:
+                info = json.load(f)
+            # Built before a compaction, or over rows this process has not picked up yet
+            if info["docs"] != self._docs_inode or info["rows"] > self._count:
+                return
+            arrays = {part: np.load(path, mmap_mode="r") for part, path in self._ivf_files(info["tag"]).items()}
+        except (FileNotFoundError, ValueError, KeyError):
+            # Replaced while we were reading it; the next refresh loads the new one
+            return
+        with self._lock:
+            self._ivf = IVFIndex(arrays["centroids"], arrays["order"], arrays["offsets"], info["rows"])
+            self._ivf_mtime = mtime
+
+    def _ivf_tag(self) -> Optional[str]:
+        try:
+            with open(self._ivf_path) as f:
+                return json.load(f).get("tag")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _drop_ivf(self):
+        """Remove the saved IVF index; called with the file lock held"""
+        tag = self._ivf_tag()
+        self._ivf_path.unlink(missing_ok=True)
+        for path in self._ivf_files(tag).values() if tag else ():
+            path.unlink(missing_ok=True)
+
+    def _save_ivf(self, ivf: IVFIndex, docs_inode: Optional[int]):
+        """Write the index next to vectors.bin for the other processes to map"""
+        tag = f"{ivf.rows}-{uuid.uuid4().hex[:8]}"
+        files = self._ivf_files(tag)
+        np.save(files["centroids"], ivf.centroids)
+        np.save(files["order"], ivf.order)
+        np.save(files["offsets"], ivf.offsets)
+        with self._file_lock():
+            if docs_inode != self._docs_path.stat().st_ino:
+                # The store was compacted while the index was being built
+                for path in files.values():
+                    path.unlink(missing_ok=True)
+                return
+            previous = self._ivf_tag()
+            with open(f"{self._ivf_path}.tmp", "w") as f:
+                json.dump({"rows": ivf.rows, "lists": ivf.nlist, "tag": tag, "docs": docs_inode}, f)
+            os.replace(f"{self._ivf_path}.tmp", self._ivf_path)
+        # Processes that mapped the old files keep them until they remap
+        for path in self._ivf_files(previous).values() if previous else ():
+            path.unlink(missing_ok=True)
+
+    def build_index(self, nlist: Optional[int] = None, iterations: int = 8, seed: int = 0) -> IVFIndex:
+        """Cluster the stored rows, build the inverted lists and save them for the other processes"""
+        with self._file_lock(".ivf.lock"):
+            return self._build_index(nlist, iterations, seed)
+
+    def _build_index(self, nlist: Optional[int] = None, iterations: int = 8, seed: int = 0) -> IVFIndex:
+        """Spherical k-means over the stored rows; called with .ivf.lock held"""
+        with self._lock:
+            rows, vectors, scales, docs_inode = self._count, self._vectors, self._scales, self._docs_inode
+        nlist = nlist or max(1, int(np.sqrt(rows)))
+        rng = np.random.default_rng(seed)
+
+        # Train on a sample; about 40 rows per centroid is plenty
+        sample = np.sort(rng.choice(rows, size=min(rows, max(nlist * 40, 10000)), replace=False))
+        training = vectors[sample].astype(np.float32)
+        if scales is not None:
+            training *= scales[sample][:, None]
+        centroids = training[rng.choice(len(training), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(training @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, training)
+            empty = ~sums.any(axis=1)
+            # Re-seed empty lists with random rows
+            sums[empty] = training[rng.choice(len(training), size=int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-9)
+
+        assign = np.empty(rows, dtype=np.int32)
+        for start in range(0, rows, EMBEDDING_SCAN_CHUNK):
+            stop = min(rows, start + EMBEDDING_SCAN_CHUNK)
+            block = vectors[start:stop].astype(np.float32)
+            # Row scales are positive, so they do not change the closest centroid
+            assign[start:stop] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        ivf = IVFIndex(centroids, order, offsets, rows)
+        self._save_ivf(ivf, docs_inode)
+        with self._lock:
+            # Replaced by the mapped copy on the next refresh
+            if docs_inode == self._docs_inode:
+                self._ivf = ivf
+        return ivf
+
+    def _ivf_stale(self, count: int) -> bool:
+        ivf = self._ivf
+        return ivf is None or count - ivf.rows >= ivf.rows * EMBEDDING_IVF_REBUILD
+
+    def _maybe_rebuild(self, count: int):
+        if self._ivf_building or not self._ivf_stale(count) or time.monotonic() < self._ivf_retry_at:
+            return
+        self._ivf_building = True
+
+        def rebuild():
+            start = time.perf_counter()
+            try:
+                with self._file_lock(".ivf.lock", blocking=False) as locked:
+                    # Another process is building it; it will be mapped from disk when saved
+                    if not locked:
+                        self._ivf_retry_at = time.monotonic() + EMBEDDING_IVF_RETRY
+                        return
+                    # It may have just saved one
+                    if not self._ivf_stale(self.refresh()):
+                        return
+                    built = self._build_index()
+                logger.info(
+                    f"Built embedding IVF index over {built.rows} rows ({built.nlist} lists) "
+                    f"in {time.perf_counter() - start:.1f}s"
+                )
+            except Exception as e:
+                logger.warning(f"Embedding IVF index build failed: {e!r}")
+                self._ivf_retry_at = time.monotonic() + EMBEDDING_IVF_RETRY
+            finally:
+                self._ivf_building = False
+
+        threading.Thread(target=rebuild, name="embedding-ivf", daemon=True).start()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, Any]:
+        ivf = self._ivf
+        return {
+            "rows": self._count,
+            "maxRows": self.max_rows,
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "embedder": self.embedder,
+            "capacity": self._capacity(),
+            # The files grow sparsely, so count allocated blocks
+            "bytesOnDisk": sum(
+                path.stat().st_blocks * 512 for path in (self._vectors_path, self._scales_path) if path.exists()
+            ),
+            "ivf": {"rows": ivf.rows, "lists": ivf.nlist, "nprobe": EMBEDDING_IVF_NPROBE} if ivf else None,
+        }
+
+_embedder = None
+_store: Optional[EmbeddingStore] = None
+_init_lock = threading.Lock()
+
+def _load_embedder():
+    """The exported ONNX sentence encoder if there is one, else the hashing embedder"""
+    if EMBEDDING_BACKEND in ("auto", "onnx"):
+        from app.utils.onnx_backend import model_filename
+        model_dir = pathlib.Path(MODEL_DIR) / "embedding"
+        if EMBEDDING_BACKEND == "onnx" or (model_dir / model_filename(MODEL_QUANTIZED)).exists():
+            try:
+                from app.utils.onnx_backend import OnnxEmbedder
+                embedder = OnnxEmbedder(model_dir, quantized=MODEL_QUANTIZED)
+                embedder.min_score = 0.6
+                return embedder
+            except Exception as e:
+                logger.error(f"ONNX embedder unavailable, using feature hashing: {e}")
+    return HashingEmbedder()
+
+def get_embedder():
+    """Return the embedder, loading it on first use"""
+    global _embedder
+    with _init_lock:
+        if _embedder is None:
+            _embedder = _load_embedder()
+        return _embedder
+
+def get_store() -> EmbeddingStore:
+    """Return the embedding store, opening it on first use"""
+    global _store
+    embedder = get_embedder()
+    with _init_lock:
+        if _store is None:
+            _store = EmbeddingStore(EMBEDDING_DIR, embedder.dim, EMBEDDING_DTYPE, embedder.name)
+            logger.info(f"Embedding store ready ({len(_store)} rows, {embedder.name}, {EMBEDDING_DTYPE})")
+        return _store
+
+def embed(texts: List[str]) -> np.ndarray:
+    """Unit-length embeddings for a batch of texts, shape (batch, dim)"""
+    embedder = get_embedder()
+    start = time.perf_counter()
+    try:
+        return embedder.embed([text[:EMBEDDING_MAX_CHARS] for text in texts])
+    finally:
+        embedding_time.observe((time.perf_counter() - start) * 1000)
+
+def content_scores(text: str, others: List[str]) -> Tuple[List[float], float]:
+    """
+    Cosine similarity of `text` with each of `others`, and the score that
+    counts as a match for the current embedder; blocking, so call it off
+    the event loop
+    """
+    vectors = embed([text] + list(others))
+    min_score = float(EMBEDDING_MIN_SCORE) if EMBEDDING_MIN_SCORE else get_embedder().min_score
+    return [float(score) for score in vectors[1:] @ vectors[0]], min_score
+
+def add_articles(ids: List[str], texts: List[str], metas: List[Dict[str, Any]]) -> int:
+    """Embed and store articles; blocking, so call it off the event loop"""
+    if EMBEDDING_BACKEND == "off" or not ids:
+        return 0
+    return get_store().add(ids, embed(texts), metas)
+
+def find_similar(
+    text: str, k: int = 5, min_score: Optional[float] = None, exclude: Optional[Set[str]] = None
+) -> List[Tuple[float, str, Dict[str, Any]]]:
+    """Query the store with the text of an article; blocking, so call it off the event loop"""
+    if EMBEDDING_BACKEND == "off":
+        return []
+    store = get_store()
+    if not store.refresh():
+        return []
+    if min_score is None:
+        min_score = float(EMBEDDING_MIN_SCORE) if EMBEDDING_MIN_SCORE else get_embedder().min_score
+    query = embed([text])[0]
+    start = time.perf_counter()
+    try:
+        return store.search(query, k=k, min_score=min_score, exclude=exclude)
+    finally:
+        embedding_query_time.observe((time.perf_counter() - start) * 1000)
+
+def store_stats() -> Dict[str, Any]:
+    if _store is None:
+        return {"backend": EMBEDDING_BACKEND, "loaded": False}
+    return dict(_store.stats(), backend=EMBEDDING_BACKEND, loaded=True)
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import signal
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+import aiohttp
+from loguru import logger
+
+from app.utils import stats, tracing
+from app.utils.http_client import get_session
+from app.utils.redis_client import get_redis
+from app.utils.analysis_cache import canonicalize_url
+
+# Server-side article extraction.
+# Pages are downloaded on the event loop through the shared HTTP session,
+# with a cap on their size, and parsed by newspaper3k in a small process
+# pool: lxml parsing is CPU-bound and a pathological page can take seconds,
+# which must not stall the API workers' event loops or their GIL. Each parse
+# is cut off after EXTRACTION_PARSE_TIMEOUT inside the pool process.
+# Extracted text is cached per canonical URL together with the page's ETag
+# and Last-Modified headers. Within EXTRACTION_FRESH_TTL the cached text is
+# used as is; after that the page is revalidated with a conditional GET and
+# only re-parsed if it changed.
+#
+#   extract:{canonical url}  -> {"title", "text", "etag", "lastModified", "checkedAt"}
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_MAX_PENDING = int(os.getenv("EXTRACTION_MAX_PENDING", "16"))
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.getenv("EXTRACTION_MAX_TASKS_PER_CHILD", "200"))
+EXTRACTION_MAX_BYTES = int(os.getenv("EXTRACTION_MAX_BYTES", str(2 * 1024 * 1024)))
+EXTRACTION_MAX_TEXT = int(os.getenv("EXTRACTION_MAX_TEXT", "100000"))
+EXTRACTION_FETCH_TIMEOUT = float(os.getenv("EXTRACTION_FETCH_TIMEOUT", "5.0"))
+EXTRACTION_PARSE_TIMEOUT = float(os.getenv("EXTRACTION_PARSE_TIMEOUT", "2.0"))
+EXTRACTION_FRESH_TTL = int(os.getenv("EXTRACTION_FRESH_TTL", "900"))
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", "86400"))
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+extraction_cache_hits = stats.counter("extraction_cache_hits", "Extractions served from cache without a request")
+extraction_not_modified = stats.counter(
+    "extraction_not_modified", "Conditional GETs answered with 304 Not Modified"
+)
+extraction_fetches = stats.counter("extraction_fetches", "Pages downloaded and parsed")
+extraction_rejected = stats.counter(
+    "extraction_rejected", "Pages rejected for size, content type or a full parse pool"
+)
+extraction_parse_timeouts = stats.counter("extraction_parse_timeouts", "Parses cut off by EXTRACTION_PARSE_TIMEOUT")
+extraction_parse_time = stats.histogram("extraction_parse_ms", "Time to parse a page in the process pool")
+
+class ExtractionError(Exception):
+    """Raised when a page cannot be downloaded or parsed"""
+
+class _ParseTimeout(BaseException):
+    # Not an Exception: newspaper3k swallows those in places
+    pass
+
+def _on_parse_timeout(signum, frame):
+    raise _ParseTimeout()
+
+def _parse_html(url: str, html: str, timeout: float) -> Dict[str, str]:
+    """Parse a page with newspaper3k. Runs in a pool process."""
+    from newspaper import Article
+
+    # Pool processes run tasks on their main thread, so an interval timer
+    # can interrupt a parse that is stuck inside lxml
+    signal.signal(signal.SIGALRM, _on_parse_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        article = Article(url)
+        article.download(input_html=html)
+        article.parse()
+        return {"title": article.title or "", "text": (article.text or "")[:EXTRACTION_MAX_TEXT]}
+    except _ParseTimeout:
+        raise TimeoutError(f"Parsing {url} took longer than {timeout}s")
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_tasks = 0
+_slots: Optional[asyncio.Semaphore] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_tasks
+    # Replace the pool every EXTRACTION_MAX_TASKS_PER_CHILD parses per process,
+    # so memory that lxml and newspaper3k leak is returned to the OS
+    # (max_tasks_per_child does this natively, but only from Python 3.11).
+    # Parses already running in the old pool finish before it exits.
+    if _pool is not None and _pool_tasks >= EXTRACTION_MAX_TASKS_PER_CHILD * EXTRACTION_WORKERS:
+        _pool.shutdown(wait=False)
+        _pool = None
+    if _pool is None:
+        # spawn rather than fork: the parent has model and executor threads
+        # whose locks would be copied into the children in a held state
+        _pool = ProcessPoolExecutor(
+            max_workers=EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _pool_tasks = 0
+        logger.info(f"Started extraction pool with {EXTRACTION_WORKERS} processes")
+    _pool_tasks += 1
+    return _pool
+
+def shutdown_extraction():
+    """Stop the parse pool"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+@tracing.traced("extraction.parse")
+async def _parse(url: str, html: str) -> Dict[str, str]:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(EXTRACTION_WORKERS + EXTRACTION_MAX_PENDING)
+    if _slots.locked():
+        extraction_rejected.inc()
+        raise ExtractionError("Extraction pool is busy")
+
+    async with _slots:
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            # The child enforces the parse timeout; the extra second covers a
+            # child that is too stuck to handle the signal
+            return await asyncio.wait_for(
+                loop.run_in_executor(_get_pool(), _parse_html, url, html, EXTRACTION_PARSE_TIMEOUT),
+                timeout=EXTRACTION_PARSE_TIMEOUT + 1
+            )
+        except (TimeoutError, asyncio.TimeoutError):
+            extraction_parse_timeouts.inc()
+            raise ExtractionError(f"Parsing {url} timed out")
+        except BrokenProcessPool:
+            # A child died (e.g. out of memory); start a fresh pool next time
+            shutdown_extraction()
+            raise ExtractionError(f"Extraction pool crashed while parsing {url}")
+        finally:
+            extraction_parse_time.observe((time.perf_counter() - start) * 1000)
+
+@tracing.traced("extraction.download")
+async def _download(url: str, cached: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Download `url`, revalidating `cached` if given. Returns None when the
+    server says the cached copy is still current.
+    """
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("lastModified"):
+        headers["If-Modified-Since"] = cached["lastModified"]
+
+    timeout = aiohttp.ClientTimeout(total=EXTRACTION_FETCH_TIMEOUT)
+    async with get_session().get(url, headers=headers, timeout=timeout) as response:
+        if response.status == 304 and cached:
+            return None
+        if response.status >= 400:
+            raise ExtractionError(f"GET {url} returned {response.status}")
+        if response.content_type not in HTML_CONTENT_TYPES:
+            extraction_rejected.inc()
+            raise ExtractionError(f"{url} is {response.content_type}, not HTML")
+        if (response.content_length or 0) > EXTRACTION_MAX_BYTES:
+            extraction_rejected.inc()
+            raise ExtractionError(f"{url} is larger than {EXTRACTION_MAX_BYTES} bytes")
+
+        # Content-Length can be missing or wrong; stop reading at the cap
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            body.extend(chunk)
+            if len(body) > EXTRACTION_MAX_BYTES:
+                extraction_rejected.inc()
+                raise ExtractionError(f"{url} is larger than {EXTRACTION_MAX_BYTES} bytes")
+
+        return {
+            "html": body.decode(response.charset or "utf-8", errors="replace"),
+            "etag": response.headers.get("ETag"),
+            "lastModified": response.headers.get("Last-Modified"),
+        }
+
+async def extract_article(url: str) -> Dict[str, str]:
+    """
+    Return {"title", "text"} for the article at `url`, using the cache where
+    possible. Raises ExtractionError if the page cannot be fetched or parsed.
+    """
+    redis_client = get_redis()
+    key = f"extract:{canonicalize_url(url)}"
+
+    cached = None
+    if redis_client:
+        raw = await redis_client.get(key)
+        cached = json.loads(raw) if raw else None
+    if cached and time.time() - cached["checkedAt"] < EXTRACTION_FRESH_TTL:
+        extraction_cache_hits.inc()
+        return {"title": cached["title"], "text": cached["text"]}
+
+    try:
+        page = await _download(url, cached)
+    except asyncio.TimeoutError:
+        raise ExtractionError(f"GET {url} timed out")
+
+    if page is None:
+        extraction_not_modified.inc()
+        entry = dict(cached, checkedAt=time.time())
+    else:
+        extraction_fetches.inc()
+        parsed = await _parse(url, page["html"])
+        entry = {
+            "title": parsed["title"],
+            "text": parsed["text"],
+            "etag": page["etag"],
+            "lastModified": page["lastModified"],
+            "checkedAt": time.time(),
+        }
+
+    if redis_client:
+        await redis_client.setex(key, EXTRACTION_CACHE_TTL, json.dumps(entry))
+    return {"title": entry["title"], "text": entry["text"]}
@@ -1,79 +1,330 @@
 import os
+import re
 import asyncio
-import aiohttp
 import time
 import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from loguru import logger
-from newspaper import Article
 from urllib.parse import urlparse
 
 from app.models.article import SourceReference
+from app.utils.http_client import get_json, HTTP_ERRORS
+from app.utils.extraction import extract_article, ExtractionError
+from app.utils.lookup_cache import cached_lookup, provider_enabled
+from app.utils.redis_client import get_redis
+from app.utils import similarity_index, embedding_store, stats, tracing
 
-# For MVP, we're using simulated data
-# In production, this would connect to Google Fact Check API and other sources
+# Cross-verification against external providers: the Google Fact Check API
+# for published fact checks, and a news search API (NewsAPI-compatible) for
+# coverage of the same story by trusted outlets. Both go through the shared
+# HTTP session and run concurrently under one deadline; whatever has come
+# back by then is used. Provider responses are cached and rate-limited by
+# app/utils/lookup_cache.py.
+# Articles from trusted outlets that pass through the API are added to a
+# local near-duplicate index (app/utils/similarity_index.py) and to a store
+# of sentence embeddings (app/utils/embedding_store.py), which also matches
+# coverage of the same story worded differently. The search API is queried
+# at the same time; when either index already knows related coverage, the
+# search is cancelled and its result is not used.
+# When the client sent little or no article text, the page is downloaded
+# and extracted (app/utils/extraction.py) so the local indexes have real
+# content to match. Search API matches are found by title; the pages of the
+# best few are extracted as well and kept only if their text is about the
+# same story (cosine similarity of the embeddings).
+# Without a NEWS_API_KEY, trusted-source matches are simulated for the MVP.
 
-async def cross_verify_sources(url: str, title: str) -> List[SourceReference]:
+FACT_CHECK_API_URL = os.getenv(
+    "FACT_CHECK_API_URL", "https://factchecktools.googleapis.com/v1alpha1/claims:search"
+)
+SOURCE_SEARCH_API_URL = os.getenv("SOURCE_SEARCH_API_URL", "https://newsapi.org/v2/everything")
+
+# Overall time budget for cross-verification, and per provider call
+CROSS_VERIFY_DEADLINE = float(os.getenv("CROSS_VERIFY_DEADLINE", "3.0"))
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "2.5"))
+
+MAX_SOURCES = int(os.getenv("CROSS_VERIFY_MAX_SOURCES", "4"))
+MIN_MATCH_SCORE = float(os.getenv("CROSS_VERIFY_MIN_MATCH", "0.2"))
+# Extract the article page when the client sent less text than this
+MIN_CONTENT_CHARS = int(os.getenv("CROSS_VERIFY_MIN_CONTENT", "500"))
+# Search matches whose pages are extracted and compared with the article
+CONFIRM_SOURCES = int(os.getenv("CROSS_VERIFY_CONFIRM_SOURCES", "3"))
+
+VERIFY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2000, 3000, 5000)
+verification_time = stats.histogram(
+    "source_verification_ms", "Time to cross-verify an article's sources", VERIFY_BUCKETS
+)
+related_time = stats.histogram("source_match_ms", "Time to match an article against the local indexes")
+verification_failures = stats.counter(
+    "source_verification_failures", "Cross-verifications where no provider answered in time"
+)
+
+# List of trusted news sources
+TRUSTED_SOURCES = [
+    {"name": "Reuters", "domain": "reuters.com", "reliability": 0.95},
+    {"name": "Associated Press", "domain": "apnews.com", "reliability": 0.93},
+    {"name": "BBC", "domain": "bbc.com", "reliability": 0.92},
+    {"name": "NPR", "domain": "npr.org", "reliability": 0.9},
+    {"name": "The New York Times", "domain": "nytimes.com", "reliability": 0.89},
+    {"name": "The Washington Post", "domain": "washingtonpost.com", "reliability": 0.88},
+    {"name": "The Wall Street Journal", "domain": "wsj.com", "reliability": 0.87},
+    {"name": "The Guardian", "domain": "theguardian.com", "reliability": 0.86},
+    {"name": "CNN", "domain": "cnn.com", "reliability": 0.85},
+    {"name": "ABC News", "domain": "abcnews.go.com", "reliability": 0.84}
+]
+
+def _title_words(text: str) -> set:
+    return {word for word in re.findall(r"\w+", text.lower()) if len(word) > 2}
+
+def title_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the significant words in two titles"""
+    words_a, words_b = _title_words(a), _title_words(b)
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+def _trusted_source(domain: str) -> Optional[Dict[str, Any]]:
+    domain = domain.lower().split(":")[0]
+    return next(
+        (s for s in TRUSTED_SOURCES if domain == s["domain"] or domain.endswith("." + s["domain"])), None
+    )
+
+async def index_trusted_article(digest: str, url: str, title: str, content: str, redis_client=None) -> bool:
+    """Add an article to the near-duplicate index if it is from a trusted outlet"""
+    source = _trusted_source(urlparse(url).netloc)
+    if source is None:
+        return False
+    text = f"{title}\n{content}"
+    meta = {"url": url, "title": title, "publisher": source["name"], "domain": source["domain"]}
+    added = await similarity_index.add_document(digest, text, meta, redis_client)
+    try:
+        # Embedding runs the encoder and writes to disk
+        await asyncio.to_thread(embedding_store.add_articles, [digest], [text], [meta])
+    except Exception as e:
+        logger.warning(f"Could not add {url} to the embedding store: {e!r}")
+    return added
+
+@tracing.traced("find_related_articles")
+async def find_related_articles(url: str, title: str, content: str, redis_client=None) -> List[SourceReference]:
+    """
+    Trusted-outlet articles from the near-duplicate index and the embedding
+    store, best match first. An article found by both keeps its best score.
     """
-    Cross-verify article with trusted sources.
+    own = _trusted_source(urlparse(url).netloc)
+    text = f"{title}\n{content}"
+    matches = await similarity_index.find_similar(
+        text, k=MAX_SOURCES * 2, min_score=MIN_MATCH_SCORE, redis_client=redis_client
+    )
+    try:
+        matches += await asyncio.to_thread(embedding_store.find_similar, text, MAX_SOURCES * 2)
+    except Exception as e:
+        logger.warning(f"Embedding store search failed: {e!r}")
+
+    related: Dict[str, SourceReference] = {}
+    for score, _, meta in matches:
+        if own and meta["domain"] == own["domain"]:
+            continue
+        if meta["url"] not in related or score > related[meta["url"]].matchScore:
+            related[meta["url"]] = SourceReference(
+                url=meta["url"], title=meta["title"], publisher=meta["publisher"], matchScore=round(score, 3)
+            )
+    return sorted(related.values(), key=lambda source: source.matchScore, reverse=True)[:MAX_SOURCES]
+
+@tracing.traced("cross_verify_sources")
+async def cross_verify_sources(url: str, title: str, content: Optional[str] = None) -> List[SourceReference]:
+    """
+    Cross-verify article with trusted sources and published fact checks.
+
+    Raises RuntimeError if no provider answered within the deadline, so
+    callers can retry later instead of caching an empty result.
     """
     logger.info(f"Cross-verifying article: {url}")
-    
-    # Simulate a network delay
-    await asyncio.sleep(0.3)
-    
-    # For MVP, we'll return simulated sources
-    # In production, we would:
-    # 1. Use Google Fact Check API to find related fact checks
-    # 2. Use search API to find similar articles from reliable sources
-    # 3. Use Newspaper3k to extract and compare content
-    
-    # Get the domain from the URL for simulated matching
+
+    # Get the domain from the URL so the article does not verify itself
     try:
         domain = urlparse(url).netloc
     except:
         domain = "unknown"
-    
-    # List of trusted news sources for simulation
-    trusted_sources = [
-        {"name": "Reuters", "domain": "reuters.com", "reliability": 0.95},
-        {"name": "Associated Press", "domain": "apnews.com", "reliability": 0.93},
-        {"name": "BBC", "domain": "bbc.com", "reliability": 0.92},
-        {"name": "NPR", "domain": "npr.org", "reliability": 0.9},
-        {"name": "The New York Times", "domain": "nytimes.com", "reliability": 0.89},
-        {"name": "The Washington Post", "domain": "washingtonpost.com", "reliability": 0.88},
-        {"name": "The Wall Street Journal", "domain": "wsj.com", "reliability": 0.87},
-        {"name": "The Guardian", "domain": "theguardian.com", "reliability": 0.86},
-        {"name": "CNN", "domain": "cnn.com", "reliability": 0.85},
-        {"name": "ABC News", "domain": "abcnews.go.com", "reliability": 0.84}
-    ]
-    
+
+    start = time.perf_counter()
+    deadline = time.monotonic() + CROSS_VERIFY_DEADLINE
+    # Both providers are asked right away, so a slow page extraction or local
+    # match does not eat into their share of the deadline
+    lookups = {
+        "factChecks": asyncio.create_task(get_fact_checks(title)),
+        "sources": asyncio.create_task(search_trusted_sources(title, domain)),
+    }
+    try:
+        if not content or len(content) < MIN_CONTENT_CHARS:
+            content = await _article_text(url, content, max(0.0, deadline - time.monotonic()))
+        match_start = time.perf_counter()
+        related = await find_related_articles(url, title, content, get_redis()) if content else []
+        related_time.observe((time.perf_counter() - match_start) * 1000)
+
+        if related:
+            # The local indexes know coverage of the story; the search is not needed
+            lookups.pop("sources").cancel()
+        done, pending = await asyncio.wait(lookups.values(), timeout=max(0.0, deadline - time.monotonic()))
+    finally:
+        # Also when matching failed or the job was cancelled: do not leave
+        # lookups running (or failing) unobserved
+        for task in lookups.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
+    answered = 1 if related else 0
+    result_sources: List[SourceReference] = list(related)
+    for name, task in lookups.items():
+        if task in pending:
+            logger.warning(f"Cross-verification lookup '{name}' missed the {CROSS_VERIFY_DEADLINE}s deadline")
+        elif task.exception() is not None:
+            logger.warning(f"Cross-verification lookup '{name}' failed: {task.exception()!r}")
+        else:
+            answered += 1
+            if name == "factChecks":
+                result_sources.extend(_fact_check_references(task.result(), title))
+            elif content and os.getenv("NEWS_API_KEY"):
+                # Simulated matches have no pages to compare
+                result_sources.extend(
+                    await _confirm_by_content(content, task.result(), deadline - time.monotonic())
+                )
+            else:
+                result_sources.extend(task.result())
+
+    verification_time.observe((time.perf_counter() - start) * 1000)
+    if not answered:
+        verification_failures.inc()
+        raise RuntimeError("No verification provider answered in time")
+
+    logger.info(f"Found {len(result_sources)} related sources")
+    return result_sources
+
+async def _article_text(url: str, content: Optional[str], timeout: float) -> Optional[str]:
+    """The extracted text of the article page if it is longer than `content`"""
+    try:
+        page = await asyncio.wait_for(extract_article_content(url), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Extracting {url} missed the {timeout:.2f}s deadline")
+        return content
+    if len(page["text"]) > len(content or ""):
+        return page["text"]
+    return content
+
+async def _confirm_by_content(
+    content: str, sources: List[SourceReference], timeout: float
+) -> List[SourceReference]:
+    """
+    Extract the pages of the best search matches and keep those whose text
+    is about the same story, scored by content similarity. Matches whose
+    page could not be extracted in time keep their title score.
+    """
+    candidates = sources[:CONFIRM_SOURCES]
+    if not candidates or timeout <= 0 or embedding_store.EMBEDDING_BACKEND == "off":
+        return sources
+
+    tasks = [asyncio.create_task(extract_article_content(source.url)) for source in candidates]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    texts = {
+        i: task.result()["text"] for i, task in enumerate(tasks)
+        if task in done and task.result()["text"]
+    }
+    if not texts:
+        return sources
+
+    try:
+        scores, min_score = await asyncio.to_thread(embedding_store.content_scores, content, list(texts.values()))
+    except Exception as e:
+        logger.warning(f"Could not compare source content: {e!r}")
+        return sources
+    content_score = dict(zip(texts, scores))
+
+    confirmed = []
+    for i, source in enumerate(candidates):
+        if i not in content_score:
+            confirmed.append(source)
+        elif content_score[i] >= min_score:
+            confirmed.append(source.model_copy(update={"matchScore": round(content_score[i], 3)}))
+        else:
+            logger.debug(f"Dropping {source.url}: its text is not about the same story")
+    confirmed.sort(key=lambda source: source.matchScore, reverse=True)
+    return confirmed + sources[len(candidates):]
+
+async def search_trusted_sources(title: str, domain: str) -> List[SourceReference]:
+    """
+    Find coverage of the same story by trusted outlets other than `domain`.
+    """
+    # Compare outlets rather than hosts, so www.reuters.com excludes reuters.com
+    own = _trusted_source(domain)
+    if own is not None:
+        domain = own["domain"]
+    sources_pool = [s for s in TRUSTED_SOURCES if domain not in s["domain"]]
+
+    api_key = os.getenv("NEWS_API_KEY")
+    if not api_key:
+        return await _simulated_sources(title, sources_pool)
+    if not provider_enabled("news"):
+        return []
+
+    async def search() -> List[Dict[str, Any]]:
+        # Search all trusted outlets so the cached response serves every
+        # article on the story, whichever outlet it came from
+        data = await get_json(
+            SOURCE_SEARCH_API_URL,
+            params={
+                "q": title[:400],
+                "domains": ",".join(s["domain"] for s in TRUSTED_SOURCES),
+                "sortBy": "relevancy",
+                "pageSize": 20,
+            },
+            headers={"X-Api-Key": api_key},
+            timeout=PROVIDER_TIMEOUT
+        )
+        return data.get("articles", [])
+
+    matches = []
+    for article in await cached_lookup("news", title, search):
+        score = title_similarity(title, article.get("title") or "")
+        if score >= MIN_MATCH_SCORE and article.get("url") and domain not in urlparse(article["url"]).netloc:
+            matches.append(SourceReference(
+                url=article["url"],
+                title=article["title"],
+                publisher=(article.get("source") or {}).get("name"),
+                matchScore=round(score, 3)
+            ))
+    matches.sort(key=lambda source: source.matchScore, reverse=True)
+    return matches[:MAX_SOURCES]
+
+async def _simulated_sources(title: str, sources_pool: List[Dict[str, Any]]) -> List[SourceReference]:
+    """Simulated trusted-source matches for the MVP"""
+    # Simulate a network delay
+    await asyncio.sleep(0.3)
+
     # Simulate finding 2-4 related sources
     num_sources = random.randint(2, 4)
-    
-    # Filter out the current source if it's in our trusted list
-    sources_pool = [s for s in trusted_sources if domain not in s["domain"]]
     selected_sources = random.sample(sources_pool, min(num_sources, len(sources_pool)))
-    
+
     # Generate related article URLs and titles
     result_sources = []
-    
+
     # Words to use in simulated titles
     title_words = title.split()
     if len(title_words) > 3:
         title_words = [w for w in title_words if len(w) > 3]
-    
+
     for source in selected_sources:
         # Create a simulated matching score
         match_score = random.uniform(0.65, 0.95)
-        
+
         # Create a simulated similar title
         if len(title_words) > 3:
             # Use some words from the original title
             num_words = min(len(title_words), random.randint(2, 4))
             words = random.sample(title_words, num_words)
             simulated_title = " ".join(words)
-            
+
             # Add some generic words
             prefix = random.choice(["Report: ", "Analysis: ", "", ""])
             suffix = random.choice([
@@ -83,12 +334,12 @@ async def cross_verify_sources(url: str, title: str) -> List[SourceReference]:
                 ": The Facts",
                 ""
             ])
-            
+
             simulated_title = f"{prefix}{simulated_title}{suffix}"
         else:
             # Fallback for very short titles
             simulated_title = f"Report related to: {title}"
-        
+
         # Create the source reference
         source_ref = SourceReference(
             url=f"https://{source['domain']}/article/{int(time.time())}-{hash(title) % 10000}",
@@ -96,71 +347,64 @@ async def cross_verify_sources(url: str, title: str) -> List[SourceReference]:
             publisher=source["name"],
             matchScore=float(match_score)
         )
-        
+
         result_sources.append(source_ref)
-    
-    logger.info(f"Found {len(result_sources)} related sources")
+
     return result_sources
 
 async def get_fact_checks(claim: str) -> List[Dict[str, Any]]:
     """
     Get fact checks for a specific claim using Google Fact Check API.
-    
-    In a production system, this would connect to the actual API.
-    For the MVP, we'll simulate responses.
+
+    Returns the API's `claims` list, or an empty list when no API key is
+    configured or the provider is disabled. Raises on network errors, error
+    responses and when the provider's rate-limit budget is exhausted.
     """
-    # Simulate API delay
-    await asyncio.sleep(0.3)
-    
-    # In production, this would use:
     # Google Fact Check API: https://developers.google.com/fact-check/tools/api/
-    
     api_key = os.getenv("GOOGLE_FACT_CHECK_API_KEY")
     if not api_key:
-        logger.warning("No Google Fact Check API key found")
+        logger.debug("No Google Fact Check API key found")
+        return []
+    if not provider_enabled("factcheck"):
         return []
-    
-    # For MVP, return simulated data
-    return [
-        {
-            "claimant": "Social Media",
-            "claimDate": "2023-01-15T00:00:00Z",
-            "claimReview": [
-                {
-                    "publisher": {
-                        "name": "Fact Check Organization",
-                        "site": "https://factcheck.org"
-                    },
-                    "textualRating": "Partly False",
-                    "title": "Claim contains some true elements but includes significant inaccuracies",
-                    "url": "https://factcheck.org/example-check"
-                }
-            ]
-        }
-    ]
+
+    async def search() -> List[Dict[str, Any]]:
+        data = await get_json(
+            FACT_CHECK_API_URL,
+            params={"query": claim[:400], "key": api_key, "languageCode": "en", "pageSize": 10},
+            timeout=PROVIDER_TIMEOUT
+        )
+        return data.get("claims", [])
+
+    return await cached_lookup("factcheck", claim, search)
+
+def _fact_check_references(claims: List[Dict[str, Any]], title: str) -> List[SourceReference]:
+    """Turn fact-check claims into source references, best match first"""
+    references = []
+    for claim in claims:
+        score = title_similarity(title, claim.get("text", ""))
+        for review in claim.get("claimReview", []):
+            if not review.get("url"):
+                continue
+            rating = review.get("textualRating")
+            references.append(SourceReference(
+                url=review["url"],
+                title=review.get("title") or f"{rating}: {claim.get('text', '')}",
+                publisher=(review.get("publisher") or {}).get("name"),
+                matchScore=round(score, 3)
+            ))
+    references.sort(key=lambda source: source.matchScore, reverse=True)
+    return references[:MAX_SOURCES]
 
 async def extract_article_content(url: str) -> Dict[str, str]:
     """
-    Extract article content using Newspaper3k.
-    
-    In production, this would download and parse the actual article.
-    For MVP, we'll simulate the behavior.
+    Download an article and extract its title and text using Newspaper3k.
     """
     try:
-        # Simulate download delay
-        await asyncio.sleep(0.5)
-        
-        # In production, we would use:
-        # article = Article(url)
-        # article.download()
-        # article.parse()
-        # return {"title": article.title, "text": article.text}
-        
-        # For MVP, return simulated content
-        return {
-            "title": "Simulated Article Title",
-            "text": "This is simulated article content for demonstration purposes."
-        }
+        return await extract_article(url)
+    except (ExtractionError, *HTTP_ERRORS) as e:
+        logger.warning(f"Could not extract {url}: {e!r}")
+        return {"title": "", "text": ""}
     except Exception as e:
         logger.error(f"Error extracting article content: {str(e)}")
-        return {"title": "", "text": ""} 
\ No newline at end of file
+        return {"title": "", "text": ""}
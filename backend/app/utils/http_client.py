@@ -0,0 +1,72 @@
+import os
+import asyncio
+from typing import Any, Dict, Optional
+import aiohttp
+
+from app.utils import tracing
+
+# Shared outbound HTTP client.
+# One long-lived aiohttp session per process, so calls to fact-check and
+# search providers reuse keep-alive connections and cached DNS lookups instead
+# of paying for a new TCP/TLS handshake each time. Connections are bounded in
+# total and per host, and every request has a timeout.
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "10"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5.0"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "2.0"))
+
+USER_AGENT = "TruthLens/1.0"
+
+# Errors that mean the remote end is slow, unreachable or returned an error
+HTTP_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the shared session, creating it on first use"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            headers={"User-Agent": USER_AGENT},
+        )
+    return _session
+
+async def close_session():
+    """Close the shared session and its connections"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def get_json(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None
+) -> Any:
+    """
+    GET `url` and decode the JSON body. Raises on connection errors,
+    timeouts and non-2xx responses.
+
+    `timeout` (seconds) replaces HTTP_TIMEOUT for this request; when it is
+    not given the session's timeouts apply.
+    """
+    # Only pass timeout= when set: aiohttp treats timeout=None as no timeout
+    options = {"timeout": aiohttp.ClientTimeout(total=timeout, connect=HTTP_CONNECT_TIMEOUT)} if timeout else {}
+    # Query parameters are left out of the span: they can carry API keys
+    with tracing.span("http.get", **{"http.url": url}) as current:
+        async with get_session().get(url, params=params, headers=headers, **options) as response:
+            current.set_attribute("http.status_code", response.status)
+            response.raise_for_status()
+            return await response.json(content_type=None)
@@ -0,0 +1,139 @@
+import os
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+
+from app.utils import stats, tracing
+
+# Dedicated executor for model inference.
+# The model_service functions are blocking (time.sleep today, CPU-bound
+# transformer inference later), so they must never run on the event loop.
+# The executor is bounded both in worker count and in queued work so that a
+# burst of requests is refused quickly instead of piling up behind the models.
+
+inference_pending = stats.gauge("inference_pending", "Inference calls running or waiting for a worker")
+inference_rejected = stats.counter("inference_rejected", "Inference calls refused because the queue was full")
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference executor cannot accept more work."""
+    pass
+
+class InferenceExecutor:
+    """
+    Bounded thread or process pool for running blocking model calls.
+
+    At most `max_workers` calls run at once and at most `max_queue` more may
+    wait for a worker; anything beyond that raises InferenceQueueFull.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 64, kind: str = "thread"):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.kind = kind
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool: Executor = self._create_pool()
+
+    def _create_pool(self) -> Executor:
+        if self.kind == "process":
+            # Each worker process needs its own copy of the models
+            from app.utils.model_service import initialize_models
+            return ProcessPoolExecutor(max_workers=self.max_workers, initializer=initialize_models)
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+
+    @property
+    def pending(self) -> int:
+        """Number of calls currently running or waiting for a worker"""
+        return self._pending
+
+    @property
+    def queued(self) -> int:
+        """Number of calls waiting for a free worker"""
+        return max(0, self._pending - self.max_workers)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking function on the pool and await its result."""
+        with self._lock:
+            if self._pending >= self.capacity:
+                inference_rejected.inc()
+                raise InferenceQueueFull(
+                    f"Inference queue is full ({self._pending}/{self.capacity} pending)"
+                )
+            self._pending += 1
+        inference_pending.inc()
+
+        call = partial(func, *args, **kwargs)
+        if self.kind == "thread" and tracing.tracing_enabled():
+            # Executor threads do not inherit context; keep model spans in the request's trace
+            call = partial(contextvars.copy_context().run, call)
+        try:
+            future = self._pool.submit(call)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the call finishes, not when the caller stops
+        # waiting: a caller that times out leaves the call running on a
+        # worker, and it must keep counting against the bound
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future=None):
+        # Runs on a pool thread, or on the loop if the call never started
+        with self._lock:
+            self._pending -= 1
+        inference_pending.dec()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "maxQueue": self.max_queue,
+            "pending": self.pending,
+            "queued": self.queued,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+_executor: Optional[InferenceExecutor] = None
+
+def init_executor() -> InferenceExecutor:
+    """Create the inference executor from environment settings"""
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    max_workers = int(os.getenv("INFERENCE_WORKERS", "4"))
+    max_queue = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+    kind = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+    if kind not in ("thread", "process"):
+        logger.warning(f"Unknown INFERENCE_EXECUTOR '{kind}', falling back to thread")
+        kind = "thread"
+
+    _executor = InferenceExecutor(max_workers=max_workers, max_queue=max_queue, kind=kind)
+    logger.info(f"Inference executor ready ({kind}, {max_workers} workers, queue {max_queue})")
+    return _executor
+
+def shutdown_executor():
+    """Stop the inference executor and wait for running calls to finish"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+        logger.info("Inference executor shut down")
+
+def get_executor() -> InferenceExecutor:
+    """Return the inference executor, creating it on first use"""
+    return _executor or init_executor()
+
+async def run_inference(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking model call on the inference executor"""
+    return await get_executor().run(func, *args, **kwargs)
@@ -0,0 +1,402 @@
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from loguru import logger
+
+from app.utils import stats, tracing
+from app.utils.redis_client import create_redis, REDIS_SOCKET_TIMEOUT
+
+# Durable background jobs (source cross-verification, re-analysis).
+# Jobs are appended to a Redis stream and consumed through a consumer group,
+# so they survive restarts, are processed at most `concurrency` at a time per
+# consumer, and can be handled by dedicated worker processes (worker.py) as
+# well as the API workers. A job whose handler raises is retried with
+# exponential backoff through a delayed set, and moved to a dead-letter stream
+# after JOB_MAX_ATTEMPTS. Messages left unacknowledged by a crashed consumer
+# are reclaimed after JOB_VISIBILITY_TIMEOUT_MS; every delivery of a message
+# counts as an attempt, so a job that keeps killing its consumer is also
+# dead-lettered eventually.
+# Jobs with a key are deduplicated: while a job for "sources:<hash>" is queued
+# or running, enqueueing another one is a no-op.
+# Without Redis (or while its circuit breaker is open) jobs go to an
+# in-memory queue in the current process instead; those are lost on restart.
+
+JOB_STREAM = os.getenv("JOB_STREAM", "truthlens:jobs")
+JOB_GROUP = "workers"
+JOB_DELAYED_KEY = f"{JOB_STREAM}:delayed"
+JOB_DEAD_STREAM = f"{JOB_STREAM}:dead"
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_MS = int(os.getenv("JOB_RETRY_BASE_MS", "1000"))
+JOB_RETRY_MAX_MS = int(os.getenv("JOB_RETRY_MAX_MS", "300000"))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "60"))
+JOB_DEDUPE_TTL = int(os.getenv("JOB_DEDUPE_TTL", "600"))
+JOB_VISIBILITY_TIMEOUT_MS = int(os.getenv("JOB_VISIBILITY_TIMEOUT_MS", "120000"))
+JOB_BLOCK_MS = int(os.getenv("JOB_BLOCK_MS", "1000"))
+JOB_STREAM_MAXLEN = int(os.getenv("JOB_STREAM_MAXLEN", "100000"))
+JOB_LOCAL_QUEUE_SIZE = int(os.getenv("JOB_LOCAL_QUEUE_SIZE", "1000"))
+
+# Add the job unless its dedupe key is already held
+_ENQUEUE_SCRIPT = """
+if ARGV[1] ~= "" then
+    if not redis.call("set", ARGV[1], "1", "NX", "EX", ARGV[2]) then
+        return 0
+    end
+end
+redis.call("xadd", KEYS[1], "MAXLEN", "~", ARGV[3], "*", "job", ARGV[4])
+return 1
+"""
+
+# Move delayed jobs that are due back onto the stream
+_PROMOTE_SCRIPT = """
+local due = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, 100)
+for _, job in ipairs(due) do
+    redis.call("xadd", KEYS[2], "MAXLEN", "~", ARGV[2], "*", "job", job)
+    redis.call("zrem", KEYS[1], job)
+end
+return #due
+"""
+
+jobs_enqueued = stats.counter("jobs_enqueued", "Jobs added to the queue")
+jobs_deduplicated = stats.counter("jobs_deduplicated", "Jobs skipped because an identical job was queued")
+jobs_rejected = stats.counter("jobs_rejected", "Jobs dropped because the local queue was full")
+jobs_completed = stats.counter("jobs_completed", "Jobs that ran successfully")
+jobs_retried = stats.counter("jobs_retried", "Failed jobs scheduled for another attempt")
+jobs_dead = stats.counter("jobs_dead", "Jobs that failed JOB_MAX_ATTEMPTS times")
+jobs_reclaimed = stats.counter("jobs_reclaimed", "Jobs taken over from a consumer that stopped responding")
+job_lag = stats.histogram("job_lag_ms", "Time from enqueue to start of processing")
+job_duration = stats.histogram("job_duration_ms", "Time spent running job handlers")
+local_depth = stats.gauge("jobs_local_depth", "Jobs waiting, running or delayed in the in-process queues")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+_handlers: Dict[str, JobHandler] = {}
+
+def handler(job_type: str):
+    """Register the coroutine that processes jobs of `job_type`"""
+    def register(func: JobHandler) -> JobHandler:
+        _handlers[job_type] = func
+        return func
+    return register
+
+def _dedupe_key(key: str) -> str:
+    return f"job:dedupe:{key}"
+
+def retry_delay(attempts: int) -> Optional[float]:
+    """Seconds to wait before the next attempt, or None when out of attempts"""
+    if attempts >= JOB_MAX_ATTEMPTS:
+        return None
+    delay_ms = min(JOB_RETRY_BASE_MS * 2 ** (attempts - 1), JOB_RETRY_MAX_MS)
+    # Full jitter keeps retries of jobs that failed together from lining up
+    return random.uniform(delay_ms / 2, delay_ms) / 1000
+
+async def _execute(job: Dict[str, Any]) -> bool:
+    """Run one job; returns False if it failed and may be retried"""
+    job_handler = _handlers.get(job["type"])
+    if job_handler is None:
+        logger.error(f"No handler registered for job type '{job['type']}'")
+        return False
+
+    job_lag.observe((time.time() - job["enqueuedAt"]) * 1000)
+    start = time.perf_counter()
+    with tracing.attach_context(job.get("trace")), tracing.span(
+        f"job.{job['type']}", **{"job.id": job["id"], "job.attempt": job["attempts"]}
+    ) as current:
+        try:
+            await asyncio.wait_for(job_handler(job["payload"]), timeout=JOB_TIMEOUT)
+            jobs_completed.inc()
+            return True
+        except Exception as e:
+            logger.warning(f"Job {job['type']}:{job['id']} failed (attempt {job['attempts']}): {str(e) or type(e).__name__}")
+            current.record_exception(e)
+            return False
+        finally:
+            job_duration.observe((time.perf_counter() - start) * 1000)
+
+class RedisJobQueue:
+    """Job queue on a Redis stream with a consumer group"""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+
+    async def enqueue(self, job: Dict[str, Any]) -> Optional[bool]:
+        """Add a job; returns False if deduplicated and None if Redis is unavailable"""
+        added = await self.redis.eval(
+            _ENQUEUE_SCRIPT, 1, JOB_STREAM,
+            _dedupe_key(job["key"]) if job["key"] else "", JOB_DEDUPE_TTL, JOB_STREAM_MAXLEN, json.dumps(job)
+        )
+        return None if added is None else bool(added)
+
+    async def _groups(self) -> List[Dict[str, Any]]:
+        if not await self.redis.exists(JOB_STREAM):
+            return []
+        return await self.redis.xinfo_groups(JOB_STREAM) or []
+
+    async def _ensure_group(self):
+        if not any(group["name"] == JOB_GROUP for group in await self._groups()):
+            await self.redis.xgroup_create(JOB_STREAM, JOB_GROUP, id="0", mkstream=True)
+
+    async def _maintenance(self, count: int) -> List[Tuple[str, Dict[str, str], int]]:
+        """
+        Promote due retries and reclaim up to `count` jobs from consumers that
+        died. Returns (message id, fields, times delivered) for each.
+        """
+        await self.redis.eval(_PROMOTE_SCRIPT, 2, JOB_DELAYED_KEY, JOB_STREAM, time.time(), JOB_STREAM_MAXLEN)
+        if count <= 0:
+            return []
+        claimed = await self.redis.xautoclaim(
+            JOB_STREAM, JOB_GROUP, self.consumer, min_idle_time=JOB_VISIBILITY_TIMEOUT_MS, count=count
+        )
+        messages = [(message_id, fields) for message_id, fields in (claimed[1] if claimed else []) if message_id]
+        if not messages:
+            return []
+        jobs_reclaimed.inc(len(messages))
+        logger.warning(f"Reclaimed {len(messages)} stalled jobs")
+
+        # The claim counted as another delivery of each message
+        pipe = self.redis.pipeline()
+        for message_id, _ in messages:
+            pipe.xpending_range(JOB_STREAM, JOB_GROUP, min=message_id, max=message_id, count=1)
+        pending = await pipe.execute() or [[] for _ in messages]
+        return [
+            (message_id, fields, entry[0]["times_delivered"] if entry else 2)
+            for (message_id, fields), entry in zip(messages, pending)
+        ]
+
+    async def _handle(self, message_id: str, fields: Optional[Dict[str, str]], deliveries: int = 1):
+        if not fields or "job" not in fields:
+            # Deleted or trimmed from the stream while it was pending
+            logger.warning(f"Dropping job message {message_id} with no payload")
+            await self.redis.xack(JOB_STREAM, JOB_GROUP, message_id)
+            return
+
+        # `attempts` in the payload counts earlier messages of this job (retries
+        # are queued as new messages); deliveries of this one count as well
+        job = json.loads(fields["job"])
+        job["attempts"] += deliveries
+        if job["attempts"] > JOB_MAX_ATTEMPTS:
+            # Earlier deliveries never finished, e.g. the consumer was killed
+            logger.warning(f"Job {job['type']}:{job['id']} was delivered {deliveries} times without finishing")
+            succeeded = False
+        else:
+            succeeded = await _execute(job)
+
+        pipe = self.redis.pipeline()
+        pipe.xack(JOB_STREAM, JOB_GROUP, message_id)
+        pipe.xdel(JOB_STREAM, message_id)
+        delay = None if succeeded else retry_delay(job["attempts"])
+        if delay is not None:
+            jobs_retried.inc()
+            pipe.zadd(JOB_DELAYED_KEY, {json.dumps(job): time.time() + delay})
+        else:
+            if not succeeded:
+                jobs_dead.inc()
+                logger.error(f"Job {job['type']}:{job['id']} failed {job['attempts']} times, moving to {JOB_DEAD_STREAM}")
+                pipe.xadd(JOB_DEAD_STREAM, {"job": json.dumps(job)}, maxlen=1000, approximate=True)
+            if job["key"]:
+                pipe.delete(_dedupe_key(job["key"]))
+        await pipe.execute()
+
+    async def run(self, concurrency: int, stop: asyncio.Event):
+        """Consume jobs, at most `concurrency` at a time, until `stop` is set"""
+        await self._ensure_group()
+        running: Set[asyncio.Task] = set()
+        last_maintenance = 0.0
+
+        def start(message_id: str, fields: Optional[Dict[str, str]], deliveries: int = 1):
+            task = asyncio.create_task(self._handle(message_id, fields, deliveries))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        while not stop.is_set():
+            if time.monotonic() - last_maintenance >= 1:
+                last_maintenance = time.monotonic()
+                # Reclaimed jobs count against the concurrency like new ones
+                for message_id, fields, deliveries in await self._maintenance(concurrency - len(running)):
+                    start(message_id, fields, deliveries)
+
+            free = concurrency - len(running)
+            if free <= 0:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            response = await self.redis.xreadgroup(
+                JOB_GROUP, self.consumer, {JOB_STREAM: ">"}, count=free, block=JOB_BLOCK_MS
+            )
+            if response is None and not self.redis.available:
+                await asyncio.sleep(1)
+                continue
+            if response is None:
+                # The stream or group was deleted (e.g. FLUSHALL); recreate it
+                await self._ensure_group()
+            for _, messages in response or []:
+                for message_id, fields in messages:
+                    start(message_id, fields)
+
+        # Let running jobs finish; unacknowledged ones would be reclaimed anyway
+        if running:
+            await asyncio.wait(running)
+
+    async def stats(self) -> Dict[str, Any]:
+        group = next((g for g in await self._groups() if g["name"] == JOB_GROUP), {})
+        pipe = self.redis.pipeline()
+        pipe.zcard(JOB_DELAYED_KEY)
+        pipe.xlen(JOB_DEAD_STREAM)
+        pipe.xrange(JOB_STREAM, min=f"({group.get('last-delivered-id', '0-0')}", count=1)
+        delayed, dead, next_undelivered = await pipe.execute() or (0, 0, [])
+
+        # Lag: how long the oldest job not yet picked up has been waiting
+        oldest_ms = 0.0
+        if next_undelivered:
+            oldest_ms = max(0.0, time.time() * 1000 - int(next_undelivered[0][0].split("-")[0]))
+
+        waiting = group.get("lag") or 0
+        return {
+            "backend": "redis",
+            "waiting": waiting,
+            "running": group.get("pending", 0),
+            "delayed": delayed,
+            "dead": dead,
+            "depth": waiting + group.get("pending", 0) + delayed,
+            "oldestWaitingMs": round(oldest_ms, 1),
+            "consumers": group.get("consumers", 0),
+        }
+
+class LocalJobQueue:
+    """In-memory fallback queue, processed by the current process"""
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.keys: Set[str] = set()
+        self.delayed = 0
+        self.running = 0
+
+    async def enqueue(self, job: Dict[str, Any]) -> bool:
+        if job["key"] and job["key"] in self.keys:
+            return False
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            jobs_rejected.inc()
+            logger.warning(f"Local job queue full, dropping {job['type']}:{job['id']}")
+            return False
+        if job["key"]:
+            self.keys.add(job["key"])
+        local_depth.inc()
+        return True
+
+    def _requeue(self, job: Dict[str, Any]):
+        self.delayed -= 1
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            jobs_rejected.inc()
+            local_depth.dec()
+            self.keys.discard(job["key"])
+
+    async def _consume(self):
+        while True:
+            job = await self.queue.get()
+            job["attempts"] += 1
+            self.running += 1
+            try:
+                succeeded = await _execute(job)
+            finally:
+                self.running -= 1
+
+            delay = None if succeeded else retry_delay(job["attempts"])
+            if delay is not None:
+                jobs_retried.inc()
+                self.delayed += 1
+                asyncio.get_running_loop().call_later(delay, self._requeue, job)
+                continue
+            if not succeeded:
+                jobs_dead.inc()
+                logger.error(f"Job {job['type']}:{job['id']} failed {job['attempts']} times, dropping it")
+            self.keys.discard(job["key"])
+            local_depth.dec()
+
+    async def run(self, concurrency: int, stop: asyncio.Event):
+        consumers = [asyncio.create_task(self._consume()) for _ in range(concurrency)]
+        try:
+            await stop.wait()
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "local",
+            "waiting": self.queue.qsize(),
+            "running": self.running,
+            "delayed": self.delayed,
+            "depth": self.queue.qsize() + self.running + self.delayed,
+        }
+
+local_queue = LocalJobQueue(JOB_LOCAL_QUEUE_SIZE)
+
+async def enqueue(
+    job_type: str,
+    payload: Dict[str, Any],
+    key: Optional[str] = None,
+    redis_client=None
+) -> bool:
+    """
+    Queue a job for `job_type`'s handler. Returns False if a job with the
+    same key is already queued (or the local fallback queue is full).
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "type": job_type,
+        "payload": payload,
+        "key": key,
+        "attempts": 0,
+        "enqueuedAt": time.time(),
+    }
+    # Lets the job continue the trace of the request that queued it
+    trace_context = tracing.inject_context()
+    if trace_context:
+        job["trace"] = trace_context
+    added = None
+    if redis_client and redis_client.available:
+        added = await RedisJobQueue(redis_client).enqueue(job)
+    if added is None:
+        added = await local_queue.enqueue(job)
+    (jobs_enqueued if added else jobs_deduplicated).inc()
+    return added
+
+async def run_consumers(concurrency: int, redis_url: Optional[str], stop: asyncio.Event):
+    """
+    Process jobs until `stop` is set: the local fallback queue always, and the
+    Redis stream when `redis_url` is given and `concurrency` is positive.
+    """
+    runners = [local_queue.run(max(concurrency, 1), stop)]
+    client = None
+    if redis_url and concurrency > 0:
+        # Dedicated connection: XREADGROUP blocks longer than the default socket timeout
+        client = create_redis(redis_url, socket_timeout=JOB_BLOCK_MS / 1000 + REDIS_SOCKET_TIMEOUT)
+        runners.append(RedisJobQueue(client).run(concurrency, stop))
+        logger.info(f"Consuming jobs from {JOB_STREAM} with concurrency {concurrency}")
+    try:
+        await asyncio.gather(*runners)
+    finally:
+        if client:
+            await client.close()
+
+async def queue_stats(redis_client=None) -> Dict[str, Any]:
+    result = {
+        "local": local_queue.stats(),
+        "enqueued": jobs_enqueued.value,
+        "deduplicated": jobs_deduplicated.value,
+        "completed": jobs_completed.value,
+        "retried": jobs_retried.value,
+        "dead": jobs_dead.value,
+    }
+    if redis_client and redis_client.available:
+        result["redis"] = await RedisJobQueue(redis_client).stats()
+    return result
@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import time
+import hashlib
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from app.utils import stats
+from app.utils.redis_client import get_redis
+from app.utils.analysis_cache import LocalCache
+from app.utils.singleflight import coalesce
+
+# Cache and rate limits for external verification lookups (fact checks,
+# trusted-source search). Many articles about the same story share claims
+# and titles, so lookups are keyed on the query with case and whitespace
+# normalized and answered from cache whenever possible:
+#
+#   lookup:{provider}:{hash}   -> provider response JSON
+#
+# Empty responses are cached too, with a shorter TTL, so a story nobody has
+# fact-checked yet is not looked up again on every analysis but is picked up
+# once a fact check appears. Calls that do reach a provider spend a token
+# from its budget (a token bucket shared by all workers through Redis); when
+# the budget is exhausted the lookup fails fast with BudgetExhausted instead
+# of going over the provider's quota. A rate of 0 disables a provider.
+
+LOOKUP_CACHE_TTL = int(os.getenv("LOOKUP_CACHE_TTL", "21600"))
+LOOKUP_NEGATIVE_TTL = int(os.getenv("LOOKUP_NEGATIVE_TTL", "900"))
+LOOKUP_LOCAL_CACHE_SIZE = int(os.getenv("LOOKUP_LOCAL_CACHE_SIZE", "512"))
+
+def _budget(rate_var: str, rate_default: str, burst_var: str, burst_default: str) -> Tuple[float, int]:
+    """Read a provider budget; a rate of 0 disables the provider"""
+    rate_per_min = float(os.getenv(rate_var, rate_default))
+    burst = int(os.getenv(burst_var, burst_default))
+    if rate_per_min < 0:
+        raise ValueError(f"{rate_var} must be 0 (disabled) or positive, got {rate_per_min}")
+    if rate_per_min > 0 and burst < 1:
+        raise ValueError(f"{burst_var} must be at least 1, got {burst}")
+    return rate_per_min, burst
+
+# Requests per minute and burst size per provider
+PROVIDER_BUDGETS: Dict[str, Tuple[float, int]] = {
+    "factcheck": _budget("FACT_CHECK_RATE_PER_MIN", "60", "FACT_CHECK_BURST", "10"),
+    "news": _budget("NEWS_SEARCH_RATE_PER_MIN", "10", "NEWS_SEARCH_BURST", "5"),
+}
+
+# Take one token if available; returns {allowed, tokens left}
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(redis.call("hget", KEYS[1], "tokens"))
+local updated = tonumber(redis.call("hget", KEYS[1], "updated"))
+if tokens == nil then
+    tokens = capacity
+    updated = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("expire", KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+class BudgetExhausted(Exception):
+    """Raised when a provider's rate-limit budget has no tokens left"""
+
+class TokenBucket:
+    """In-process token bucket, used when the shared bucket in Redis is unavailable"""
+
+    def __init__(self, rate_per_min: float, capacity: int):
+        self.rate = rate_per_min / 60
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+def provider_enabled(provider: str) -> bool:
+    return PROVIDER_BUDGETS[provider][0] > 0
+
+_local_buckets = {name: TokenBucket(*budget) for name, budget in PROVIDER_BUDGETS.items()}
+_tokens_left: Dict[str, float] = {
+    name: float(burst) if rate_per_min > 0 else 0.0 for name, (rate_per_min, burst) in PROVIDER_BUDGETS.items()
+}
+_local_cache = LocalCache(max_size=LOOKUP_LOCAL_CACHE_SIZE, ttl=LOOKUP_NEGATIVE_TTL, name="lookup")
+
+lookup_hits = stats.counter("lookup_cache_hits", "Provider lookups served from cache", labelnames=("provider",))
+lookup_negative_hits = stats.counter(
+    "lookup_cache_negative_hits", "Provider lookups served from a cached empty result", labelnames=("provider",)
+)
+lookup_misses = stats.counter("lookup_cache_misses", "Lookups sent to the provider", labelnames=("provider",))
+lookup_denied = stats.counter(
+    "lookup_budget_denied", "Lookups refused because the provider's budget was exhausted", labelnames=("provider",)
+)
+
+def _provider_counters(provider: str) -> Dict[str, stats.Counter]:
+    return {
+        "hits": lookup_hits.labels(provider=provider),
+        "negativeHits": lookup_negative_hits.labels(provider=provider),
+        "misses": lookup_misses.labels(provider=provider),
+        "denied": lookup_denied.labels(provider=provider),
+    }
+
+_counters = {provider: _provider_counters(provider) for provider in PROVIDER_BUDGETS}
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a claim or title so that trivially different variants share a
+    key: case and whitespace are ignored. Word order and short words are
+    kept, since "X is not Y" and "Y is not X" are different claims.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _WHITESPACE.sub(" ", text).strip()
+
+def _lookup_key(provider: str, query: str) -> str:
+    digest = hashlib.blake2b(normalize_query(query).encode("utf-8"), digest_size=16).hexdigest()
+    return f"lookup:{provider}:{digest}"
+
+async def _acquire(provider: str, redis_client) -> bool:
+    """Take a token from the provider's shared budget"""
+    rate_per_min, burst = PROVIDER_BUDGETS[provider]
+    if rate_per_min <= 0:
+        return False
+    if redis_client and redis_client.available:
+        result = await redis_client.eval(
+            _TOKEN_BUCKET_SCRIPT, 1, f"budget:{provider}",
+            rate_per_min / 60, burst, time.time(), int(burst / (rate_per_min / 60)) + 60
+        )
+        if result is not None:
+            _tokens_left[provider] = float(result[1])
+            return bool(result[0])
+    allowed = _local_buckets[provider].acquire()
+    _tokens_left[provider] = _local_buckets[provider].tokens
+    return allowed
+
+async def cached_lookup(provider: str, query: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return the cached response for `query` from `provider`, or call `fetch`
+    within the provider's budget and cache what it returns. Errors raised by
+    `fetch` are not cached.
+    """
+    counters = _counters[provider]
+    redis_client = get_redis()
+    key = _lookup_key(provider, query)
+
+    cached = _local_cache.get(key, record=False)
+    if cached is None and redis_client:
+        raw = await redis_client.get(key)
+        cached = json.loads(raw) if raw else None
+    if cached is not None:
+        counters["hits"].inc()
+        if not cached["value"]:
+            counters["negativeHits"].inc()
+        return cached["value"]
+
+    async def call_provider():
+        if not await _acquire(provider, redis_client):
+            counters["denied"].inc()
+            raise BudgetExhausted(f"Rate-limit budget for {provider} is exhausted")
+        counters["misses"].inc()
+        value = await fetch()
+
+        ttl = LOOKUP_CACHE_TTL if value else LOOKUP_NEGATIVE_TTL
+        entry = {"value": value, "storedAt": int(time.time())}
+        _local_cache.set(key, entry, ttl=min(ttl, LOOKUP_NEGATIVE_TTL))
+        if redis_client:
+            await redis_client.setex(key, ttl, json.dumps(entry))
+        return value
+
+    # Concurrent lookups of the same query in this worker make one call
+    return await coalesce(key, call_provider)
+
+def lookup_stats() -> Dict[str, Any]:
+    result = {}
+    for provider, counters in _counters.items():
+        hits, misses = counters["hits"].value, counters["misses"].value
+        rate_per_min, burst = PROVIDER_BUDGETS[provider]
+        result[provider] = {
+            "hits": hits,
+            "negativeHits": counters["negativeHits"].value,
+            "misses": misses,
+            "hitRate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "budget": {
+                "enabled": provider_enabled(provider),
+                "ratePerMin": rate_per_min,
+                "burst": burst,
+                "tokensLeft": round(_tokens_left[provider], 2),
+                "denied": counters["denied"].value,
+            },
+        }
+    return result
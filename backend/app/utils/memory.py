@@ -0,0 +1,37 @@
+import os
+import resource
+from typing import Any, Dict
+from loguru import logger
+
+# Per-process memory usage, reported by /health.
+# With preloaded models most of a worker's RSS is shared with the gunicorn
+# master and the other workers, so RSS alone overstates what each worker
+# costs. "private" is the memory only this worker holds, which is what an
+# extra worker adds to the instance.
+
+def _read_kb_fields(path: str) -> Dict[str, int]:
+    fields = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields
+
+def get_memory_usage() -> Dict[str, Any]:
+    """Return RSS, shared and private memory of this process in MB"""
+    usage: Dict[str, Any] = {"pid": os.getpid()}
+    try:
+        rollup = _read_kb_fields("/proc/self/smaps_rollup")
+        usage["rssMb"] = round(rollup.get("Rss", 0) / 1024, 1)
+        usage["sharedMb"] = round((rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0)) / 1024, 1)
+        usage["privateMb"] = round((rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0)) / 1024, 1)
+        usage["pssMb"] = round(rollup.get("Pss", 0) / 1024, 1)
+    except OSError:
+        # Not Linux: fall back to peak RSS (kilobytes on Linux, bytes on macOS)
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        divisor = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+        usage["maxRssMb"] = round(max_rss / divisor, 1)
+    except Exception as e:
+        logger.warning(f"Could not read memory usage: {e}")
+    return usage
@@ -0,0 +1,115 @@
+import os
+import time
+from typing import Any, Dict, Tuple
+
+from app.utils import stats
+
+# Prometheus exposition for the /metrics endpoint.
+# Every counter, gauge and histogram in app/utils/stats.py is mirrored into
+# prometheus_client. Under gunicorn each worker writes its values to files
+# in PROMETHEUS_MULTIPROC_DIR (set up by gunicorn.conf.py), so whichever
+# worker answers a scrape reports the totals of all of them; without it the
+# endpoint reports the current process only.
+# Request latency per route comes from MetricsMiddleware, labelled with the
+# route template (/api/analyze/{url}) rather than the raw path so the number
+# of series stays bounded. The Redis job queue backlog is shared by every
+# worker, so it is read from Redis at scrape time instead of being counted.
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client.core import GaugeMetricFamily
+    from prometheus_client.multiprocess import MultiProcessCollector
+except ImportError:
+    prometheus_client = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+if prometheus_client is not None:
+    request_duration = Histogram(
+        "truthlens_http_request_duration_seconds",
+        "HTTP request latency by route template",
+        ["method", "route", "status"],
+        buckets=REQUEST_BUCKETS,
+    )
+
+def metrics_enabled() -> bool:
+    return prometheus_client is not None
+
+def multiprocess_dir() -> str:
+    return os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir") or ""
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or prometheus_client is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths (404s, static files) share one label
+            template = getattr(route, "path", None) or "unmatched"
+            request_duration.labels(scope["method"], template, str(status)).observe(time.perf_counter() - start)
+
+class _SnapshotCollector:
+    """Exposes precomputed gauge values, collected once per scrape"""
+
+    def __init__(self, values: Dict[str, Tuple[str, float]]):
+        self.values = values
+
+    def collect(self):
+        for name, (description, value) in self.values.items():
+            yield GaugeMetricFamily(stats.PROMETHEUS_PREFIX + name, description, value=value)
+
+async def _backlog_values(redis_client) -> Dict[str, Tuple[str, float]]:
+    from app.utils.job_queue import RedisJobQueue
+
+    if not (redis_client and redis_client.available):
+        return {}
+    backlog: Dict[str, Any] = await RedisJobQueue(redis_client).stats()
+    values = {
+        "jobs_redis_waiting": ("Jobs in the Redis stream not yet delivered", backlog.get("waiting")),
+        "jobs_redis_running": ("Jobs delivered to a consumer and not yet acknowledged", backlog.get("running")),
+        "jobs_redis_delayed": ("Jobs waiting to be retried", backlog.get("delayed")),
+        "jobs_redis_dead": ("Jobs moved to the dead-letter stream", backlog.get("dead")),
+        "jobs_redis_depth": ("Waiting, running and delayed jobs", backlog.get("depth")),
+        "jobs_redis_oldest_waiting_seconds": ("Age of the oldest undelivered job", backlog.get("oldestWaitingMs", 0) / 1000),
+        "jobs_redis_consumers": ("Consumers registered in the job group", backlog.get("consumers")),
+    }
+    return {name: (description, value) for name, (description, value) in values.items() if value is not None}
+
+async def render_metrics(redis_client=None) -> Tuple[bytes, str]:
+    """Return the Prometheus text exposition and its content type"""
+    if prometheus_client is None:
+        return b"# prometheus_client is not installed\n", CONTENT_TYPE_LATEST
+
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    output = generate_latest(registry)
+
+    backlog = await _backlog_values(redis_client)
+    if backlog:
+        snapshot_registry = CollectorRegistry()
+        snapshot_registry.register(_SnapshotCollector(backlog))
+        output += generate_latest(snapshot_registry)
+    return output, CONTENT_TYPE_LATEST
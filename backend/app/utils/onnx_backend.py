@@ -0,0 +1,139 @@
+import os
+import json
+import pathlib
+from typing import List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+# ONNX Runtime backend for the text classifiers and the sentence embedder.
+# Models are exported and int8-quantized ahead of time by
+# scripts/export_onnx.py and loaded from a local directory, so nothing is
+# downloaded at runtime. Each model directory contains:
+#   model.int8.onnx  (or model.onnx when MODEL_QUANTIZED=false)
+#   tokenizer.json   (Hugging Face fast tokenizer file)
+#   labels.json      (label names in output order; classifiers only)
+
+MAX_SEQUENCE_LENGTH = int(os.getenv("MODEL_MAX_LENGTH", "512"))
+
+def model_filename(quantized: bool = True) -> str:
+    return "model.int8.onnx" if quantized else "model.onnx"
+
+class OnnxModel:
+    """Transformer encoder running on ONNX Runtime (CPU)"""
+
+    def __init__(
+        self,
+        model_dir: pathlib.Path,
+        quantized: bool = True,
+        fork_safe: bool = False,
+        max_length: int = MAX_SEQUENCE_LENGTH
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = pathlib.Path(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+        if fork_safe:
+            # Sessions created before fork must not own thread pools: the
+            # threads would not exist in the workers and runs would hang.
+            # Parallelism comes from the inference executor instead.
+            options.intra_op_num_threads = 1
+            options.inter_op_num_threads = 1
+            options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        elif threads:
+            options.intra_op_num_threads = threads
+
+        model_path = self.model_dir / model_filename(quantized)
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        pad_token = next(
+            (t for t in ("[PAD]", "<pad>") if self.tokenizer.token_to_id(t) is not None), None
+        )
+        pad_id = self.tokenizer.token_to_id(pad_token) if pad_token else 0
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token=pad_token or "[PAD]")
+        self.model_path = model_path
+
+    def run(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the first model output and the attention mask for a batch of texts"""
+        encodings = self.tokenizer.encode_batch(texts)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        attention_mask = feed["attention_mask"]
+        feed = {name: value for name, value in feed.items() if name in self.input_names}
+        return self.session.run(None, feed)[0], attention_mask
+
+class OnnxClassifier(OnnxModel):
+    """Sequence classifier running on ONNX Runtime (CPU)"""
+
+    def __init__(
+        self,
+        model_dir: pathlib.Path,
+        quantized: bool = True,
+        multi_label: bool = False,
+        fork_safe: bool = False
+    ):
+        super().__init__(model_dir, quantized=quantized, fork_safe=fork_safe)
+        self.multi_label = multi_label
+
+        with open(self.model_dir / "labels.json") as f:
+            self.labels: List[str] = json.load(f)
+
+        logger.info(f"Loaded ONNX model {self.model_path} ({len(self.labels)} labels)")
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """Return class probabilities for a batch of texts, shape (batch, labels)"""
+        logits, _ = self.run(texts)
+
+        if self.multi_label:
+            return 1.0 / (1.0 + np.exp(-logits))
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+class OnnxEmbedder(OnnxModel):
+    """Sentence embedder: mean-pooled, L2-normalized encoder outputs"""
+
+    def __init__(
+        self,
+        model_dir: pathlib.Path,
+        quantized: bool = True,
+        fork_safe: bool = False,
+        max_length: int = 256
+    ):
+        super().__init__(model_dir, quantized=quantized, fork_safe=fork_safe, max_length=max_length)
+        self.dim = int(self.session.get_outputs()[0].shape[-1])
+        # Identifies the vectors this model produces (written by the export script)
+        self.name = "onnx"
+        if (self.model_dir / "model.json").exists():
+            with open(self.model_dir / "model.json") as f:
+                self.name = json.load(f).get("id", self.name)
+        logger.info(f"Loaded ONNX embedder {self.model_path} ({self.dim} dimensions)")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return embeddings for a batch of texts, shape (batch, dim)"""
+        hidden, attention_mask = self.run(texts)
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-9)
+
+def load_classifier(
+    model_dir: pathlib.Path,
+    quantized: bool = True,
+    multi_label: bool = False,
+    fork_safe: bool = False
+) -> Optional[OnnxClassifier]:
+    """Load a classifier, returning None if its files are missing"""
+    if not (pathlib.Path(model_dir) / model_filename(quantized)).exists():
+        logger.warning(f"No ONNX model found in {model_dir}")
+        return None
+    return OnnxClassifier(model_dir, quantized=quantized, multi_label=multi_label, fork_safe=fork_safe)
@@ -0,0 +1,340 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+from app.utils import stats
+
+# Opt-in profiling for running workers.
+# StackSampler is a statistical CPU profiler: a background thread wakes every
+# PROFILE_INTERVAL_MS, reads the current stack of every other thread (event
+# loop, inference and database threads) from sys._current_frames() and counts
+# each distinct stack. Nothing is hooked into the profiled code, so the cost
+# is one short pass over the stacks per interval, and only while a profile is
+# being taken. Threads that are just waiting (selector, queue or lock waits)
+# are left out by default so the output shows where CPU time goes.
+# Profiles are taken two ways: a share (PROFILE_SAMPLE_RATE) of POST
+# /api/analyze* requests are profiled for their duration, and the admin
+# endpoints capture a profile of the whole worker for a given time. They are
+# written to PROFILE_DIR as collapsed stacks (flamegraph.pl, speedscope,
+# inferno) or speedscope JSON. The sampler sees the whole process, so a
+# request profile also includes whatever ran concurrently with it.
+# Memory: tracemalloc can be switched on at runtime; snapshots list the top
+# allocation sites, compared against the snapshot taken when it was started.
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "data", "profiles"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "collapsed").lower()  # collapsed or speedscope
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+
+FORMATS = ("collapsed", "speedscope")
+
+# Leaf frames of threads that are blocked rather than running Python code
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+profiles_written = stats.counter("profiles_written", "CPU profiles written to PROFILE_DIR")
+requests_profiled = stats.counter("requests_profiled", "Requests profiled by PROFILE_SAMPLE_RATE")
+
+class ProfilerBusy(Exception):
+    """Raised when a CPU profile is already being taken in this worker."""
+    pass
+
+# One sampler at a time per process; overlapping samplers would profile each other
+_active_lock = threading.Lock()
+
+def _frame_label(frame) -> Tuple[str, str, int]:
+    code = frame.f_code
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+class StackSampler:
+    """Counts the stacks of all other threads every `interval` seconds"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000, include_idle: bool = False):
+        self.interval = max(0.001, interval)
+        self.include_idle = include_idle
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not _active_lock.acquire(blocking=False):
+            raise ProfilerBusy("A CPU profile is already being taken in this worker")
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.duration = time.perf_counter() - self.started_at
+            _active_lock.release()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                name, filename, _ = stack[0]
+                if not self.include_idle and (os.path.basename(filename), name) in _IDLE_FRAMES:
+                    continue
+                stack.reverse()
+                self.counts[(names.get(thread_id, str(thread_id)), tuple(stack))] += 1
+            self.samples += 1
+
+    def top_functions(self, limit: int = 15) -> List[Dict[str, Any]]:
+        """Functions by share of samples in which they were running (self time)"""
+        leaves: Counter = Counter()
+        for (_, stack), count in self.counts.items():
+            leaves[stack[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [
+            {"function": _format_frame(frame), "samples": count, "share": round(count / total, 3)}
+            for frame, count in leaves.most_common(limit)
+        ]
+
+    def collapsed(self) -> str:
+        """One line per stack: thread;outer;...;inner count"""
+        lines = []
+        for (thread_name, stack), count in sorted(self.counts.items()):
+            frames = ";".join(_format_frame(frame) for frame in stack)
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """Speedscope file with one sampled profile per thread"""
+        frame_index: Dict[Tuple[str, str, int], int] = {}
+        frames: List[Dict[str, Any]] = []
+        per_thread: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+        for (thread_name, stack), count in self.counts.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(frame_index[frame])
+            samples, weights = per_thread.setdefault(thread_name, ([], []))
+            samples.append(indexes)
+            weights.append(round(count * self.interval, 6))
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "truthlens",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(sum(weights), 6),
+                    "samples": samples,
+                    "weights": weights,
+                }
+                for thread_name, (samples, weights) in sorted(per_thread.items())
+            ],
+        }
+
+def _format_frame(frame: Tuple[str, str, int]) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def write_profile(sampler: StackSampler, name: str, fmt: str = PROFILE_FORMAT) -> str:
+    """Write a finished profile to PROFILE_DIR and return its path"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown profile format '{fmt}'")
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{name}.{'collapsed' if fmt == 'collapsed' else 'speedscope.json'}")
+    with open(path, "w") as f:
+        if fmt == "collapsed":
+            f.write(sampler.collapsed())
+        else:
+            json.dump(sampler.speedscope(name), f)
+    profiles_written.inc()
+    _prune_profiles()
+    return path
+
+def _prune_profiles():
+    files = list_profiles()
+    for entry in files[PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, entry["name"]))
+        except OSError:
+            pass
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Profiles in PROFILE_DIR, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(PROFILE_DIR):
+        path = os.path.join(PROFILE_DIR, name)
+        if os.path.isfile(path):
+            info = os.stat(path)
+            entries.append({"name": name, "bytes": info.st_size, "createdAt": int(info.st_mtime)})
+    return sorted(entries, key=lambda entry: entry["createdAt"], reverse=True)
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a profile in PROFILE_DIR, or None if there is no such file"""
+    path = os.path.join(PROFILE_DIR, os.path.basename(name))
+    return path if os.path.isfile(path) else None
+
+def _profile_name(kind: str) -> str:
+    return f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{random.randrange(16 ** 4):04x}"
+
+async def capture_cpu_profile(
+    seconds: float,
+    fmt: str = PROFILE_FORMAT,
+    include_idle: bool = False
+) -> Dict[str, Any]:
+    """Profile the whole worker for `seconds` and write the result"""
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    sampler = StackSampler(include_idle=include_idle)
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    path = await asyncio.to_thread(write_profile, sampler, _profile_name("cpu"), fmt)
+    logger.info(f"Wrote {seconds:.1f}s CPU profile to {path}")
+    return {
+        "pid": os.getpid(),
+        "file": os.path.basename(path),
+        "seconds": round(sampler.duration, 2),
+        "samples": sampler.samples,
+        "topFunctions": sampler.top_functions(),
+    }
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles a share of POST /api/analyze* requests"""
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if (
+            self.sample_rate <= 0
+            or scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith("/api/analyze")
+            or random.random() >= self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler()
+        try:
+            sampler.start()
+        except ProfilerBusy:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.stop()
+            requests_profiled.inc()
+            name = _profile_name("request" + scope["path"].replace("/", "-"))
+            path = await asyncio.to_thread(write_profile, sampler, name)
+            logger.info(f"Profiled {scope['path']} ({sampler.duration * 1000:.0f} ms) to {path}")
+
+_memory_baseline: Optional[tracemalloc.Snapshot] = None
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    """A snapshot without tracemalloc's own and the import machinery's allocations"""
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+
+def start_memory_tracing(frames: int = PROFILE_TRACEMALLOC_FRAMES) -> Dict[str, Any]:
+    """Start tracemalloc; later snapshots are compared with the state at this point"""
+    global _memory_baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        logger.info(f"Started tracemalloc ({frames} frames)")
+    _memory_baseline = _take_snapshot()
+    return memory_status()
+
+def stop_memory_tracing() -> Dict[str, Any]:
+    global _memory_baseline
+    tracemalloc.stop()
+    _memory_baseline = None
+    logger.info("Stopped tracemalloc")
+    return memory_status()
+
+def memory_status() -> Dict[str, Any]:
+    status: Dict[str, Any] = {"pid": os.getpid(), "tracing": tracemalloc.is_tracing()}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        status.update(tracedMb=round(current / 1e6, 2), peakMb=round(peak / 1e6, 2))
+    return status
+
+def memory_snapshot(
+    top: int = 20,
+    group_by: str = "lineno",
+    compare: bool = True,
+    dump: bool = False
+) -> Dict[str, Any]:
+    """
+    Top allocation sites by size, or with `compare` by growth since tracing
+    was started (the usual way to find a leak). With `dump`, the raw
+    snapshot is also written to PROFILE_DIR for offline analysis with
+    tracemalloc.Snapshot.load().
+    """
+    if not tracemalloc.is_tracing():
+        return memory_status()
+
+    snapshot = _take_snapshot()
+    if compare and _memory_baseline is not None:
+        top_stats = snapshot.compare_to(_memory_baseline, group_by)
+    else:
+        top_stats = snapshot.statistics(group_by)
+
+    result = memory_status()
+    result["top"] = [
+        {
+            "location": str(stat.traceback[0]) if group_by != "traceback" else stat.traceback.format(),
+            "sizeKb": round(stat.size / 1024, 1),
+            "count": stat.count,
+            "sizeDiffKb": round(getattr(stat, "size_diff", 0) / 1024, 1),
+        }
+        for stat in top_stats[:top]
+    ]
+    if dump:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{_profile_name('memory')}.tracemalloc")
+        snapshot.dump(path)
+        _prune_profiles()
+        result["file"] = os.path.basename(path)
+    return result
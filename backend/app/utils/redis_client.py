@@ -1,16 +1,228 @@
 import os
-import redis
+import time
+import asyncio
+import functools
+from typing import Any, Optional
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError, ResponseError
 from loguru import logger
 
-# Initialize Redis client
-redis_client = None
+from app.utils import stats
+
+# Async Redis client shared by the request handlers.
+# Connections come from a bounded pool, every command has a short socket
+# timeout, and a circuit breaker stops calling Redis after repeated failures.
+# While the breaker is open, commands return None immediately, which callers
+# already treat as "not cached", so a slow or unreachable Redis degrades us to
+# running without a cache instead of stalling requests.
+
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1.0"))
+REDIS_BREAKER_FAILURES = int(os.getenv("REDIS_BREAKER_FAILURES", "5"))
+REDIS_BREAKER_RESET = float(os.getenv("REDIS_BREAKER_RESET", "30"))
+
+# Errors that mean Redis is slow or unavailable, as opposed to programming errors
+REDIS_ERRORS = (RedisError, asyncio.TimeoutError, OSError)
+
+# Round trips are far below the default millisecond buckets when Redis is local
+REDIS_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+command_time = stats.histogram("redis_command_ms", "Round-trip time of Redis commands", REDIS_BUCKETS)
+pipeline_time = stats.histogram("redis_pipeline_ms", "Round-trip time of Redis pipelines", REDIS_BUCKETS)
+breaker_open = stats.gauge("redis_breaker_open", "1 while the Redis circuit breaker is open")
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and stays open for
+    `reset_timeout` seconds. After that a single trial call is let through
+    (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def is_trial(self) -> bool:
+        """Whether a call that allow() just let through is the half-open trial"""
+        return self.state == "half-open"
+
+    def end_trial(self):
+        """
+        Let another trial through. Called after the trial call however it
+        ended, so a trial that was cancelled or hit an unexpected error does
+        not keep the breaker from ever closing.
+        """
+        self._trial_in_flight = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Redis circuit breaker closed")
+            breaker_open.set(0)
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Redis circuit breaker opened after {self.failures} failures")
+                breaker_open.set(1)
+            self.opened_at = time.monotonic()
+
+class ResilientPipeline:
+    """Pipeline wrapper whose execute() goes through the circuit breaker"""
+
+    def __init__(self, pipeline, breaker: CircuitBreaker):
+        self._pipeline = pipeline
+        self._breaker = breaker
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._pipeline, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def queue_command(*args, **kwargs):
+            # Pipeline commands only buffer; keep returning the wrapper for chaining
+            attr(*args, **kwargs)
+            return self
+
+        return queue_command
+
+    async def execute(self) -> Optional[list]:
+        if not self._breaker.allow():
+            await self._pipeline.reset()
+            return None
+        trial = self._breaker.is_trial()
+        try:
+            start = time.perf_counter()
+            result = await self._pipeline.execute()
+            pipeline_time.observe((time.perf_counter() - start) * 1000)
+            self._breaker.record_success()
+            return result
+        except ResponseError as e:
+            # Redis answered, so this says nothing about its availability
+            logger.warning(f"Redis pipeline error: {e}")
+            await self._pipeline.reset()
+            return None
+        except REDIS_ERRORS as e:
+            self._breaker.record_failure()
+            logger.warning(f"Redis pipeline failed: {e}")
+            await self._pipeline.reset()
+            return None
+        finally:
+            if trial:
+                self._breaker.end_trial()
+
+class ResilientRedis:
+    """
+    Async Redis client whose commands return None instead of raising when
+    Redis is unavailable or the circuit breaker is open.
+    """
+
+    def __init__(self, client: aioredis.Redis, breaker: CircuitBreaker):
+        self.client = client
+        self.breaker = breaker
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def guarded(*args, **kwargs) -> Any:
+            if not self.breaker.allow():
+                return None
+            trial = self.breaker.is_trial()
+            try:
+                start = time.perf_counter()
+                result = await attr(*args, **kwargs)
+                # Blocking reads wait for data on purpose; their time is not latency
+                if "block" not in kwargs:
+                    command_time.observe((time.perf_counter() - start) * 1000)
+                self.breaker.record_success()
+                return result
+            except ResponseError as e:
+                # Redis answered, so this says nothing about its availability
+                logger.warning(f"Redis {name} error: {e}")
+                return None
+            except REDIS_ERRORS as e:
+                self.breaker.record_failure()
+                logger.warning(f"Redis {name} failed: {e}")
+                return None
+            finally:
+                if trial:
+                    self.breaker.end_trial()
+
+        return guarded
+
+    def pipeline(self, transaction: bool = False) -> ResilientPipeline:
+        """Batch several commands into a single round trip"""
+        return ResilientPipeline(self.client.pipeline(transaction=transaction), self.breaker)
+
+    def pubsub(self, **kwargs):
+        return self.client.pubsub(**kwargs)
+
+    @property
+    def available(self) -> bool:
+        return self.breaker.state != "open"
+
+    async def close(self):
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+
+def create_redis(url: str, socket_timeout: Optional[float] = None) -> ResilientRedis:
+    """
+    Create a pooled async Redis client for `url`. Clients that issue blocking
+    commands (XREADGROUP ... BLOCK) need a socket timeout longer than the block.
+    """
+    pool = aioredis.ConnectionPool.from_url(
+        url,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=socket_timeout or REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        health_check_interval=30,
+        decode_responses=True,
+    )
+    client = aioredis.Redis(connection_pool=pool)
+    return ResilientRedis(client, CircuitBreaker(REDIS_BREAKER_FAILURES, REDIS_BREAKER_RESET))
+
+# Initialize Redis client. Connections are opened lazily on first use.
+redis_client: Optional[ResilientRedis] = None
 if os.getenv("REDIS_URL"):
     try:
-        redis_client = redis.from_url(os.getenv("REDIS_URL"))
-        logger.info("Connected to Redis successfully")
+        redis_client = create_redis(os.getenv("REDIS_URL"))
+        logger.info(f"Configured Redis client (pool of {REDIS_MAX_CONNECTIONS} connections)")
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
 
-def get_redis():
+def get_redis() -> Optional[ResilientRedis]:
     """Return the Redis client instance"""
-    return redis_client 
\ No newline at end of file
+    return redis_client
+
+async def close_redis():
+    """Close the Redis connection pool"""
+    if redis_client:
+        await redis_client.close()
@@ -0,0 +1,255 @@
+import os
+import re
+import json
+import time
+import base64
+import asyncio
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from loguru import logger
+
+from app.utils import stats
+
+# Near-duplicate article index (MinHash + LSH).
+# Each article is reduced to a MinHash signature over its word shingles; the
+# fraction of equal signature positions estimates the Jaccard similarity of
+# two articles' shingle sets. Signatures are split into bands and every band
+# is hashed into a bucket, so articles sharing at least one bucket become
+# candidates and only those are scored. Lookups touch a handful of candidates
+# instead of the whole index and take well under a millisecond.
+#
+# The index lives in memory in every process that queries it. With Redis it
+# is also persisted, so it survives restarts and picks up articles indexed
+# by other workers:
+#
+#   similarity:docs   hash  {doc id -> metadata + base64 signature}
+#   similarity:added  zset  {doc id -> time added or last matched}, polled
+#                           for new entries and trimmed from the lowest
+#
+# Both the in-memory index and the persisted copy keep the most recently
+# added or matched documents, so an old article that keeps matching new
+# coverage survives restarts. Signatures are computed off the event loop.
+
+SIMILARITY_NUM_PERM = int(os.getenv("SIMILARITY_NUM_PERM", "128"))
+SIMILARITY_BANDS = int(os.getenv("SIMILARITY_BANDS", "32"))
+SIMILARITY_SHINGLE_SIZE = int(os.getenv("SIMILARITY_SHINGLE_SIZE", "3"))
+SIMILARITY_MAX_CHARS = int(os.getenv("SIMILARITY_MAX_CHARS", "20000"))
+SIMILARITY_MAX_DOCS = int(os.getenv("SIMILARITY_MAX_DOCS", "50000"))
+SIMILARITY_SYNC_INTERVAL = float(os.getenv("SIMILARITY_SYNC_INTERVAL", "30"))
+
+DOCS_KEY = "similarity:docs"
+ADDED_KEY = "similarity:added"
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+query_time = stats.histogram(
+    "similarity_query_ms", "Time to query the near-duplicate index",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+class MinHasher:
+    """MinHash signatures over word shingles"""
+
+    def __init__(self, num_perm: int = SIMILARITY_NUM_PERM, shingle_size: int = SIMILARITY_SHINGLE_SIZE, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Fixed seed: signatures must be comparable across processes and restarts
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> Set[str]:
+        words = re.findall(r"\w+", text[:SIMILARITY_MAX_CHARS].lower())
+        if len(words) < self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Return the signature of `text`, or None if it has no words"""
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+        # crc32 is stable across processes (unlike hash()) and cheap
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        # (a * h + b) mod p, for every shingle and permutation at once
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures. Past `max_docs` the least recently
+    added or matched document is evicted.
+    """
+
+    def __init__(self, num_perm: int = SIMILARITY_NUM_PERM, bands: int = SIMILARITY_BANDS, max_docs: int = SIMILARITY_MAX_DOCS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_docs = max_docs
+        self._docs: "OrderedDict[str, Tuple[np.ndarray, Dict[str, Any]]]" = OrderedDict()
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, doc_id: str, signature: np.ndarray, meta: Dict[str, Any]):
+        if doc_id in self._docs:
+            self.remove(doc_id)
+        self._docs[doc_id] = (signature, meta)
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(key, set()).add(doc_id)
+        while len(self._docs) > self.max_docs:
+            self.remove(next(iter(self._docs)))
+
+    def remove(self, doc_id: str):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        for band, key in zip(self._buckets, self._band_keys(entry[0])):
+            bucket = band.get(key)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del band[key]
+
+    def query(
+        self,
+        signature: np.ndarray,
+        k: int = 5,
+        min_score: float = 0.0,
+        exclude: Optional[Set[str]] = None
+    ) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Return up to `k` (estimated Jaccard, doc id, metadata), best first"""
+        candidates: Set[str] = set()
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            candidates |= band.get(key, set())
+        if exclude:
+            candidates -= exclude
+        if not candidates:
+            return []
+
+        ids = list(candidates)
+        matrix = np.stack([self._docs[doc_id][0] for doc_id in ids])
+        scores = (matrix == signature).mean(axis=1)
+        order = np.argsort(-scores)[:k]
+        results = [
+            (float(scores[i]), ids[i], self._docs[ids[i]][1])
+            for i in order
+            if scores[i] >= min_score
+        ]
+        # Articles that keep matching new coverage are evicted last
+        for _, doc_id, _ in results:
+            self._docs.move_to_end(doc_id)
+        return results
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+hasher = MinHasher()
+index = LSHIndex()
+_last_sync = 0.0
+
+def _encode_signature(signature: np.ndarray) -> str:
+    return base64.b64encode(signature.tobytes()).decode("ascii")
+
+def _decode_signature(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.uint32).copy()
+
+async def find_similar(
+    text: str,
+    k: int = 5,
+    min_score: float = 0.0,
+    exclude: Optional[Set[str]] = None,
+    redis_client=None
+) -> List[Tuple[float, str, Dict[str, Any]]]:
+    """Query the index with the text of an article"""
+    start = time.perf_counter()
+    signature = await asyncio.to_thread(hasher.signature, text)
+    if signature is None:
+        return []
+    try:
+        matches = index.query(signature, k=k, min_score=min_score, exclude=exclude)
+    finally:
+        query_time.observe((time.perf_counter() - start) * 1000)
+
+    if matches and redis_client:
+        # Keep the persisted copies of matched documents from being trimmed
+        now = time.time()
+        await redis_client.zadd(ADDED_KEY, {doc_id: now for _, doc_id, _ in matches}, xx=True)
+    return matches
+
+async def add_document(doc_id: str, text: str, meta: Dict[str, Any], redis_client=None) -> bool:
+    """Index an article, persisting it when Redis is available"""
+    if doc_id in index:
+        return False
+    signature = await asyncio.to_thread(hasher.signature, text)
+    if signature is None:
+        return False
+    index.add(doc_id, signature, meta)
+
+    if redis_client:
+        pipe = redis_client.pipeline()
+        pipe.hset(DOCS_KEY, doc_id, json.dumps({"meta": meta, "signature": _encode_signature(signature)}))
+        pipe.zadd(ADDED_KEY, {doc_id: time.time()})
+        await pipe.execute()
+    return True
+
+async def _load_since(redis_client, since: float) -> int:
+    """Add documents persisted after `since` to the in-memory index"""
+    doc_ids = await redis_client.zrangebyscore(ADDED_KEY, f"({since}", "+inf") or []
+    doc_ids = [doc_id for doc_id in doc_ids if doc_id not in index]
+    loaded = 0
+    for start in range(0, len(doc_ids), 500):
+        chunk = doc_ids[start:start + 500]
+        for doc_id, raw in zip(chunk, await redis_client.hmget(DOCS_KEY, chunk) or []):
+            if raw:
+                entry = json.loads(raw)
+                index.add(doc_id, _decode_signature(entry["signature"]), entry["meta"])
+                loaded += 1
+    return loaded
+
+async def _trim(redis_client):
+    """Drop the least recently added or matched documents beyond SIMILARITY_MAX_DOCS"""
+    overflow = (await redis_client.zcard(ADDED_KEY) or 0) - SIMILARITY_MAX_DOCS
+    if overflow > 0:
+        oldest = await redis_client.zrange(ADDED_KEY, 0, overflow - 1) or []
+        if oldest:
+            pipe = redis_client.pipeline()
+            pipe.hdel(DOCS_KEY, *oldest)
+            pipe.zrem(ADDED_KEY, *oldest)
+            await pipe.execute()
+
+async def sync_index(redis_client):
+    """Load the persisted index, then keep picking up new documents"""
+    global _last_sync
+    while True:
+        try:
+            now = time.time()
+            loaded = await _load_since(redis_client, _last_sync)
+            if loaded:
+                logger.info(f"Loaded {loaded} documents into the similarity index ({len(index)} total)")
+            await _trim(redis_client)
+            # Overlap by one interval so documents added while loading are not missed
+            _last_sync = now - SIMILARITY_SYNC_INTERVAL
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Similarity index sync failed: {str(e)}")
+        await asyncio.sleep(SIMILARITY_SYNC_INTERVAL)
+
+def index_stats() -> Dict[str, Any]:
+    return {
+        "documents": len(index),
+        "bands": index.bands,
+        "rows": index.rows,
+        "buckets": sum(len(band) for band in index._buckets),
+    }
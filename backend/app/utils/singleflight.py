@@ -0,0 +1,129 @@
+import os
+import uuid
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+from loguru import logger
+
+from app.utils import stats
+
+# Single-flight request coalescing.
+# When many requests for the same article arrive before the first analysis
+# has been cached, only one of them runs inference; the rest wait for its
+# result. Within a worker the waiters share one asyncio task. Across gunicorn
+# workers the leader holds a short Redis lease, and other workers poll the
+# cache until the result appears or the lease goes away, and only then run
+# the computation themselves.
+
+SINGLEFLIGHT_LEASE_MS = int(os.getenv("SINGLEFLIGHT_LEASE_MS", "10000"))
+SINGLEFLIGHT_POLL_MS = int(os.getenv("SINGLEFLIGHT_POLL_MS", "50"))
+
+# Delete the lease only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+leaders = stats.counter("singleflight_leaders", "Computations run by a single-flight leader")
+coalesced_local = stats.counter(
+    "singleflight_coalesced_local", "Requests that waited on an in-flight computation in the same worker"
+)
+coalesced_remote = stats.counter(
+    "singleflight_coalesced_remote", "Requests served by a computation running in another worker"
+)
+
+_inflight: Dict[str, asyncio.Task] = {}
+
+def _lease_key(key: str) -> str:
+    return f"lease:{key}"
+
+async def _wait_for_remote(
+    redis_client,
+    key: str,
+    lookup: Callable[[], Awaitable[Optional[Any]]]
+) -> Optional[Any]:
+    """Poll `lookup` while another worker holds the lease for `key`"""
+    deadline = asyncio.get_running_loop().time() + SINGLEFLIGHT_LEASE_MS / 1000
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(SINGLEFLIGHT_POLL_MS / 1000)
+        result = await lookup()
+        if result is not None:
+            return result
+        if not await redis_client.exists(_lease_key(key)):
+            # The leader finished without caching (or died); check once more
+            return await lookup()
+    return None
+
+async def _compute_with_lease(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    redis_client,
+    lookup: Optional[Callable[[], Awaitable[Optional[Any]]]]
+) -> Any:
+    if redis_client and lookup:
+        token = uuid.uuid4().hex
+        acquired = await redis_client.set(_lease_key(key), token, nx=True, px=SINGLEFLIGHT_LEASE_MS)
+        if not acquired and redis_client.available:
+            result = await _wait_for_remote(redis_client, key, lookup)
+            if result is not None:
+                coalesced_remote.inc()
+                return result
+            logger.info(f"No result from remote leader for {key}, computing locally")
+
+        if acquired:
+            leaders.inc()
+            try:
+                return await compute()
+            finally:
+                await redis_client.eval(_RELEASE_SCRIPT, 1, _lease_key(key), token)
+
+    leaders.inc()
+    return await compute()
+
+async def coalesce(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    redis_client=None,
+    lookup: Optional[Callable[[], Awaitable[Optional[Any]]]] = None
+) -> Any:
+    """
+    Run `compute` once per `key` no matter how many callers ask concurrently.
+
+    `lookup` checks whether another worker has already produced the result
+    (typically a cache read); it is only used when a Redis client is given.
+    The computation runs in its own task, so a caller that is cancelled
+    (e.g. a streaming client that disconnected) stops waiting without
+    cancelling it for the others.
+    """
+    task = _inflight.get(key)
+    if task is not None:
+        coalesced_local.inc()
+    else:
+        task = asyncio.create_task(_compute_with_lease(key, compute, redis_client, lookup))
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _finish(key, done))
+
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if task.cancelled():
+            # The computation itself was cancelled (e.g. at shutdown); waiters
+            # get an error rather than a cancellation they did not ask for
+            raise RuntimeError(f"Computation for {key} was cancelled") from None
+        raise
+
+def _finish(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        # Mark the exception as retrieved in case every waiter went away
+        task.exception()
+
+def singleflight_stats() -> Dict[str, Any]:
+    return {
+        "inFlight": len(_inflight),
+        "leaders": leaders.value,
+        "coalescedLocal": coalesced_local.value,
+        "coalescedRemote": coalesced_remote.value,
+    }
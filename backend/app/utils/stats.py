@@ -0,0 +1,240 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Lightweight in-process counters, gauges and histograms.
+# Each worker keeps its own values; they are exposed through the /stats
+# endpoint so that tuning knobs (batch sizes, cache TTLs...) can be checked
+# against real traffic without any extra dependency.
+# When prometheus_client is installed every metric is mirrored into it as
+# truthlens_<name> and served by /metrics (app/utils/metrics.py), aggregated
+# across gunicorn workers. Histograms are recorded in milliseconds (names
+# ending in _ms) and exported in seconds, as truthlens_<name>_seconds.
+# Measurements of one concept that differ by stage, tier or provider share
+# one metric with labels: counter("x", labelnames=("stage",)) returns a
+# family whose labels(stage="bias") gives the metric for one series.
+
+DEFAULT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+PROMETHEUS_PREFIX = "truthlens_"
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+class _NullMetric:
+    """Stands in for the Prometheus mirror when prometheus_client is missing"""
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def labels(self, **values):
+        return self
+
+def _prometheus_metric(kind: str, name: str, description: str, **kwargs):
+    if prometheus_client is None:
+        return _NullMetric()
+    metric_class = getattr(prometheus_client, kind)
+    return metric_class(PROMETHEUS_PREFIX + name, description or name, **kwargs)
+
+def _in_ms(name: str) -> bool:
+    return name.endswith("_ms")
+
+def _prometheus_histogram(name: str, description: str, buckets: Sequence[float], **kwargs):
+    """Prometheus histogram for `name`, converted from milliseconds to seconds"""
+    if _in_ms(name):
+        name = name[:-len("_ms")] + "_seconds"
+        buckets = [bound / 1000 for bound in buckets]
+    return _prometheus_metric("Histogram", name, description, buckets=buckets, **kwargs)
+
+class Counter:
+    """Monotonically increasing counter"""
+
+    def __init__(self, name: str, description: str = "", prometheus=None):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+        self._prometheus = prometheus or _prometheus_metric("Counter", name, description)
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+        self._prometheus.inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "counter", "value": self._value}
+
+class Gauge:
+    """Value that goes up and down, such as a queue depth"""
+
+    def __init__(self, name: str, description: str = "", prometheus=None):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+        # Summed over the live workers; values of workers that exited are dropped
+        self._prometheus = prometheus or _prometheus_metric("Gauge", name, description, multiprocess_mode="livesum")
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+        self._prometheus.set(value)
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+        self._prometheus.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "gauge", "value": self._value}
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative bucket counts"""
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS, prometheus=None):
+        self.name = name
+        self.description = description
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+        self._prometheus = prometheus or _prometheus_histogram(name, description, self.buckets)
+        self._prometheus_scale = 0.001 if _in_ms(name) else 1
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            self._max = max(self._max, value)
+        self._prometheus.observe(value * self._prometheus_scale)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile, reported as the upper bound of its bucket"""
+        if not self._count:
+            return None
+        target = q * self._count
+        seen = 0
+        for bound, count in zip(self.buckets, self._counts):
+            seen += count
+            if seen >= target:
+                return bound
+        # Past the last bucket there is no upper bound; the largest value is
+        # one (and unlike inf it serializes to JSON)
+        return self._max
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = {}
+        seen = 0
+        for bound, count in zip(self.buckets, self._counts):
+            seen += count
+            cumulative[str(bound)] = seen
+        cumulative["+Inf"] = self._count
+        return {
+            "type": "histogram",
+            "count": self._count,
+            "sum": round(self._sum, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+class Family:
+    """A metric split into series by label values, e.g. one per analysis stage"""
+
+    def __init__(self, kind: type, name: str, description: str, labelnames: Sequence[str], **kwargs):
+        self.kind = kind
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._kwargs = kwargs
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if kind is Histogram:
+            self._prometheus = _prometheus_histogram(name, description, sorted(kwargs["buckets"]), labelnames=self.labelnames)
+        elif kind is Gauge:
+            self._prometheus = _prometheus_metric(
+                "Gauge", name, description, labelnames=self.labelnames, multiprocess_mode="livesum"
+            )
+        else:
+            self._prometheus = _prometheus_metric("Counter", name, description, labelnames=self.labelnames)
+
+    def labels(self, **values: str):
+        """The metric for one combination of label values, created on first use"""
+        key = tuple(str(values[label]) for label in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                prometheus = self._prometheus.labels(**dict(zip(self.labelnames, key)))
+                child = self.kind(self.name, self.description, prometheus=prometheus, **self._kwargs)
+                self._children[key] = child
+            return child
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            children = dict(self._children)
+        return {
+            "type": self.kind.__name__.lower(),
+            "labels": list(self.labelnames),
+            "series": {
+                ",".join(f"{label}={value}" for label, value in zip(self.labelnames, key)): child.snapshot()
+                for key, child in sorted(children.items())
+            },
+        }
+
+_registry: Dict[str, Any] = {}
+_registry_lock = threading.Lock()
+
+def _get_or_create(kind: type, name: str, description: str, labelnames: Sequence[str], **kwargs):
+    with _registry_lock:
+        if name not in _registry:
+            if labelnames:
+                _registry[name] = Family(kind, name, description, labelnames, **kwargs)
+            else:
+                _registry[name] = kind(name, description, **kwargs)
+        return _registry[name]
+
+def counter(name: str, description: str = "", labelnames: Sequence[str] = ()) -> Counter:
+    """Get or create a counter (a Family of counters if `labelnames` are given)"""
+    return _get_or_create(Counter, name, description, labelnames)
+
+def gauge(name: str, description: str = "", labelnames: Sequence[str] = ()) -> Gauge:
+    """Get or create a gauge (a Family of gauges if `labelnames` are given)"""
+    return _get_or_create(Gauge, name, description, labelnames)
+
+def histogram(
+    name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS, labelnames: Sequence[str] = ()
+) -> Histogram:
+    """Get or create a histogram (a Family of histograms if `labelnames` are given)"""
+    return _get_or_create(Histogram, name, description, labelnames, buckets=buckets)
+
+def snapshot() -> Dict[str, Any]:
+    """Return the current value of every registered metric"""
+    with _registry_lock:
+        metrics = dict(_registry)
+    return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
@@ -0,0 +1,208 @@
+import os
+import inspect
+import functools
+import contextlib
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from loguru import logger
+
+# Optional OpenTelemetry tracing.
+# With TRACING_ENABLED=true each worker exports spans for the HTTP request,
+# cache lookups, analyzer stages and model calls, background jobs and
+# outbound provider and extraction calls, to the console (default), an OTLP
+# collector, or an in-memory buffer that tests can read back. Trace context
+# follows background work: asyncio tasks inherit it, inference threads get a
+# copy, and queued jobs carry it in their envelope, so a job run by another
+# worker (or worker.py) continues the trace of the request that queued it.
+# When tracing is off, or the SDK is not installed, span() returns a shared
+# no-op object and nothing from OpenTelemetry is imported, so instrumented
+# code pays for one global lookup per span.
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "console").lower()  # console, otlp or memory
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+TRACING_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "truthlens-api")
+
+_tracer = None
+_provider = None
+_memory_exporter = None
+
+class _NoopSpan:
+    """Returned by span() when tracing is off; accepts and ignores everything"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def update_name(self, name: str):
+        pass
+
+    def record_exception(self, exception: BaseException, **kwargs):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+def _create_exporter(kind: str):
+    if kind == "memory":
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        return InMemorySpanExporter()
+    if kind == "otlp":
+        # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    return ConsoleSpanExporter()
+
+def init_tracing(service_name: Optional[str] = None) -> bool:
+    """
+    Set up the tracer for this process if TRACING_ENABLED is set.
+
+    Call once per process after forking (the export thread does not survive
+    a fork). Returns True if spans will be recorded.
+    """
+    global _tracer, _provider, _memory_exporter
+    if _tracer is not None:
+        return True
+    if not TRACING_ENABLED:
+        return False
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+        exporter = _create_exporter(TRACING_EXPORTER)
+    except ImportError as e:
+        logger.warning(f"Tracing disabled, OpenTelemetry SDK or exporter not installed: {e}")
+        return False
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name or TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO)),
+    )
+    if TRACING_EXPORTER == "memory":
+        # Export synchronously so tests see spans as soon as they end
+        _memory_exporter = exporter
+        _provider.add_span_processor(SimpleSpanProcessor(exporter))
+    else:
+        _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    _tracer = _provider.get_tracer("truthlens")
+    logger.info(f"Tracing enabled ({TRACING_EXPORTER} exporter, sample ratio {TRACING_SAMPLE_RATIO})")
+    return True
+
+def shutdown_tracing():
+    """Flush pending spans and stop the exporter"""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+def span(name: str, **attributes: Any):
+    """
+    Context manager for a span that is a child of the current one:
+
+        with tracing.span("cache.lookup", digest=digest) as current:
+            current.set_attribute("hit", True)
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.start_as_current_span(name, attributes=attributes or None)
+
+def traced(name: str) -> Callable:
+    """Decorator that runs a sync or async function in a span"""
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return await func(*args, **kwargs)
+                with _tracer.start_as_current_span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def inject_context() -> Optional[Dict[str, str]]:
+    """Current trace context as a dict of W3C headers, or None when tracing is off"""
+    if _tracer is None:
+        return None
+    from opentelemetry import propagate
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return carrier or None
+
+@contextlib.contextmanager
+def attach_context(carrier: Optional[Dict[str, str]]) -> Iterator[None]:
+    """Make a context from inject_context() (or request headers) the current one"""
+    if _tracer is None or not carrier:
+        yield
+        return
+    from opentelemetry import context, propagate
+    token = context.attach(propagate.extract(carrier))
+    try:
+        yield
+    finally:
+        context.detach(token)
+
+def finished_spans() -> List[Any]:
+    """Spans recorded by the memory exporter (TRACING_EXPORTER=memory)"""
+    return list(_memory_exporter.get_finished_spans()) if _memory_exporter is not None else []
+
+class TracingMiddleware:
+    """ASGI middleware that opens a server span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        from opentelemetry.trace import SpanKind, Status, StatusCode
+
+        # Continue the caller's trace if it sent a traceparent header
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        method = scope["method"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                current.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    current.set_status(Status(StatusCode.ERROR))
+            await send(message)
+
+        with attach_context(headers):
+            with _tracer.start_as_current_span(
+                f"{method} {scope['path']}",
+                kind=SpanKind.SERVER,
+                attributes={"http.method": method, "http.target": scope["path"]},
+            ) as current:
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    # Name the span by route template once routing has happened
+                    route = getattr(scope.get("route"), "path", None)
+                    if route:
+                        current.set_attribute("http.route", route)
+                        current.update_name(f"{method} {route}")
@@ -0,0 +1,144 @@
+"""
+Shared helpers for the benchmark scripts: latency summaries, result files
+and baseline comparison.
+
+A result file is JSON:
+
+    {
+      "meta": {"suite": "micro", "timestamp": ..., "python": ..., "host": ...},
+      "results": {"<benchmark>": {"p50": ..., "p95": ..., "p99": ..., "mean": ..., ...}}
+    }
+
+Latencies are in the unit given by each result's "unit" (us or ms).
+"""
+import json
+import os
+import pathlib
+import platform
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+BENCHMARK_DIR = pathlib.Path(__file__).resolve().parent
+BASELINE_DIR = BENCHMARK_DIR / "baselines"
+
+# Lower is better for latencies and errors, higher for throughput
+LOWER_IS_BETTER = ("p50", "p95", "p99", "mean", "errorRate")
+HIGHER_IS_BETTER = ("throughput",)
+
+def setup_path():
+    """Allow running the scripts from the backend directory"""
+    backend = str(BENCHMARK_DIR.parent)
+    if backend not in sys.path:
+        sys.path.insert(0, backend)
+
+def quiet_logs():
+    """Keep per-request INFO logs out of the measurements and the output"""
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level=os.getenv("BENCH_LOG_LEVEL", "WARNING"))
+
+def summarize(samples: Sequence[float], unit: str) -> Dict[str, Any]:
+    """Percentiles and mean of latency samples"""
+    if not len(samples):
+        return {"count": 0, "unit": unit}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": len(samples),
+        "unit": unit,
+        "mean": round(float(np.mean(samples)), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(np.max(samples)), 3),
+    }
+
+def write_results(path: str, suite: str, results: Dict[str, Dict[str, Any]], args: Optional[Dict[str, Any]] = None):
+    data = {
+        "meta": {
+            "suite": suite,
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "cpus": os.cpu_count(),
+            "args": args or {},
+        },
+        "results": results,
+    }
+    pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def read_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+def compare(
+    current: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Compare each metric with the baseline. A change counts as a regression
+    when it is worse by more than `threshold` (0.1 = 10%); error rates are
+    compared in absolute terms.
+    """
+    rows = []
+    for name, metrics in sorted(current.items()):
+        before = baseline.get(name)
+        if not before:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if metric not in metrics or metric not in before:
+                continue
+            new, old = float(metrics[metric]), float(before[metric])
+            if metric == "errorRate":
+                change = new - old
+            else:
+                change = (new - old) / old if old else 0.0
+            worse = change if metric in LOWER_IS_BETTER else -change
+            rows.append({
+                "benchmark": name,
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "regression": worse > threshold,
+            })
+    return rows
+
+def print_comparison(rows: List[Dict[str, Any]], metrics: Sequence[str] = ("p50", "p95", "p99", "throughput", "errorRate")):
+    shown = [row for row in rows if row["metric"] in metrics]
+    width = max([len(row["benchmark"]) for row in shown] + [9])
+    print(f"{'benchmark':<{width}}  {'metric':<10} {'baseline':>12} {'current':>12} {'change':>9}")
+    for row in shown:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['benchmark']:<{width}}  {row['metric']:<10} {row['baseline']:>12.3f} "
+            f"{row['current']:>12.3f} {row['change']:>+8.1%}{flag}"
+        )
+
+def check_baseline(
+    results: Dict[str, Dict[str, Any]],
+    baseline_path: str,
+    threshold: float,
+    args: Optional[Dict[str, Any]] = None
+) -> bool:
+    """Print the comparison with a baseline file; returns False on regressions"""
+    baseline = read_results(baseline_path)
+    differing = sorted(
+        key for key, value in (args or {}).items()
+        if key in baseline["meta"].get("args", {}) and baseline["meta"]["args"][key] != value
+    )
+    if differing:
+        print(f"\nWarning: the baseline was recorded with different settings ({', '.join(differing)})")
+    rows = compare(results, baseline["results"], threshold)
+    print(f"\nCompared with {baseline_path} (threshold {threshold:.0%}):")
+    print_comparison(rows)
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+    return not regressions
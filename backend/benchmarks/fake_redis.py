@@ -0,0 +1,30 @@
+"""
+In-process Redis for benchmarks, backed by fakeredis.
+
+install() replaces the shared client returned by get_redis(), and the
+dedicated job consumer connection, with clients on one fakeredis server, so
+the cache, single-flight leases, rate limits and the job stream all take
+their Redis code paths without a Redis server. fakeredis runs in-process, so
+round trips cost no network time; compare runs against each other, not
+against production Redis latencies.
+"""
+import fakeredis
+
+from app.utils import job_queue, redis_client
+from app.utils.redis_client import CircuitBreaker, ResilientRedis
+
+FAKE_REDIS_URL = "redis://fakeredis"
+
+_server = None
+
+def _client(*args, **kwargs) -> ResilientRedis:
+    client = fakeredis.aioredis.FakeRedis(server=_server, decode_responses=True)
+    return ResilientRedis(client, CircuitBreaker(redis_client.REDIS_BREAKER_FAILURES, redis_client.REDIS_BREAKER_RESET))
+
+def install() -> ResilientRedis:
+    """Point the app at a fresh fakeredis server; returns the shared client"""
+    global _server
+    _server = fakeredis.FakeServer()
+    redis_client.redis_client = _client()
+    job_queue.create_redis = _client
+    return redis_client.redis_client
@@ -0,0 +1,204 @@
+"""
+Open-loop load generator for POST /api/analyze.
+
+Requests are sent at --rps with Poisson arrivals, whether or not earlier
+ones have finished, and latency is measured from each request's scheduled
+start, so a slow server shows up as latency instead of a lower request rate
+(no coordinated omission). Articles are drawn from --articles distinct
+stories with Zipf-distributed popularity (--zipf exponent), like real news
+traffic: a few stories get most requests and hit the cache, the long tail
+needs inference.
+
+Reports p50/p95/p99 latency, throughput (successful responses per second)
+and error rate (non-2xx, timeouts and connection errors), for the whole run
+after --warmup seconds.
+
+Usage (from the backend directory):
+    python benchmarks/load.py --local                     # start the API on fakeredis
+    python benchmarks/load.py --url http://localhost:8000 --rps 100 --duration 60
+    python benchmarks/load.py --local --compare benchmarks/baselines/load.json
+    python benchmarks/load.py --local --save-baseline
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+def zipf_weights(n: int, exponent: float) -> np.ndarray:
+    """Probability of each rank 1..n under a Zipf law with the given exponent"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def article(rank: int) -> Dict[str, Any]:
+    """Deterministic article for a popularity rank, so runs share cache keys"""
+    return {
+        "title": f"Story {rank}: officials respond to the latest regional developments",
+        "content": (
+            f"Story {rank}. Officials said on Tuesday that talks on the regional agreement would "
+            f"continue next week, after negotiators failed to settle the remaining issues. "
+        ) * 20,
+        "url": f"https://news.example.com/2024/story-{rank}?utm_source=bench",
+    }
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _wait_ready(session: aiohttp.ClientSession, base_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/healthz") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"API at {base_url} did not become ready in {timeout:.0f}s")
+
+async def _send(
+    session: aiohttp.ClientSession,
+    url: str,
+    payload: Dict[str, Any],
+    scheduled: float,
+    timeout: aiohttp.ClientTimeout
+) -> Tuple[float, str]:
+    try:
+        async with session.post(url, json=payload, timeout=timeout) as response:
+            await response.read()
+            status = str(response.status)
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except aiohttp.ClientError as e:
+        status = type(e).__name__
+    return (time.perf_counter() - scheduled) * 1000, status
+
+async def run_load(args, base_url: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    rng = np.random.default_rng(args.seed)
+    weights = zipf_weights(args.articles, args.zipf)
+    total = int(args.rps * (args.warmup + args.duration))
+    ranks = rng.choice(args.articles, size=total, p=weights) + 1
+    offsets = np.cumsum(rng.exponential(1.0 / args.rps, size=total))
+
+    connector = aiohttp.TCPConnector(limit=args.max_in_flight)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await _wait_ready(session, base_url, args.startup_timeout)
+
+        in_flight = asyncio.Semaphore(args.max_in_flight)
+        results: List[Tuple[float, float, str]] = []
+        dropped = 0
+
+        async def one(rank: int, scheduled: float, offset: float):
+            try:
+                latency, status = await _send(session, f"{base_url}{args.endpoint}", article(rank), scheduled, timeout)
+                results.append((offset, latency, status))
+            finally:
+                in_flight.release()
+
+        start = time.perf_counter()
+        tasks = []
+        for rank, offset in zip(ranks, offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight.locked():
+                # The client is saturated; count it instead of queueing and skewing the schedule
+                dropped += 1
+                continue
+            await in_flight.acquire()
+            tasks.append(asyncio.create_task(one(int(rank), start + offset, float(offset))))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        server_stats = {}
+        try:
+            async with session.get(f"{base_url}/stats") as response:
+                server_stats = (await response.json()).get("cache", {})
+        except (aiohttp.ClientError, ValueError):
+            pass
+
+    measured = [(latency, status) for offset, latency, status in results if offset >= args.warmup]
+    duration = max(elapsed - args.warmup, 1e-9)
+    statuses = Counter(status for _, status in measured)
+    ok = [latency for latency, status in measured if status.startswith("2")]
+    summary = common.summarize([latency for latency, _ in measured], "ms")
+    summary.update(
+        throughput=round(len(ok) / duration, 2),
+        errorRate=round(1 - len(ok) / len(measured), 4) if measured else 0.0,
+        targetRps=args.rps,
+        statusCounts=dict(statuses),
+        dropped=dropped,
+    )
+    return {args.endpoint: summary}, {"serverCache": server_stats}
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test POST /api/analyze")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running API")
+    target.add_argument("--local", action="store_true", help="Start the API on fakeredis (benchmarks/serve.py)")
+    parser.add_argument("--endpoint", default="/api/analyze")
+    # The default is sustainable with the simulated models; raise it to find the knee
+    parser.add_argument("--rps", type=float, default=15)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds sent before measuring")
+    parser.add_argument("--articles", type=int, default=1000, help="Distinct articles")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of article popularity")
+    parser.add_argument("--max-in-flight", type=int, default=512)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown counted as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write results to {common.BASELINE_DIR}/load.json")
+    args = parser.parse_args()
+
+    server: Optional[subprocess.Popen] = None
+    base_url = (args.url or "").rstrip("/")
+    if args.local:
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(common.BENCHMARK_DIR, "serve.py"), "--port", str(port)],
+            cwd=common.BENCHMARK_DIR.parent,
+        )
+    try:
+        results, extra = asyncio.run(run_load(args, base_url))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    r = results[args.endpoint]
+    print(
+        f"{args.endpoint}: {r['count']} requests at {args.rps:g} rps target, throughput {r['throughput']:.1f}/s, "
+        f"errors {r['errorRate']:.2%}, dropped {r['dropped']}\n"
+        f"latency p50 {r.get('p50', 0):.1f} ms, p95 {r.get('p95', 0):.1f} ms, p99 {r.get('p99', 0):.1f} ms, "
+        f"max {r.get('max', 0):.1f} ms\nstatus {r['statusCounts']}"
+    )
+    if extra["serverCache"]:
+        print(f"server cache: {extra['serverCache']}")
+
+    arguments = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "save_baseline", "url")}
+    if args.output:
+        common.write_results(args.output, "load", results, arguments)
+    if args.save_baseline:
+        common.write_results(str(common.BASELINE_DIR / "load.json"), "load", results, arguments)
+    if args.compare and not common.check_baseline(results, args.compare, args.threshold, arguments):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
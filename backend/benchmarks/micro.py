@@ -0,0 +1,195 @@
+"""
+Micro-benchmarks for the model service, the analysis cache and db_service.
+
+Each benchmark is timed over --samples samples after a warmup; calls that
+take well under a millisecond are repeated within each sample and the
+per-call time reported, so timer overhead does not dominate. Latencies are
+in microseconds.
+
+  model.*   get_credibility_score, get_sentiment, extract_bias_tags and their
+            batch variants (MODEL_BACKEND: simulated or onnx)
+  cache.*   content hashing, URL canonicalization, the in-process LRU, and
+            get_by_content/store against fakeredis
+  db.*      report and verification writes and reads on a temporary SQLite
+            database (or DB_CONNECTION_STRING if set)
+
+Usage (from the backend directory):
+    python benchmarks/micro.py
+    python benchmarks/micro.py --only cache db --output results/micro.json
+    python benchmarks/micro.py --compare benchmarks/baselines/micro.json
+    python benchmarks/micro.py --save-baseline
+"""
+import argparse
+import asyncio
+import inspect
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+common.setup_path()
+
+ARTICLE_TITLE = "Central bank leaves interest rates unchanged as inflation eases"
+ARTICLE_TEXT = (
+    "The central bank left its main interest rate unchanged on Thursday, saying inflation "
+    "had eased for a third consecutive month while wage growth remained firm. "
+) * 30
+ARTICLE_URL = "https://www.reuters.com/markets/rates-unchanged-2024?utm_source=feed&fbclid=abc"
+
+async def _measure(func: Callable[[], Any], samples: int, warmup: int, inner: int) -> Dict[str, Any]:
+    is_async = inspect.iscoroutinefunction(func)
+
+    async def call():
+        if is_async:
+            await func()
+        else:
+            func()
+
+    for _ in range(warmup):
+        await call()
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        for _ in range(inner):
+            await call()
+        timings.append((time.perf_counter() - start) * 1e6 / inner)
+    summary = common.summarize(timings, "us")
+    summary["throughput"] = round(1e6 / summary["mean"], 1) if summary["mean"] else None
+    return summary
+
+def model_benchmarks(batch_size: int) -> Dict[str, Callable]:
+    from app.utils import model_service
+
+    model_service.initialize_models()
+    articles = [(f"{ARTICLE_TITLE} {i}", ARTICLE_TEXT) for i in range(batch_size)]
+    contents = [content for _, content in articles]
+    return {
+        "model.get_credibility_score": lambda: model_service.get_credibility_score(ARTICLE_TITLE, ARTICLE_TEXT),
+        "model.get_sentiment": lambda: model_service.get_sentiment(ARTICLE_TEXT),
+        "model.extract_bias_tags": lambda: model_service.extract_bias_tags(ARTICLE_TEXT),
+        f"model.get_credibility_scores[{batch_size}]": lambda: model_service.get_credibility_scores(articles),
+        f"model.get_sentiments[{batch_size}]": lambda: model_service.get_sentiments(contents),
+        f"model.extract_bias_tags_batch[{batch_size}]": lambda: model_service.extract_bias_tags_batch(contents),
+    }
+
+def cache_benchmarks() -> Dict[str, Callable]:
+    import fake_redis
+    from app.utils import analysis_cache
+
+    redis = fake_redis.install()
+    result = {"credibilityScore": 0.8, "sentiment": "neutral", "biasTags": [], "sources": [], "trustLevel": "high"}
+    digest = analysis_cache.content_hash(ARTICLE_TITLE, ARTICLE_TEXT)
+    local = analysis_cache.LocalCache(max_size=1024)
+    local.set("key", result)
+    counter = iter(range(10 ** 9))
+
+    async def store():
+        await analysis_cache.store(redis, ARTICLE_URL, digest, result)
+
+    async def lookup_local_hit():
+        await analysis_cache.get_by_content(redis, ARTICLE_URL, digest)
+
+    async def lookup_redis_hit():
+        # Drop the in-process copy so the lookup goes to Redis
+        analysis_cache.local_cache.delete(analysis_cache._content_key(digest))
+        await analysis_cache.get_by_content(redis, ARTICLE_URL, digest)
+
+    async def lookup_miss():
+        await analysis_cache.get_by_content(redis, ARTICLE_URL, f"missing-{next(counter)}")
+
+    return {
+        "cache.content_hash": lambda: analysis_cache.content_hash(ARTICLE_TITLE, ARTICLE_TEXT),
+        "cache.canonicalize_url": lambda: analysis_cache.canonicalize_url(ARTICLE_URL),
+        "cache.local_get": lambda: local.get("key"),
+        "cache.local_set": lambda: local.set(f"key-{next(counter) % 2048}", result),
+        "cache.store": store,
+        "cache.get_by_content.local_hit": lookup_local_hit,
+        "cache.get_by_content.redis_hit": lookup_redis_hit,
+        "cache.get_by_content.miss": lookup_miss,
+    }
+
+def db_benchmarks(report_count: int) -> Dict[str, Callable]:
+    from app.utils import db_service
+
+    db_service.init_db()
+    urls = [f"https://example.com/article-{i}" for i in range(100)]
+    now = int(time.time())
+    db_service.save_reports([
+        {"articleUrl": urls[i % len(urls)], "reason": ("misleading", "missed_context")[i % 2], "timestamp": now - i}
+        for i in range(report_count)
+    ])
+    verification = {
+        "url": urls[0], "title": ARTICLE_TITLE, "credibilityScore": 0.8, "sentiment": "neutral",
+        "biasTags": [], "timestamp": now,
+    }
+    verification_id = db_service.save_verification(dict(verification, id=uuid.uuid4().hex))["id"]
+
+    def report():
+        return {"articleUrl": urls[0], "reason": "misleading", "comment": "benchmark", "timestamp": int(time.time())}
+
+    return {
+        "db.save_report": lambda: db_service.save_report(report()),
+        "db.save_reports[100]": lambda: db_service.save_reports([report() for _ in range(100)]),
+        "db.get_reports_by_url": lambda: db_service.get_reports_by_url(urls[1], limit=100),
+        "db.get_report_stats": lambda: db_service.get_report_stats(),
+        "db.save_verification": lambda: db_service.save_verification(dict(verification, id=uuid.uuid4().hex)),
+        "db.get_verification": lambda: db_service.get_verification(verification_id),
+    }
+
+# Benchmarks faster than this many microseconds are repeated inside each sample
+FAST_CALL_US = 200
+
+async def run(args) -> Dict[str, Dict[str, Any]]:
+    suites: Dict[str, Callable[[], Dict[str, Callable]]] = {
+        "model": lambda: model_benchmarks(args.batch_size),
+        "cache": cache_benchmarks,
+        "db": lambda: db_benchmarks(args.reports),
+    }
+    results = {}
+    for suite in args.only or suites:
+        for name, func in suites[suite]().items():
+            # Calibrate: repeat fast calls so each sample takes about a millisecond
+            probe = await _measure(func, samples=3, warmup=1, inner=1)
+            inner = max(1, min(1000, int(1000 / max(probe["mean"], 0.01)))) if probe["mean"] < FAST_CALL_US else 1
+            samples = args.samples if probe["mean"] < 50_000 else args.slow_samples
+            results[name] = await _measure(func, samples=samples, warmup=args.warmup, inner=inner)
+            r = results[name]
+            print(f"{name:<44} p50 {r['p50']:>10.2f} us  p95 {r['p95']:>10.2f} us  p99 {r['p99']:>10.2f} us")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="TruthLens micro-benchmarks")
+    parser.add_argument("--only", nargs="*", choices=["model", "cache", "db"], help="Suites to run (default: all)")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--slow-samples", type=int, default=20, help="Samples for calls slower than 50 ms")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--reports", type=int, default=20_000, help="Reports in the database before measuring")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown counted as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write results to {common.BASELINE_DIR}/micro.json")
+    args = parser.parse_args()
+
+    common.quiet_logs()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tmp}/bench.db")
+        results = asyncio.run(run(args))
+        from app.utils.db_service import close_db
+        close_db()
+
+    arguments = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "save_baseline")}
+    if args.output:
+        common.write_results(args.output, "micro", results, arguments)
+    if args.save_baseline:
+        common.write_results(str(common.BASELINE_DIR / "micro.json"), "micro", results, arguments)
+    if args.compare and not common.check_baseline(results, args.compare, args.threshold, arguments):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
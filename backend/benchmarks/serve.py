@@ -0,0 +1,42 @@
+"""
+Run the API on fakeredis for load tests.
+
+Starts one uvicorn worker with the shared Redis client replaced by fakeredis
+(benchmarks/fake_redis.py) and the database on a temporary SQLite file
+unless DB_CONNECTION_STRING is set. benchmarks/load.py starts this itself
+with --local; run it by hand to profile the server while a load test runs.
+
+Usage (from the backend directory):
+    python benchmarks/serve.py --port 8100
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+common.setup_path()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the TruthLens API on fakeredis")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tmp}/bench.db")
+        # Jobs go through the (fake) Redis stream like in production
+        os.environ.setdefault("REDIS_URL", "redis://fakeredis")
+        common.quiet_logs()
+
+        import uvicorn
+        import fake_redis
+        fake_redis.install()
+        from app.main import app
+
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+if __name__ == "__main__":
+    main()
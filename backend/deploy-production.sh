@@ -44,9 +44,7 @@ mkdir -p data
 
 # Start the server with gunicorn
 echo "Starting TruthLens API in production mode..."
-gunicorn app.main:app \
-  --workers 4 \
-  --worker-class uvicorn.workers.UvicornWorker \
+gunicorn -c gunicorn.conf.py app.main:app \
   --bind 0.0.0.0:8000 \
   --log-level info \
   --access-logfile logs/access.log \
@@ -97,7 +97,7 @@ echo "2. Sign up at render.com"
 echo "3. Create a new Web Service, linking to your GitHub repository"
 echo "4. Set the following configuration:"
 echo "   - Build Command: ./build.sh"
-echo "   - Start Command: gunicorn app.main:app --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:\$PORT"
+echo "   - Start Command: gunicorn -c gunicorn.conf.py app.main:app --bind 0.0.0.0:\$PORT"
 echo "5. Add your environment variables in the Render dashboard"
 echo ""
 echo "Your TruthLens API will be deployed automatically!" 
\ No newline at end of file
@@ -36,6 +36,7 @@ def deploy_production(args):
     # Base command
     cmd = [
         "gunicorn",
+        "-c", "gunicorn.conf.py",
         "app.main:app",
         "-w", str(args.workers),
         "-k", "uvicorn.workers.UvicornWorker",
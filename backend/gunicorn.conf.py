@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+# Gunicorn settings for the TruthLens API.
+# Usage: gunicorn -c gunicorn.conf.py app.main:app
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+
+# With PRELOAD_MODELS=true the app and its models are loaded once in the
+# master before forking, so workers share model memory copy-on-write instead
+# of each loading its own copy.
+preload_app = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
+
+# Workers write their Prometheus metrics to files in this directory so that
+# /metrics reports the totals of every worker. It must be set before the app
+# (and prometheus_client) is imported, and is emptied on every start so
+# values from a previous run are not added to the new ones.
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "truthlens-prometheus")
+)
+os.makedirs(metrics_dir, exist_ok=True)
+for name in os.listdir(metrics_dir):
+    if name.endswith(".db"):
+        os.remove(os.path.join(metrics_dir, name))
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before workers spawn
+    if preload_app:
+        from app.utils.model_service import preload_models
+        preload_models()
+
+def child_exit(server, worker):
+    # Drop the gauges of a worker that exited; its counters stay in the totals
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,138 +1,494 @@
-import requests
-import json
-import time
+"""
+Health monitor for one or more TruthLens API instances.
+
+Every --interval seconds all checks run concurrently against every --url:
+
+  root      GET /                 HTTP 200
+  health    GET /health           HTTP 200 and status "healthy" (Redis up)
+  healthz   GET /healthz          HTTP 200
+  metrics   GET /metrics          HTTP 200 with TruthLens metrics
+  analyze   POST /api/analyze     a canned article; HTTP 200 and a valid
+                                  result (--fresh makes each one a cache miss)
+
+Latencies are kept over rolling windows (--windows, default 5m and 1h) and
+reported as p50/p95/p99. SLOs (--slo CHECK:MS:OBJECTIVE, default
+analyze:800:0.99, i.e. 99% of analyses succeed in under 800 ms) are tracked
+as the error-budget burn rate per window: 1.0 spends the budget exactly
+over the SLO period, 14.4 spends a 30-day budget in about two days. An SLO
+is alerting when it burns faster than --burn-alert in every window, so a
+single slow probe does not page but a sustained slowdown does.
+
+Results go to the console, to --jsonl (one JSON object per probe and per
+SLO per round; "-" for stdout) and to --textfile, a Prometheus exposition
+file rewritten every round for node_exporter's textfile collector.
+
+Usage:
+    python monitor_api.py --url https://api-1.example.com --url https://api-2.example.com
+    python monitor_api.py --url http://localhost:8000 --interval 15 --fresh \\
+        --jsonl monitor.jsonl --textfile /var/lib/node_exporter/truthlens.prom
+    python monitor_api.py --count 1 --checks health analyze   # exits 1 on failure
+"""
 import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
 import sys
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+
+DEFAULT_URL = "https://truthlens-ii4r.onrender.com"
+CHECKS = ("root", "health", "healthz", "metrics", "analyze")
+DEFAULT_CHECKS = ("root", "health", "healthz", "analyze")
+
+# Articles for the synthetic analyze probe, sent in rotation
+CANNED_ARTICLES = [
+    {
+        "title": "Central bank leaves interest rates unchanged as inflation eases",
+        "content": (
+            "The central bank left its main interest rate unchanged on Thursday, saying inflation had "
+            "eased for a third consecutive month while wage growth remained firm. Policymakers voted "
+            "seven to two to hold rates, with the two dissenters favouring a cut. The bank said it "
+            "would watch services inflation closely before changing course."
+        ),
+        "url": "https://monitor.truthlens.invalid/articles/rates-unchanged",
+    },
+    {
+        "title": "City council approves new cycling lanes after year-long consultation",
+        "content": (
+            "The city council approved plans for twelve kilometres of protected cycling lanes on "
+            "Tuesday, following a consultation that drew more than four thousand responses. Work is "
+            "expected to begin in the spring and finish within eighteen months. Local businesses "
+            "raised concerns about parking, which the council said would be addressed in phase two."
+        ),
+        "url": "https://monitor.truthlens.invalid/articles/cycling-lanes",
+    },
+    {
+        "title": "Researchers report progress on drought-resistant wheat varieties",
+        "content": (
+            "Researchers said on Monday that field trials of two drought-resistant wheat varieties "
+            "produced yields within five percent of conventional crops during a dry season. The "
+            "results, published in a peer-reviewed journal, cover three growing seasons across four "
+            "regions. The team cautioned that wider trials are needed before commercial release."
+        ),
+        "url": "https://monitor.truthlens.invalid/articles/drought-wheat",
+    },
+]
+
+TRUST_LEVELS = {"high", "medium", "low"}
+
+@dataclass
+class ProbeResult:
+    timestamp: float
+    instance: str
+    check: str
+    ok: bool
+    latency_ms: float
+    status: Optional[int] = None
+    error: Optional[str] = None
+    detail: Optional[Dict[str, Any]] = None
 
-def check_api_status(url, verbose=False):
-    """Check if the API is up and running."""
+    def to_json(self) -> Dict[str, Any]:
+        record = {
+            "type": "probe",
+            "timestamp": round(self.timestamp, 3),
+            "instance": self.instance,
+            "check": self.check,
+            "ok": self.ok,
+            "status": self.status,
+            "latencyMs": round(self.latency_ms, 2),
+        }
+        if self.error:
+            record["error"] = self.error
+        if self.detail:
+            record["detail"] = self.detail
+        return record
+
+@dataclass
+class SLO:
+    check: str
+    threshold_ms: Optional[float]  # None: availability only
+    objective: float
+
+    @classmethod
+    def parse(cls, spec: str) -> "SLO":
+        """CHECK:MS:OBJECTIVE, e.g. analyze:800:0.99; MS may be empty (health::0.999)"""
+        try:
+            check, threshold, objective = spec.split(":")
+            slo = cls(check, float(threshold) if threshold else None, float(objective))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid SLO '{spec}', expected CHECK:MS:OBJECTIVE")
+        if slo.check not in CHECKS or not 0 < slo.objective < 1:
+            raise argparse.ArgumentTypeError(f"invalid SLO '{spec}': unknown check or objective outside (0, 1)")
+        return slo
+
+    def good(self, result: ProbeResult) -> bool:
+        return result.ok and (self.threshold_ms is None or result.latency_ms <= self.threshold_ms)
+
+    @property
+    def label(self) -> str:
+        if self.threshold_ms is None:
+            return f"{self.objective:.2%} of {self.check} probes succeed"
+        return f"{self.objective:.2%} of {self.check} probes succeed under {self.threshold_ms:g} ms"
+
+def parse_duration(value: str) -> float:
+    """Seconds from 30s, 5m, 1h or 1d (a bare number is seconds)"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
     try:
-        if verbose:
-            print(f"Checking API status at {url}...")
-        
-        # Try to fetch the root endpoint
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code == 200:
-            if verbose:
-                print(f"✓ API is online (HTTP {response.status_code})")
-                print(f"Response: {json.dumps(response.json(), indent=2)}")
-            return True
-        else:
-            if verbose:
-                print(f"✗ API returned HTTP {response.status_code}")
-            return False
-    except requests.exceptions.RequestException as e:
-        if verbose:
-            print(f"✗ Error connecting to API: {e}")
-        return False
-
-def check_health_endpoint(url, verbose=False):
-    """Check the health status of the API."""
+        if value[-1] in units:
+            return float(value[:-1]) * units[value[-1]]
+        return float(value)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"invalid duration '{value}'")
+
+def format_duration(seconds: float) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{int(seconds // size)}{unit}"
+    return f"{seconds:g}s"
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    index = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+class RollingWindow:
+    """Probe results of one instance and check, kept for the longest window"""
+
+    def __init__(self, horizon: float):
+        self.horizon = horizon
+        self._results: Deque[ProbeResult] = deque()
+
+    def add(self, result: ProbeResult):
+        self._results.append(result)
+        cutoff = result.timestamp - self.horizon
+        while self._results and self._results[0].timestamp < cutoff:
+            self._results.popleft()
+
+    def results(self, window: float, now: float) -> List[ProbeResult]:
+        cutoff = now - window
+        return [result for result in self._results if result.timestamp >= cutoff]
+
+    def summary(self, window: float, now: float) -> Dict[str, Any]:
+        results = self.results(window, now)
+        latencies = sorted(result.latency_ms for result in results if result.ok)
+        summary = {"count": len(results), "errors": sum(not result.ok for result in results)}
+        if latencies:
+            summary.update(
+                p50=round(percentile(latencies, 0.50), 2),
+                p95=round(percentile(latencies, 0.95), 2),
+                p99=round(percentile(latencies, 0.99), 2),
+            )
+        return summary
+
+    def burn_rate(self, slo: SLO, window: float, now: float) -> Tuple[Optional[float], Optional[float]]:
+        """Share of good probes and error-budget burn rate in the window"""
+        results = self.results(window, now)
+        if not results:
+            return None, None
+        good = sum(slo.good(result) for result in results) / len(results)
+        return good, (1 - good) / (1 - slo.objective)
+
+async def _request(
+    session: aiohttp.ClientSession,
+    method: str,
+    url: str,
+    **kwargs
+) -> Tuple[int, bytes, float]:
+    start = time.perf_counter()
+    async with session.request(method, url, **kwargs) as response:
+        body = await response.read()
+    return response.status, body, (time.perf_counter() - start) * 1000
+
+def _validate(check: str, status: int, body: bytes) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
+    """Whether a response passes its check, an error message and details to record"""
+    if status != 200:
+        return False, f"HTTP {status}", None
+    if check in ("root", "healthz"):
+        return True, None, None
+    if check == "metrics":
+        ok = b"truthlens_" in body
+        return ok, None if ok else "no TruthLens metrics in the response", None
     try:
-        if verbose:
-            print(f"Checking health endpoint at {url}/health...")
-        
-        response = requests.get(f"{url}/health", timeout=10)
-        
-        if response.status_code == 200:
-            health_data = response.json()
-            status = health_data.get("status")
-            services = health_data.get("services", {})
-            
-            if status == "healthy":
-                if verbose:
-                    print(f"✓ API is healthy")
-                    print(f"Services: {json.dumps(services, indent=2)}")
-                return True
-            else:
-                if verbose:
-                    print(f"⚠ API status is '{status}'")
-                    print(f"Services: {json.dumps(services, indent=2)}")
-                return status == "healthy"
+        data = json.loads(body)
+    except ValueError:
+        return False, "response is not JSON", None
+    if check == "health":
+        detail = {"status": data.get("status"), "services": data.get("services")}
+        if data.get("status") != "healthy":
+            return False, f"status is '{data.get('status')}'", detail
+        return True, None, detail
+    # analyze
+    score = data.get("credibilityScore")
+    detail = {
+        "credibilityScore": score,
+        "trustLevel": data.get("trustLevel"),
+        "partial": data.get("partial", False),
+        "degradedStages": data.get("degradedStages", []),
+    }
+    if not isinstance(score, (int, float)) or not 0 <= score <= 1 or data.get("trustLevel") not in TRUST_LEVELS:
+        return False, "invalid analysis result", detail
+    return True, None, detail
+
+class Monitor:
+    def __init__(self, args):
+        self.args = args
+        self.instances: List[str] = [url.rstrip("/") for url in (args.url or [DEFAULT_URL])]
+        self.windows: List[float] = sorted(set(args.windows))
+        self.slos: List[SLO] = args.slo if args.slo is not None else [SLO("analyze", 800, 0.99)]
+        self.history: Dict[Tuple[str, str], RollingWindow] = {}
+        self._articles = itertools.cycle(CANNED_ARTICLES)
+        self._semaphore = asyncio.Semaphore(args.concurrency)
+        self._jsonl = None
+
+    def _history(self, instance: str, check: str) -> RollingWindow:
+        key = (instance, check)
+        if key not in self.history:
+            self.history[key] = RollingWindow(self.windows[-1])
+        return self.history[key]
+
+    def _analyze_payload(self) -> Dict[str, Any]:
+        article = dict(next(self._articles))
+        if self.args.fresh:
+            # A unique line changes the content hash, so the probe runs the whole pipeline
+            article["content"] += f"\n\nMonitor probe {uuid.uuid4().hex}."
+        return article
+
+    async def probe(self, session: aiohttp.ClientSession, instance: str, check: str) -> ProbeResult:
+        if check == "analyze":
+            method, path, kwargs = "POST", "/api/analyze", {"json": self._analyze_payload()}
         else:
-            if verbose:
-                print(f"✗ Health endpoint returned HTTP {response.status_code}")
-            return False
-    except requests.exceptions.RequestException as e:
-        if verbose:
-            print(f"✗ Error connecting to health endpoint: {e}")
-        return False
-
-def check_render_health_endpoint(url, verbose=False):
-    """Check the Render-specific health endpoint."""
-    try:
-        if verbose:
-            print(f"Checking Render health endpoint at {url}/healthz...")
-        
-        response = requests.get(f"{url}/healthz", timeout=10)
-        
-        if response.status_code == 200:
-            health_data = response.json()
-            status = health_data.get("status")
-            
-            if status == "healthy":
-                if verbose:
-                    print(f"✓ Render health check passed")
-                return True
+            method, path, kwargs = "GET", "/" if check == "root" else f"/{check}", {}
+        async with self._semaphore:
+            timestamp = time.time()
+            start = time.perf_counter()
+            try:
+                status, body, latency_ms = await _request(session, method, instance + path, **kwargs)
+            except asyncio.TimeoutError:
+                latency_ms = (time.perf_counter() - start) * 1000
+                return ProbeResult(timestamp, instance, check, False, latency_ms, error="timeout")
+            except aiohttp.ClientError as e:
+                latency_ms = (time.perf_counter() - start) * 1000
+                return ProbeResult(timestamp, instance, check, False, latency_ms, error=f"{type(e).__name__}: {e}")
+        ok, error, detail = _validate(check, status, body)
+        return ProbeResult(timestamp, instance, check, ok, latency_ms, status, error, detail)
+
+    async def run_round(self, session: aiohttp.ClientSession) -> List[ProbeResult]:
+        results = await asyncio.gather(*(
+            self.probe(session, instance, check)
+            for instance in self.instances
+            for check in self.args.checks
+        ))
+        for result in results:
+            self._history(result.instance, result.check).add(result)
+        return results
+
+    def slo_status(self, now: float) -> List[Dict[str, Any]]:
+        statuses = []
+        for slo in self.slos:
+            for instance in self.instances:
+                history = self.history.get((instance, slo.check))
+                if not history:
+                    continue
+                windows = {}
+                for window in self.windows:
+                    good, burn = history.burn_rate(slo, window, now)
+                    windows[format_duration(window)] = {
+                        "goodRatio": None if good is None else round(good, 4),
+                        "burnRate": None if burn is None else round(burn, 2),
+                    }
+                burns = [w["burnRate"] for w in windows.values()]
+                statuses.append({
+                    "type": "slo",
+                    "timestamp": round(now, 3),
+                    "instance": instance,
+                    "check": slo.check,
+                    "slo": slo.label,
+                    "thresholdMs": slo.threshold_ms,
+                    "objective": slo.objective,
+                    "windows": windows,
+                    # Multi-window: every window must burn fast, so one slow probe does not alert
+                    "alerting": all(burn is not None and burn > self.args.burn_alert for burn in burns),
+                })
+        return statuses
+
+    def write_jsonl(self, results: List[ProbeResult], slos: List[Dict[str, Any]]):
+        if not self.args.jsonl:
+            return
+        if self._jsonl is None:
+            self._jsonl = sys.stdout if self.args.jsonl == "-" else open(self.args.jsonl, "a")
+        for record in [result.to_json() for result in results] + slos:
+            self._jsonl.write(json.dumps(record) + "\n")
+        self._jsonl.flush()
+
+    def print_round(self, number: int, results: List[ProbeResult], slos: List[Dict[str, Any]], now: float):
+        if self.args.quiet:
+            failed = [f"{r.instance} {r.check}" for r in results if not r.ok]
+            alerting = [f"{s['instance']} {s['check']}" for s in slos if s["alerting"]]
+            print(
+                f"{time.strftime('%Y-%m-%d %H:%M:%S')} check #{number}: "
+                f"{len(results) - len(failed)}/{len(results)} ok"
+                + (f", failed: {', '.join(failed)}" if failed else "")
+                + (f", SLO burning: {', '.join(alerting)}" if alerting else "")
+            )
+            return
+        window = self.windows[0]
+        print(f"\n--- Check #{number} at {time.strftime('%Y-%m-%d %H:%M:%S')} ---")
+        for instance in self.instances:
+            print(instance)
+            by_check = {r.check: r for r in results if r.instance == instance}
+            for check in self.args.checks:
+                r = by_check[check]
+                line = f"  {'✓' if r.ok else '✗'} {check:<8} {r.latency_ms:8.1f} ms"
+                if r.error:
+                    line += f"  {r.error}"
+                elif r.detail and r.detail.get("partial"):
+                    line += f"  partial ({', '.join(r.detail['degradedStages'])})"
+                summary = self._history(instance, check).summary(window, now)
+                if "p50" in summary:
+                    line += (
+                        f"  [{format_duration(window)}: p50 {summary['p50']:.0f} p95 {summary['p95']:.0f} "
+                        f"p99 {summary['p99']:.0f} ms, {summary['errors']}/{summary['count']} failed]"
+                    )
+                print(line)
+            up = [by_check[check].ok for check in self.args.checks]
+            if all(up):
+                print("  ✓ Overall Status: All systems operational")
+            elif any(up):
+                print("  ⚠ Overall Status: API is up but some checks are failing")
             else:
-                if verbose:
-                    print(f"⚠ Render health status is '{status}'")
-                return False
-        else:
-            if verbose:
-                print(f"✗ Render health endpoint returned HTTP {response.status_code}")
-            return False
-    except requests.exceptions.RequestException as e:
-        if verbose:
-            print(f"✗ Error connecting to Render health endpoint: {e}")
-        return False
-
-def monitor_api(url, interval=60, count=None, verbose=True):
+                print("  ✗ Overall Status: API appears to be down")
+        for status in slos:
+            burns = ", ".join(
+                f"{name} {w['burnRate']:.1f}x" if w["burnRate"] is not None else f"{name} -"
+                for name, w in status["windows"].items()
+            )
+            print(f"{'✗' if status['alerting'] else '✓'} SLO {status['slo']} on {status['instance']}: burn {burns}")
+
+    async def run(self) -> bool:
+        """Run --count rounds (forever by default); returns whether the last round passed"""
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        connector = aiohttp.TCPConnector(limit=self.args.concurrency)
+        passed = True
+        try:
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                started = time.monotonic()
+                for number in itertools.count(1):
+                    results = await self.run_round(session)
+                    now = time.time()
+                    slos = self.slo_status(now)
+                    if self.args.jsonl != "-":
+                        self.print_round(number, results, slos, now)
+                    self.write_jsonl(results, slos)
+                    if self.args.textfile:
+                        write_textfile(self.args.textfile, results, slos, self.history, self.windows, now)
+                    passed = all(result.ok for result in results)
+                    if self.args.count is not None and number >= self.args.count:
+                        break
+                    # Fixed schedule, so slow rounds do not push the following ones back
+                    await asyncio.sleep(max(0.0, started + number * self.args.interval - time.monotonic()))
+        finally:
+            if self._jsonl not in (None, sys.stdout):
+                self._jsonl.close()
+        return passed
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def write_textfile(
+    path: str,
+    results: List[ProbeResult],
+    slos: List[Dict[str, Any]],
+    history: Dict[Tuple[str, str], RollingWindow],
+    windows: List[float],
+    now: float
+):
     """
-    Monitor the API continuously.
-    
-    Args:
-        url: The base URL of the API
-        interval: Time between checks in seconds
-        count: Number of checks to perform (None for infinite)
-        verbose: Whether to print detailed information
+    Write the Prometheus text format to `path`. The file is written next to
+    it and renamed into place, so the textfile collector never reads a
+    partial file.
     """
-    print(f"Starting API monitor for {url}")
-    print(f"Press Ctrl+C to stop monitoring")
-    
-    check_count = 0
+    metrics: Dict[str, Tuple[str, List[str]]] = {}
+
+    def add(name: str, help_text: str, labels: Dict[str, Any], value: Optional[float]):
+        if value is not None:
+            metrics.setdefault(name, (help_text, []))[1].append(f"{name}{_labels(**labels)} {value}")
+
+    for r in results:
+        labels = {"instance": r.instance, "check": r.check}
+        add("truthlens_probe_success", "Whether the last probe passed", labels, int(r.ok))
+        add("truthlens_probe_duration_seconds", "Duration of the last probe", labels, round(r.latency_ms / 1000, 6))
+    for (instance, check), window_history in sorted(history.items()):
+        for window in windows:
+            summary = window_history.summary(window, now)
+            labels = {"instance": instance, "check": check, "window": format_duration(window)}
+            add("truthlens_probe_window_total", "Probes in the rolling window", labels, summary["count"])
+            add("truthlens_probe_window_errors", "Failed probes in the rolling window", labels, summary["errors"])
+            for quantile in ("p50", "p95", "p99"):
+                if quantile in summary:
+                    add(
+                        "truthlens_probe_latency_seconds", "Latency of passing probes in the rolling window",
+                        dict(labels, quantile=f"0.{quantile[1:]}"), round(summary[quantile] / 1000, 6)
+                    )
+    for status in slos:
+        labels = {"instance": status["instance"], "check": status["check"]}
+        add("truthlens_slo_objective", "Target share of good probes", labels, status["objective"])
+        if status["thresholdMs"] is not None:
+            add("truthlens_slo_threshold_seconds", "Latency threshold of a good probe", labels, status["thresholdMs"] / 1000)
+        add("truthlens_slo_alerting", "Whether the SLO burns faster than the alert rate in every window", labels, int(status["alerting"]))
+        for window, values in status["windows"].items():
+            window_labels = dict(labels, window=window)
+            add("truthlens_slo_good_ratio", "Share of good probes in the window", window_labels, values["goodRatio"])
+            add("truthlens_slo_burn_rate", "Error budget burn rate in the window", window_labels, values["burnRate"])
+    add("truthlens_monitor_last_round_timestamp_seconds", "When the monitor last finished a round", {}, round(now, 3))
+
+    lines = []
+    for name, (help_text, samples) in metrics.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor TruthLens API instances")
+    parser.add_argument("--url", action="append", help=f"API base URL; repeat for several instances (default: {DEFAULT_URL})")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between rounds of checks")
+    parser.add_argument("--count", type=int, default=None, help="Number of rounds (default: infinite)")
+    parser.add_argument("--checks", nargs="+", choices=CHECKS, default=list(DEFAULT_CHECKS))
+    parser.add_argument("--fresh", action="store_true", help="Make every analyze probe a cache miss")
+    parser.add_argument("--timeout", type=float, default=10, help="Seconds before a probe fails")
+    parser.add_argument("--concurrency", type=int, default=16, help="Probes in flight at once")
+    parser.add_argument("--windows", nargs="+", type=parse_duration, default=[300, 3600], help="Rolling windows, e.g. 5m 1h")
+    parser.add_argument("--slo", action="append", type=SLO.parse, help="CHECK:MS:OBJECTIVE (default analyze:800:0.99); repeatable")
+    parser.add_argument("--burn-alert", type=float, default=14.4, help="Burn rate that alerts when exceeded in every window")
+    parser.add_argument("--jsonl", help="Append JSON lines to this file ('-' for stdout instead of the console output)")
+    parser.add_argument("--textfile", help="Prometheus textfile to rewrite every round")
+    parser.add_argument("--quiet", action="store_true", help="One line per round")
+    args = parser.parse_args()
+
+    monitor = Monitor(args)
+    if not args.quiet and args.jsonl != "-":
+        print(f"Starting API monitor for {', '.join(monitor.instances)}")
+        print("Press Ctrl+C to stop monitoring")
     try:
-        while count is None or check_count < count:
-            if check_count > 0:
-                time.sleep(interval)
-            
-            print(f"\n--- Check #{check_count + 1} at {time.strftime('%Y-%m-%d %H:%M:%S')} ---")
-            
-            api_status = check_api_status(url, verbose)
-            health_status = check_health_endpoint(url, verbose)
-            render_status = check_render_health_endpoint(url, verbose)
-            
-            if api_status and health_status and render_status:
-                print(f"✓ Overall Status: All systems operational")
-            elif api_status:
-                print(f"⚠ Overall Status: API is up but some services may be degraded")
-            else:
-                print(f"✗ Overall Status: API appears to be down")
-            
-            check_count += 1
+        passed = asyncio.run(monitor.run())
     except KeyboardInterrupt:
-        print("\nMonitoring stopped by user")
-    except Exception as e:
-        print(f"\nError during monitoring: {e}")
+        print("\nMonitoring stopped by user", file=sys.stderr)
+        return
+    if args.count is not None and not passed:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Monitor TruthLens API status")
-    parser.add_argument("--url", default="https://truthlens-ii4r.onrender.com", help="API base URL")
-    parser.add_argument("--interval", type=int, default=60, help="Check interval in seconds")
-    parser.add_argument("--count", type=int, default=None, help="Number of checks (default: infinite)")
-    parser.add_argument("--quiet", action="store_true", help="Reduce output verbosity")
-    
-    args = parser.parse_args()
-    
-    monitor_api(args.url, args.interval, args.count, not args.quiet) 
\ No newline at end of file
+    main()
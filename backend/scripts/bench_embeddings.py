@@ -0,0 +1,107 @@
+"""
+Benchmark the embedding store (app/utils/embedding_store.py).
+
+Fills a store with synthetic unit vectors, clustered the way news coverage
+is (many articles per story), then measures:
+
+  - insert throughput (rows/s) and size on disk
+  - exact search latency (full chunked scan)
+  - IVF build time and search latency, and its recall@k against exact search
+  - embedder throughput on sample texts (ONNX encoder if exported, else hashing)
+
+The store is written to a temporary directory unless --dir is given.
+
+Usage:
+    python scripts/bench_embeddings.py                 # 1M rows, int8
+    python scripts/bench_embeddings.py --n 200000 --dtype float16 --nprobe 8 16 32
+"""
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Allow running as `python scripts/bench_embeddings.py` from the backend directory
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from app.utils.embedding_store import EmbeddingStore, embed  # noqa: E402
+
+def synthetic_vectors(rng, centers: np.ndarray, n: int, noise: float) -> np.ndarray:
+    """Unit vectors scattered around randomly chosen story centers"""
+    vectors = centers[rng.integers(len(centers), size=n)]
+    vectors = vectors + rng.normal(scale=noise, size=vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def percentiles(samples_ms):
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the TruthLens embedding store")
+    parser.add_argument("--n", type=int, default=1_000_000, help="Rows to insert")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dtype", choices=["int8", "float16"], default="int8")
+    parser.add_argument("--batch", type=int, default=50_000, help="Rows per insert")
+    parser.add_argument("--per-story", type=int, default=100, help="Average rows per synthetic cluster")
+    parser.add_argument("--noise", type=float, default=0.04, help="Per-dimension noise around a story")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[8, 16, 32])
+    parser.add_argument("--embed-texts", type=int, default=256, help="Texts for the embedder benchmark (0 skips)")
+    parser.add_argument("--dir", help="Store directory (default: a temporary directory)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(1, args.n // args.per_story), args.dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EmbeddingStore(args.dir or tmp, args.dim, args.dtype, embedder="bench")
+
+        start = time.perf_counter()
+        for offset in range(0, args.n, args.batch):
+            count = min(args.batch, args.n - offset)
+            ids = [f"doc-{i}" for i in range(offset, offset + count)]
+            store.add(ids, synthetic_vectors(rng, centers, count, args.noise), [{}] * count)
+        elapsed = time.perf_counter() - start
+        disk_mb = store.stats()["bytesOnDisk"] / 1e6
+        print(f"insert: {args.n} rows in {elapsed:.1f}s ({args.n / elapsed:,.0f} rows/s), {disk_mb:.0f} MB of vectors")
+
+        queries = synthetic_vectors(rng, centers, args.queries, args.noise)
+        exact, timings = [], []
+        for query in queries:
+            start = time.perf_counter()
+            exact.append({doc_id for _, doc_id, _ in store.search(query, k=args.k, exact=True)})
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"exact search (k={args.k}): {percentiles(timings)}")
+
+        start = time.perf_counter()
+        ivf = store.build_index()
+        print(f"IVF build: {ivf.nlist} lists in {time.perf_counter() - start:.1f}s")
+
+        for nprobe in args.nprobe:
+            timings, hits = [], 0
+            for query, expected in zip(queries, exact):
+                start = time.perf_counter()
+                found = store.search(query, k=args.k, nprobe=nprobe)
+                timings.append((time.perf_counter() - start) * 1000)
+                hits += len(expected & {doc_id for _, doc_id, _ in found})
+            recall = hits / max(1, sum(len(expected) for expected in exact))
+            print(f"IVF search (nprobe={nprobe}): {percentiles(timings)}, recall@{args.k} {recall:.3f}")
+
+    if args.embed_texts:
+        texts = [
+            f"Officials said on day {i} that the talks on the regional trade agreement would continue next week"
+            for i in range(args.embed_texts)
+        ]
+        embed(texts[:8])  # load the embedder
+        start = time.perf_counter()
+        for offset in range(0, len(texts), 32):
+            embed(texts[offset:offset + 32])
+        elapsed = time.perf_counter() - start
+        print(f"embedder: {len(texts) / elapsed:,.0f} texts/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Export the TruthLens classifiers and sentence embedder to ONNX and quantize
+them to int8.
+
+For each model this writes <output>/<name>/ with model.onnx (fp32),
+model.int8.onnx (dynamic int8 quantization), tokenizer.json and labels.json
+(model.json with the model id for the embedder), which is the layout the
+ONNX backend in app/utils/model_service.py and the embedding store in
+app/utils/embedding_store.py load. The quantized model is then checked
+against the fp32 model on sample texts; the script exits non-zero if their
+probabilities differ by more than the tolerance (for the embedder, if the
+cosine similarity of their embeddings falls below 1 - tolerance).
+
+Export needs torch and transformers; serving only needs onnxruntime and
+tokenizers.
+
+Usage:
+    python scripts/export_onnx.py --output models
+    python scripts/export_onnx.py --output models --check-only
+
+--check-only skips models that have not been exported; test_onnx_quantization.py
+runs the same check under pytest, and the Docker build runs it on the models
+it ships.
+"""
+import argparse
+import json
+import os
+import pathlib
+import sys
+
+import numpy as np
+
+# Allow running as `python scripts/export_onnx.py` from the backend directory
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+DEFAULT_MODELS = {
+    "credibility": os.getenv("CREDIBILITY_MODEL_ID", "hamzab/roberta-fake-news-classification"),
+    "sentiment": os.getenv("SENTIMENT_MODEL_ID", "cardiffnlp/twitter-roberta-base-sentiment-latest"),
+    "bias": os.getenv("BIAS_MODEL_ID", "valurank/distilroberta-bias"),
+    "embedding": os.getenv("EMBEDDING_MODEL_ID", "sentence-transformers/all-MiniLM-L6-v2"),
+}
+
+SAMPLE_TEXTS = [
+    "Scientists confirm the new vaccine passed all three phases of clinical trials.",
+    "SHOCKING: you won't believe what the government is hiding from you!",
+    "The central bank left interest rates unchanged on Thursday, citing stable inflation.",
+    "Local residents say the new park has made the neighbourhood a better place to live.",
+    "Opinion: the opposition's budget plan would be a disaster for working families.",
+]
+
+# Max allowed |p_int8 - p_fp32| (or 1 - cosine for the embedder)
+DEFAULT_TOLERANCE = float(os.getenv("ONNX_TOLERANCE", "0.05"))
+
+def export_model(name: str, model_id: str, output_dir: pathlib.Path, opset: int):
+    """Export one Hugging Face sequence classifier (or the sentence encoder) to fp32 ONNX"""
+    import torch
+    from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+    model_dir = output_dir / name
+    model_dir.mkdir(parents=True, exist_ok=True)
+    embedding = name == "embedding"
+
+    print(f"[{name}] exporting {model_id}")
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = (AutoModel if embedding else AutoModelForSequenceClassification).from_pretrained(model_id)
+    model.eval()
+
+    inputs = tokenizer(SAMPLE_TEXTS[:2], padding=True, truncation=True, max_length=128, return_tensors="pt")
+    input_names = [key for key in ("input_ids", "attention_mask", "token_type_ids") if key in inputs]
+    dynamic_axes = {key: {0: "batch", 1: "sequence"} for key in input_names}
+    # The embedder outputs token vectors; pooling happens in OnnxEmbedder
+    output_name = "last_hidden_state" if embedding else "logits"
+    dynamic_axes[output_name] = {0: "batch", 1: "sequence"} if embedding else {0: "batch"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(inputs[key] for key in input_names),
+            str(model_dir / "model.onnx"),
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    tokenizer.backend_tokenizer.save(str(model_dir / "tokenizer.json"))
+    if embedding:
+        with open(model_dir / "model.json", "w") as f:
+            json.dump({"id": model_id}, f)
+        return
+    labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+    with open(model_dir / "labels.json", "w") as f:
+        json.dump(labels, f)
+
+def quantize_model(name: str, output_dir: pathlib.Path):
+    """Apply dynamic int8 quantization to an exported model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model_dir = output_dir / name
+    print(f"[{name}] quantizing to int8")
+    quantize_dynamic(
+        str(model_dir / "model.onnx"),
+        str(model_dir / "model.int8.onnx"),
+        weight_type=QuantType.QInt8,
+    )
+
+def is_exported(name: str, output_dir: pathlib.Path) -> bool:
+    """Whether both the fp32 and the int8 model exist for `name`"""
+    model_dir = output_dir / name
+    return (model_dir / "model.onnx").exists() and (model_dir / "model.int8.onnx").exists()
+
+def check_tolerance(name: str, output_dir: pathlib.Path, tolerance: float) -> bool:
+    """Compare int8 and fp32 probabilities on the sample texts"""
+    from app.utils.onnx_backend import OnnxClassifier
+
+    model_dir = output_dir / name
+    if name == "embedding":
+        return check_embedding_tolerance(model_dir, tolerance)
+    multi_label = name == "bias"
+    fp32 = OnnxClassifier(model_dir, quantized=False, multi_label=multi_label)
+    int8 = OnnxClassifier(model_dir, quantized=True, multi_label=multi_label)
+
+    expected = fp32.predict_proba(SAMPLE_TEXTS)
+    actual = int8.predict_proba(SAMPLE_TEXTS)
+    max_diff = float(np.abs(expected - actual).max())
+    agreement = float((expected.argmax(axis=-1) == actual.argmax(axis=-1)).mean())
+
+    fp32_size = (model_dir / "model.onnx").stat().st_size / 1e6
+    int8_size = (model_dir / "model.int8.onnx").stat().st_size / 1e6
+    ok = max_diff <= tolerance
+    print(
+        f"[{name}] max |p_int8 - p_fp32| = {max_diff:.4f} (tolerance {tolerance}), "
+        f"top-1 agreement {agreement:.0%}, size {fp32_size:.1f} MB -> {int8_size:.1f} MB "
+        f"{'OK' if ok else 'FAILED'}"
+    )
+    return ok
+
+def check_embedding_tolerance(model_dir: pathlib.Path, tolerance: float) -> bool:
+    """Compare int8 and fp32 sentence embeddings on the sample texts"""
+    from app.utils.onnx_backend import OnnxEmbedder
+
+    expected = OnnxEmbedder(model_dir, quantized=False).embed(SAMPLE_TEXTS)
+    actual = OnnxEmbedder(model_dir, quantized=True).embed(SAMPLE_TEXTS)
+    min_cosine = float((expected * actual).sum(axis=1).min())
+
+    fp32_size = (model_dir / "model.onnx").stat().st_size / 1e6
+    int8_size = (model_dir / "model.int8.onnx").stat().st_size / 1e6
+    ok = min_cosine >= 1 - tolerance
+    print(
+        f"[embedding] min cos(e_int8, e_fp32) = {min_cosine:.4f} (tolerance {tolerance}), "
+        f"size {fp32_size:.1f} MB -> {int8_size:.1f} MB {'OK' if ok else 'FAILED'}"
+    )
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and quantize TruthLens models to ONNX")
+    parser.add_argument("--output", default="models", help="Output directory (MODEL_DIR)")
+    parser.add_argument("--models", nargs="*", default=list(DEFAULT_MODELS), help="Models to process")
+    parser.add_argument("--opset", type=int, default=14, help="ONNX opset version")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Max allowed probability difference")
+    parser.add_argument("--check-only", action="store_true", help="Only run the fp32/int8 tolerance check")
+    args = parser.parse_args()
+
+    output_dir = pathlib.Path(args.output)
+    all_ok = True
+    for name in args.models:
+        if args.check_only and not is_exported(name, output_dir):
+            print(f"[{name}] not exported, skipping")
+            continue
+        if not args.check_only:
+            export_model(name, DEFAULT_MODELS[name], output_dir, args.opset)
+            quantize_model(name, output_dir)
+        all_ok = check_tolerance(name, output_dir, args.tolerance) and all_ok
+
+    sys.exit(0 if all_ok else 1)
+
+if __name__ == "__main__":
+    main()
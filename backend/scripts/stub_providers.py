@@ -0,0 +1,84 @@
+"""
+Local stub for the external verification providers.
+
+Serves a Google Fact Check API compatible endpoint and a NewsAPI compatible
+search endpoint with configurable latency and failure rate, so
+cross-verification can be exercised and load-tested without real API keys
+or third-party traffic.
+
+Usage:
+    python scripts/stub_providers.py --port 8089 --latency-ms 200 --jitter-ms 100
+
+then run the API with:
+    FACT_CHECK_API_URL=http://127.0.0.1:8089/v1alpha1/claims:search
+    SOURCE_SEARCH_API_URL=http://127.0.0.1:8089/v2/everything
+    GOOGLE_FACT_CHECK_API_KEY=stub NEWS_API_KEY=stub
+"""
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+PUBLISHERS = [
+    ("Reuters", "reuters.com"),
+    ("Associated Press", "apnews.com"),
+    ("BBC", "bbc.com"),
+    ("NPR", "npr.org"),
+]
+
+def make_app(latency_ms: float, jitter_ms: float, fail_rate: float) -> web.Application:
+    async def simulate():
+        await asyncio.sleep((latency_ms + random.uniform(0, jitter_ms)) / 1000)
+        if random.random() < fail_rate:
+            raise web.HTTPServiceUnavailable(text="stub failure")
+
+    async def fact_checks(request: web.Request) -> web.Response:
+        await simulate()
+        query = request.query.get("query", "")
+        return web.json_response({
+            "claims": [{
+                "text": query,
+                "claimant": "Social Media",
+                "claimReview": [{
+                    "publisher": {"name": "Fact Check Organization", "site": "factcheck.org"},
+                    "url": f"https://factcheck.org/check/{abs(hash(query)) % 100000}",
+                    "title": f"Fact check: {query}",
+                    "textualRating": "Partly False",
+                }],
+            }]
+        })
+
+    async def search(request: web.Request) -> web.Response:
+        await simulate()
+        query = request.query.get("q", "")
+        domains = request.query.get("domains", "").split(",")
+        articles = [
+            {
+                "source": {"name": name},
+                "title": f"{query} - {name}",
+                "url": f"https://{domain}/story/{abs(hash(query)) % 100000}",
+            }
+            for name, domain in PUBLISHERS
+            if domain in domains
+        ]
+        return web.json_response({"status": "ok", "totalResults": len(articles), "articles": articles})
+
+    app = web.Application()
+    app.router.add_get("/v1alpha1/claims:search", fact_checks)
+    app.router.add_get("/v2/everything", search)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub fact-check and news search providers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Base response latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="Random extra latency")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    web.run_app(make_app(args.latency_ms, args.jitter_ms, args.fail_rate), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
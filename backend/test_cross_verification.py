@@ -0,0 +1,135 @@
+"""
+Runs cross_verify_sources against the stub providers
+(scripts/stub_providers.py) on a local port: the normal path, a provider
+slower than the deadline, and a provider whose rate-limit budget is
+exhausted. Redis and the embedding store are left out, so only the provider
+calls, their cache and their budgets are exercised.
+"""
+import asyncio
+import importlib.util
+import pathlib
+import uuid
+from collections import Counter
+
+import pytest
+from aiohttp import web
+
+from app.utils import embedding_store, fact_check, http_client, lookup_cache
+
+_SCRIPT = pathlib.Path(__file__).resolve().parent / "scripts" / "stub_providers.py"
+_spec = importlib.util.spec_from_file_location("stub_providers", _SCRIPT)
+stub_providers = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stub_providers)
+
+CONTENT = "The council approved the budget on Monday after a long debate. " * 10
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(lookup_cache, "get_redis", lambda: None)
+    monkeypatch.setattr(fact_check, "get_redis", lambda: None)
+    monkeypatch.setattr(embedding_store, "EMBEDDING_BACKEND", "off")
+    monkeypatch.setenv("GOOGLE_FACT_CHECK_API_KEY", "stub")
+    monkeypatch.setenv("NEWS_API_KEY", "stub")
+
+def _verify(monkeypatch, title: str, url: str = "https://example.com/story", latency_ms: float = 10):
+    """
+    Serve the stub providers and cross-verify an article against them.
+    Returns the sources (or the exception raised) and the number of requests
+    each stub endpoint received.
+    """
+    requests = Counter()
+
+    @web.middleware
+    async def count(request, handler):
+        requests[request.path] += 1
+        return await handler(request)
+
+    async def run():
+        app = stub_providers.make_app(latency_ms, 0, 0.0)
+        app.middlewares.append(count)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        monkeypatch.setattr(fact_check, "FACT_CHECK_API_URL", f"http://127.0.0.1:{port}/v1alpha1/claims:search")
+        monkeypatch.setattr(fact_check, "SOURCE_SEARCH_API_URL", f"http://127.0.0.1:{port}/v2/everything")
+        try:
+            return await fact_check.cross_verify_sources(url, title, CONTENT)
+        except Exception as e:
+            return e
+        finally:
+            # Let cancelled lookups unwind before the session and server go away
+            await asyncio.sleep(0)
+            await http_client.close_session()
+            await runner.cleanup()
+
+    return asyncio.run(run()), requests
+
+def _title() -> str:
+    # Unique, so lookups are not answered from the cache of an earlier test
+    return f"Council approves city budget {uuid.uuid4().hex[:8]}"
+
+def test_fact_checks_and_trusted_sources(monkeypatch):
+    title = _title()
+    result, requests = _verify(monkeypatch, title, url="https://www.reuters.com/story")
+
+    assert not isinstance(result, Exception)
+    publishers = {source.publisher for source in result}
+    assert "Fact Check Organization" in publishers
+    assert {"Associated Press", "BBC", "NPR"} <= publishers
+    # The article does not verify itself
+    assert "Reuters" not in publishers
+    assert requests == {"/v1alpha1/claims:search": 1, "/v2/everything": 1}
+
+    # The same story again is answered from the lookup cache
+    again, requests = _verify(monkeypatch, title.upper(), url="https://www.reuters.com/story")
+    assert {source.url for source in again} == {source.url for source in result}
+    assert not requests
+
+def test_providers_miss_the_deadline(monkeypatch):
+    monkeypatch.setattr(fact_check, "CROSS_VERIFY_DEADLINE", 0.2)
+    failures = fact_check.verification_failures.value
+
+    result, requests = _verify(monkeypatch, _title(), latency_ms=1000)
+
+    assert isinstance(result, RuntimeError)
+    assert fact_check.verification_failures.value == failures + 1
+    assert requests == {"/v1alpha1/claims:search": 1, "/v2/everything": 1}
+
+def test_slow_page_extraction_leaves_time_for_providers(monkeypatch):
+    monkeypatch.setattr(fact_check, "CROSS_VERIFY_DEADLINE", 0.5)
+
+    async def slow_page(url):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(fact_check, "extract_article_content", slow_page)
+    monkeypatch.setattr(fact_check, "MIN_CONTENT_CHARS", len(CONTENT) + 1)
+
+    result, requests = _verify(monkeypatch, _title())
+
+    # The providers were asked while the page was still loading
+    assert not isinstance(result, Exception)
+    assert {"Fact Check Organization", "Reuters"} <= {source.publisher for source in result}
+    assert requests == {"/v1alpha1/claims:search": 1, "/v2/everything": 1}
+
+def test_exhausted_budget_skips_the_provider(monkeypatch):
+    monkeypatch.setitem(lookup_cache._local_buckets, "news", lookup_cache.TokenBucket(0, 0))
+    denied = lookup_cache.lookup_denied.labels(provider="news").value
+
+    result, requests = _verify(monkeypatch, _title())
+
+    # Fact checks still answered, so the result stands without the search
+    assert not isinstance(result, Exception)
+    assert {source.publisher for source in result} == {"Fact Check Organization"}
+    assert lookup_cache.lookup_denied.labels(provider="news").value == denied + 1
+    assert requests == {"/v1alpha1/claims:search": 1}
+
+def test_every_budget_exhausted(monkeypatch):
+    for provider in lookup_cache.PROVIDER_BUDGETS:
+        monkeypatch.setitem(lookup_cache._local_buckets, provider, lookup_cache.TokenBucket(0, 0))
+
+    result, requests = _verify(monkeypatch, _title())
+
+    assert isinstance(result, RuntimeError)
+    assert not requests
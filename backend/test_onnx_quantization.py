@@ -0,0 +1,26 @@
+"""
+Checks that the int8 ONNX models stay within tolerance of the fp32 models
+they were quantized from. Runs on the models in MODEL_DIR and skips any
+model that has not been exported (scripts/export_onnx.py).
+"""
+import importlib.util
+import pathlib
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+
+from app.utils.model_service import MODEL_DIR
+
+_SCRIPT = pathlib.Path(__file__).resolve().parent / "scripts" / "export_onnx.py"
+_spec = importlib.util.spec_from_file_location("export_onnx", _SCRIPT)
+export_onnx = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(export_onnx)
+
+@pytest.mark.parametrize("name", list(export_onnx.DEFAULT_MODELS))
+def test_int8_within_tolerance(name):
+    output_dir = pathlib.Path(MODEL_DIR)
+    if not export_onnx.is_exported(name, output_dir):
+        pytest.skip(f"{name} has not been exported to {output_dir}")
+    assert export_onnx.check_tolerance(name, output_dir, export_onnx.DEFAULT_TOLERANCE)
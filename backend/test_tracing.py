@@ -0,0 +1,97 @@
+"""
+Checks the trace of an analysis with the in-memory exporter: the request
+span is the root of the cache lookup and analyzer stage spans, and the
+background job it queues continues the same trace from the context carried
+in the job envelope.
+"""
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+
+from fastapi.testclient import TestClient
+
+from app.utils import tracing
+
+@pytest.fixture
+def memory_tracing(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACING_EXPORTER", "memory")
+    tracing.shutdown_tracing()
+    assert tracing.init_tracing()
+    yield
+    tracing.shutdown_tracing()
+
+@pytest.fixture
+def client(memory_tracing, monkeypatch):
+    from app.main import app
+    from app.routers import analysis
+
+    async def no_sources(url, title, content=None):
+        return []
+
+    # Keep the job offline; the span tree does not depend on what it finds
+    monkeypatch.setattr(analysis, "cross_verify_sources", no_sources)
+    with TestClient(app) as test_client:
+        yield test_client
+
+def _ancestors(span, by_id):
+    """The spans above `span`, nearest first"""
+    ancestors = []
+    parent = span.parent
+    while parent is not None and parent.span_id in by_id:
+        ancestors.append(by_id[parent.span_id])
+        parent = ancestors[-1].parent
+    return ancestors
+
+def _wait_for_span(name: str, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for span in tracing.finished_spans():
+            if span.name == name:
+                return span
+        time.sleep(0.05)
+    pytest.fail(f"No '{name}' span within {timeout}s")
+
+def test_request_cache_stage_and_job_spans(client):
+    article = {
+        "title": "Tracing test article",
+        # Unique content, so the analysis is not served from the cache
+        "content": f"Trace {uuid.uuid4().hex}. " + "The council approved the budget on Monday. " * 20,
+        "url": f"https://example.com/{uuid.uuid4().hex}",
+    }
+    response = client.post("/api/analyze", json=article)
+    assert response.status_code == 200
+
+    job_span = _wait_for_span("job.verify_sources")
+    spans = tracing.finished_spans()
+    by_id = {span.context.span_id: span for span in spans}
+
+    request_span = next(
+        span for span in spans if span.attributes.get("http.target") == "/api/analyze" and span.parent is None
+    )
+    trace_id = request_span.context.trace_id
+
+    cache_span = next(span for span in spans if span.name == "cache.lookup")
+    assert cache_span.context.trace_id == trace_id
+    assert request_span in _ancestors(cache_span, by_id)
+    assert cache_span.attributes["cache.hit"] is False
+
+    for stage in ("credibility", "sentiment", "bias"):
+        stage_span = next(span for span in spans if span.name == f"analysis.{stage}")
+        ancestors = _ancestors(stage_span, by_id)
+        assert ancestors[0].name == "analysis.run"
+        assert ancestors[-1] is request_span
+
+    # The job ran from the queue, so its parent comes from the context in the
+    # job envelope rather than from the task that queued it
+    assert job_span.context.trace_id == trace_id
+    assert job_span.parent is not None and job_span.parent.is_remote
+    queued_by = by_id[job_span.parent.span_id]
+    assert request_span in [queued_by] + _ancestors(queued_by, by_id)
+
+    # Spans opened by the job handler are children of the job span
+    sources_span = _wait_for_span("update_with_sources")
+    assert sources_span.parent.span_id == job_span.context.span_id
@@ -0,0 +1,68 @@
+"""
+Background job worker for TruthLens.
+
+Consumes the Redis job queue (source cross-verification, re-analysis of
+stale cache entries) in a separate process, so verification capacity can be
+scaled independently of the API workers. Run as many of these as needed:
+
+    python worker.py
+
+Concurrency per process is JOB_CONCURRENCY (default 8). SIGTERM/SIGINT stop
+taking new jobs and wait for running ones to finish.
+"""
+import os
+import signal
+import asyncio
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+from app.utils.model_service import initialize_models
+from app.utils.inference_executor import init_executor, shutdown_executor
+from app.utils.redis_client import close_redis, get_redis
+from app.utils.http_client import close_session
+from app.utils.extraction import shutdown_extraction
+from app.utils.job_queue import run_consumers
+from app.utils.similarity_index import sync_index
+from app.utils.tracing import init_tracing, shutdown_tracing
+# Registers the job handlers
+import app.routers.analysis  # noqa: F401
+
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "8"))
+
+async def main():
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        logger.error("REDIS_URL is not set; jobs are processed in the API workers")
+        return
+
+    # Jobs continue the traces of the requests that queued them
+    init_tracing("truthlens-worker")
+
+    # Re-analysis jobs run the models
+    initialize_models()
+    init_executor()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    # Cross-verification queries the near-duplicate index
+    index_sync = asyncio.create_task(sync_index(get_redis()))
+
+    logger.info(f"Starting job worker (pid {os.getpid()}, concurrency {JOB_CONCURRENCY})")
+    try:
+        await run_consumers(JOB_CONCURRENCY, redis_url, stop)
+    finally:
+        index_sync.cancel()
+        shutdown_executor()
+        shutdown_extraction()
+        await close_session()
+        await close_redis()
+        shutdown_tracing()
+        logger.info("Job worker stopped")
+
+if __name__ == "__main__":
+    asyncio.run(main())